@@ -21,9 +21,19 @@ from keystone import exception
 from keystone import identity
 
 
+def _user_projects(key, user_ref):
+    return user_ref.get('tenants')
+
+
+def _metadata_roles(key, metadata_ref):
+    return metadata_ref.get('roles')
+
+
 class Assignment(kvs.Base, assignment.Driver):
     def __init__(self):
         super(Assignment, self).__init__()
+        self.db.add_index('user_project', 'user-', _user_projects)
+        self.db.add_index('metadata_role', 'metadata-', _metadata_roles)
 
     # Public interface
 
@@ -46,10 +56,8 @@ class Assignment(kvs.Base, assignment.Driver):
 
     def get_project_users(self, tenant_id):
         self.get_project(tenant_id)
-        user_keys = filter(lambda x: x.startswith("user-"), self.db.keys())
-        user_refs = [self.db.get(key) for key in user_keys]
-        user_refs = filter(lambda x: tenant_id in x['tenants'], user_refs)
-        return [identity.filter_user(user_ref) for user_ref in user_refs]
+        user_keys = self.db.find('user_project', tenant_id)
+        return [identity.filter_user(self.db.get(key)) for key in user_keys]
 
     def _get_user(self, user_id):
         try:
@@ -293,9 +301,7 @@ class Assignment(kvs.Base, assignment.Driver):
 
     def delete_role(self, role_id):
         self.get_role(role_id)
-        metadata_keys = filter(lambda x: x.startswith("metadata-"),
-                               self.db.keys())
-        for key in metadata_keys:
+        for key in self.db.find('metadata_role', role_id):
             meta_id1 = key.split('-')[1]
             meta_id2 = key.split('-')[2]
             try:
@@ -125,6 +125,21 @@ class Assignment(assignment.Driver):
     def list_roles(self):
         return self.role.get_all()
 
+    def export_projects(self):
+        for project in self.project.iter_all():
+            yield self._set_default_domain(project)
+
+    def export_roles(self):
+        return self.role.iter_all()
+
+    def export_grants(self):
+        for project in self.project.iter_all():
+            tenant_dn = self.project._id_to_dn(project['id'])
+            for assoc in self.role.get_role_assignments(tenant_dn):
+                yield {'role_id': self.role._dn_to_id(assoc.role_dn),
+                       'user_id': self.user._dn_to_id(assoc.user_dn),
+                       'project_id': project['id']}
+
     def get_projects_for_user(self, user_id):
         self.identity_api.get_user(user_id)
         user_dn = self.user._id_to_dn(user_id)
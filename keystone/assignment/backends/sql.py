@@ -37,11 +37,11 @@ class Assignment(sql.Base, assignment.Driver):
         return project_ref
 
     def get_project(self, tenant_id):
-        session = self.get_session()
+        session = self.get_session(read_only=True)
         return self._get_project(session, tenant_id).to_dict()
 
     def get_project_by_name(self, tenant_name, domain_id):
-        session = self.get_session()
+        session = self.get_session(read_only=True)
         query = session.query(Project)
         query = query.filter_by(name=tenant_name)
         query = query.filter_by(domain_id=domain_id)
@@ -52,7 +52,7 @@ class Assignment(sql.Base, assignment.Driver):
         return project_ref.to_dict()
 
     def get_project_user_ids(self, tenant_id):
-        session = self.get_session()
+        session = self.get_session(read_only=True)
         self.get_project(tenant_id)
         query = session.query(UserProjectGrant)
         query = query.filter(UserProjectGrant.project_id ==
@@ -127,13 +127,78 @@ class Assignment(sql.Base, assignment.Driver):
             self._update_metadata(user_id, project_id, metadata_ref,
                                   domain_id, group_id)
 
+    @sql.handle_conflicts(type='metadata')
+    def create_grants(self, grants):
+        for user_id in set(grant.get('user_id') for grant in grants):
+            if user_id:
+                self.identity_api.get_user(user_id)
+        for group_id in set(grant.get('group_id') for grant in grants):
+            if group_id:
+                self.identity_api.get_group(group_id)
+
+        session = self.get_session()
+        self._check_ids(session, Role, [grant['role_id'] for grant in grants],
+                        lambda x: exception.RoleNotFound(role_id=x))
+        self._check_ids(session, Domain,
+                        [grant.get('domain_id') for grant in grants],
+                        lambda x: exception.DomainNotFound(domain_id=x))
+        self._check_ids(session, Project,
+                        [grant.get('project_id') for grant in grants],
+                        lambda x: exception.ProjectNotFound(project_id=x))
+
+        # roles to add, by kind of grant then by actor and target IDs
+        roles_by_kind = {}
+        for grant in grants:
+            actor = 'user_id' if grant.get('user_id') else 'group_id'
+            target = 'project_id' if grant.get('project_id') else 'domain_id'
+            key = (grant[actor], grant[target])
+            roles_by_kind.setdefault((actor, target), {}).setdefault(
+                key, set()).add(grant['role_id'])
+
+        with session.begin():
+            for (actor, target), roles_by_key in roles_by_kind.iteritems():
+                model = GRANT_MODELS[(actor, target)]
+                q = session.query(model)
+                q = q.filter(getattr(model, actor).in_(
+                    set(key[0] for key in roles_by_key)))
+                q = q.filter(getattr(model, target).in_(
+                    set(key[1] for key in roles_by_key)))
+                existing = dict(((getattr(ref, actor), getattr(ref, target)),
+                                 ref) for ref in q)
+
+                rows = []
+                for key, roles in roles_by_key.iteritems():
+                    ref = existing.get(key)
+                    if ref is None:
+                        rows.append({actor: key[0], target: key[1],
+                                     'data': {'roles': sorted(roles)}})
+                    else:
+                        data = ref.data.copy()
+                        data['roles'] = list(
+                            set(data.get('roles', [])) | roles)
+                        ref.data = data
+                if rows:
+                    session.execute(model.__table__.insert(), rows)
+            session.flush()
+
+    def _check_ids(self, session, model, ids, not_found):
+        """Raises not_found(id) for the first of ids not in model's table."""
+        ids = set(ids)
+        ids.discard(None)
+        if not ids:
+            return
+        q = session.query(model.id).filter(model.id.in_(ids))
+        missing = ids - set(row.id for row in q)
+        if missing:
+            raise not_found(sorted(missing)[0])
+
     def list_grants(self, user_id=None, group_id=None,
                     domain_id=None, project_id=None):
         if user_id:
             self.identity_api.get_user(user_id)
         if group_id:
             self.identity_api.get_group(group_id)
-        session = self.get_session()
+        session = self.get_session(read_only=True)
         if domain_id:
             self._get_domain(session, domain_id)
         if project_id:
@@ -153,7 +218,7 @@ class Assignment(sql.Base, assignment.Driver):
         if group_id:
             self.identity_api.get_group(group_id)
 
-        session = self.get_session()
+        session = self.get_session(read_only=True)
         role_ref = self._get_role(session, role_id)
 
         if domain_id:
@@ -207,13 +272,22 @@ class Assignment(sql.Base, assignment.Driver):
                                   domain_id, group_id)
 
     def list_projects(self):
-        session = self.get_session()
-        tenant_refs = session.query(Project).all()
-        return [tenant_ref.to_dict() for tenant_ref in tenant_refs]
+        return self.select_dicts(Project)
+
+    def export_projects(self):
+        return self.iter_dicts(Project)
+
+    def export_grants(self):
+        for (actor, target), model in sorted(GRANT_MODELS.iteritems()):
+            for row in self.iter_rows(model):
+                for role_id in (row.data or {}).get('roles', []):
+                    yield {'role_id': role_id,
+                           actor: row[actor],
+                           target: row[target]}
 
     def get_projects_for_user(self, user_id):
         self.identity_api.get_user(user_id)
-        session = self.get_session()
+        session = self.get_session(read_only=True)
         query = session.query(UserProjectGrant)
         query = query.filter_by(user_id=user_id)
         membership_refs = query.all()
@@ -273,7 +347,7 @@ class Assignment(sql.Base, assignment.Driver):
         # assignment table, simplifying the logic of this (and many other)
         # functions.
 
-        session = self.get_session()
+        session = self.get_session(read_only=True)
         assignment_list = []
         refs = session.query(UserDomainGrant).all()
         for x in refs:
@@ -312,6 +386,15 @@ class Assignment(sql.Base, assignment.Driver):
             session.flush()
         return tenant_ref.to_dict()
 
+    @sql.handle_conflicts(type='project')
+    def create_projects(self, tenants):
+        tenants = [dict(tenant, name=clean.project_name(tenant['name']))
+                   for tenant in tenants]
+        session = self.get_session()
+        with session.begin():
+            self.insert_dicts(session, Project, tenants)
+        return tenants
+
     @sql.handle_conflicts(type='project')
     def update_project(self, tenant_id, tenant):
         session = self.get_session()
@@ -426,10 +509,13 @@ class Assignment(sql.Base, assignment.Driver):
         return ref.to_dict()
 
     def list_domains(self):
-        session = self.get_session()
+        session = self.get_session(read_only=True)
         refs = session.query(Domain).all()
         return [ref.to_dict() for ref in refs]
 
+    def export_domains(self):
+        return self.iter_dicts(Domain)
+
     def _get_domain(self, session, domain_id):
         ref = session.query(Domain).get(domain_id)
         if ref is None:
@@ -437,11 +523,11 @@ class Assignment(sql.Base, assignment.Driver):
         return ref
 
     def get_domain(self, domain_id):
-        session = self.get_session()
+        session = self.get_session(read_only=True)
         return self._get_domain(session, domain_id).to_dict()
 
     def get_domain_by_name(self, domain_name):
-        session = self.get_session()
+        session = self.get_session(read_only=True)
         try:
             ref = (session.query(Domain).
                    filter_by(name=domain_name).one())
@@ -473,7 +559,7 @@ class Assignment(sql.Base, assignment.Driver):
             session.flush()
 
     def list_user_projects(self, user_id):
-        session = self.get_session()
+        session = self.get_session(read_only=True)
         user = self.identity_api.get_user(user_id)
         metadata_refs = session\
             .query(UserProjectGrant)\
@@ -501,10 +587,13 @@ class Assignment(sql.Base, assignment.Driver):
         return ref.to_dict()
 
     def list_roles(self):
-        session = self.get_session()
+        session = self.get_session(read_only=True)
         refs = session.query(Role).all()
         return [ref.to_dict() for ref in refs]
 
+    def export_roles(self):
+        return self.iter_dicts(Role)
+
     def _get_role(self, session, role_id):
         ref = session.query(Role).get(role_id)
         if ref is None:
@@ -512,7 +601,7 @@ class Assignment(sql.Base, assignment.Driver):
         return ref
 
     def get_role(self, role_id):
-        session = self.get_session()
+        session = self.get_session(read_only=True)
         return self._get_role(session, role_id).to_dict()
 
     @sql.handle_conflicts(type='role')
@@ -664,3 +753,11 @@ class GroupDomainGrant(sql.ModelBase, BaseGrant):
     group_id = sql.Column(sql.String(64), primary_key=True)
     domain_id = sql.Column(sql.String(64), primary_key=True)
     data = sql.Column(sql.JsonBlob())
+
+
+GRANT_MODELS = {
+    ('user_id', 'project_id'): UserProjectGrant,
+    ('user_id', 'domain_id'): UserDomainGrant,
+    ('group_id', 'project_id'): GroupProjectGrant,
+    ('group_id', 'domain_id'): GroupDomainGrant,
+}
@@ -19,6 +19,7 @@
 from keystone.common import dependency
 from keystone.common import logging
 from keystone.common import manager
+from keystone.common import notifications
 from keystone import config
 from keystone import exception
 
@@ -45,6 +46,27 @@ class Manager(manager.Manager):
     api object by both managers.
     """
 
+    notifications = {
+        'create_project': ('project', notifications.CREATED, 'project_id'),
+        'create_projects': ('project', notifications.CREATED, 'project_id'),
+        'update_project': ('project', notifications.UPDATED, 'project_id'),
+        'delete_project': ('project', notifications.DELETED, 'project_id'),
+        'create_domain': ('domain', notifications.CREATED, 'domain_id'),
+        'update_domain': ('domain', notifications.UPDATED, 'domain_id'),
+        'delete_domain': ('domain', notifications.DELETED, 'domain_id'),
+        'create_role': ('role', notifications.CREATED, 'role_id'),
+        'update_role': ('role', notifications.UPDATED, 'role_id'),
+        'delete_role': ('role', notifications.DELETED, 'role_id'),
+        'create_grant': ('grant', notifications.CREATED, None),
+        'create_grants': ('grant', notifications.CREATED, None),
+        'delete_grant': ('grant', notifications.DELETED, None),
+        'add_role_to_user_and_project': ('grant', notifications.CREATED, None),
+        'remove_role_from_user_and_project': ('grant', notifications.DELETED,
+                                              None),
+        # remove_user_from_project() emits an event for each role removed
+        'add_user_to_project': ('grant', notifications.CREATED, None),
+    }
+
     def __init__(self, identity_api=None):
         if identity_api is None:
             from keystone import identity
@@ -222,6 +244,20 @@ class Driver(object):
         """
         raise exception.NotImplemented()
 
+    def create_grants(self, grants):
+        """Creates several assignments/grants at once, all or none of them.
+
+        :param grants: list of dicts with a role_id, a user_id or group_id
+                       and a project_id or domain_id
+        :raises: keystone.exception.UserNotFound,
+                 keystone.exception.GroupNotFound,
+                 keystone.exception.ProjectNotFound,
+                 keystone.exception.DomainNotFound,
+                 keystone.exception.RoleNotFound
+
+        """
+        raise exception.NotImplemented()
+
     def list_grants(self, user_id=None, group_id=None,
                     domain_id=None, project_id=None):
         """Lists assignments/grants.
@@ -329,6 +365,16 @@ class Driver(object):
         """
         raise exception.NotImplemented()
 
+    def create_projects(self, projects):
+        """Creates several projects at once, all or none of them.
+
+        :param projects: list of project_refs, including their ID
+        :returns: a list of project_refs
+        :raises: keystone.exception.Conflict
+
+        """
+        raise exception.NotImplemented()
+
     def list_projects(self):
         """List all projects in the system.
 
@@ -433,6 +479,28 @@ class Driver(object):
         """
         raise exception.NotImplemented()
 
+    # export, see identity.Driver.export_users()
+    def export_domains(self):
+        """Yields all domains."""
+        return iter(self.list_domains())
+
+    def export_roles(self):
+        """Yields all roles."""
+        return iter(self.list_roles())
+
+    def export_projects(self):
+        """Yields all projects."""
+        return iter(self.list_projects())
+
+    def export_grants(self):
+        """Yields all grants, as given to create_grant().
+
+        Each grant is a dict with a role_id, a user_id or group_id and a
+        project_id or domain_id.
+
+        """
+        return iter(self.list_role_assignments())
+
     #domain management functions for backends that only allow a single domain.
     #currently, this is only LDAP, but might be used by PAM or other backends
     #as well.  This is used by both identity and assignment drivers.
@@ -387,6 +387,10 @@ class Auth(controller.V3Controller):
     def revocation_list(self, context, auth=None):
         return self.token_controllers_ref.revocation_list(context, auth)
 
+    @controller.protected
+    def revocation_events(self, context, auth=None):
+        return self.token_controllers_ref.revocation_events(context, auth)
+
 
 #FIXME(gyee): not sure if it belongs here or keystone.common. Park it here
 # for now.
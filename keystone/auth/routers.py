@@ -40,3 +40,7 @@ def append_v3_routers(mapper, routers):
                    controller=auth_controller,
                    action='revocation_list',
                    conditions=dict(method=['GET']))
+    mapper.connect('/auth/tokens/OS-PKI/revoked/events',
+                   controller=auth_controller,
+                   action='revocation_events',
+                   conditions=dict(method=['GET']))
@@ -55,9 +55,10 @@ class Catalog(sql.Base, catalog.Driver):
 
     # Services
     def list_services(self):
-        session = self.get_session()
-        services = session.query(Service).all()
-        return [s.to_dict() for s in list(services)]
+        return self.select_dicts(Service)
+
+    def export_services(self):
+        return self.iter_dicts(Service)
 
     def _get_service(self, session, service_id):
         ref = session.query(Service).get(service_id)
@@ -66,7 +67,7 @@ class Catalog(sql.Base, catalog.Driver):
         return ref
 
     def get_service(self, service_id):
-        session = self.get_session()
+        session = self.get_session(read_only=True)
         return self._get_service(session, service_id).to_dict()
 
     def delete_service(self, service_id):
@@ -123,13 +124,14 @@ class Catalog(sql.Base, catalog.Driver):
             raise exception.EndpointNotFound(endpoint_id=endpoint_id)
 
     def get_endpoint(self, endpoint_id):
-        session = self.get_session()
+        session = self.get_session(read_only=True)
         return self._get_endpoint(session, endpoint_id).to_dict()
 
     def list_endpoints(self):
-        session = self.get_session()
-        endpoints = session.query(Endpoint)
-        return [e.to_dict() for e in list(endpoints)]
+        return self.select_dicts(Endpoint)
+
+    def export_endpoints(self):
+        return self.iter_dicts(Endpoint)
 
     def update_endpoint(self, endpoint_id, endpoint_ref):
         session = self.get_session()
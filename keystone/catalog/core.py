@@ -20,6 +20,7 @@
 from keystone.common import dependency
 from keystone.common import logging
 from keystone.common import manager
+from keystone.common import notifications
 from keystone import config
 from keystone import exception
 
@@ -61,6 +62,15 @@ class Manager(manager.Manager):
 
     """
 
+    notifications = {
+        'create_service': ('service', notifications.CREATED, 'service_id'),
+        'update_service': ('service', notifications.UPDATED, 'service_id'),
+        'delete_service': ('service', notifications.DELETED, 'service_id'),
+        'create_endpoint': ('endpoint', notifications.CREATED, 'endpoint_id'),
+        'update_endpoint': ('endpoint', notifications.UPDATED, 'endpoint_id'),
+        'delete_endpoint': ('endpoint', notifications.DELETED, 'endpoint_id'),
+    }
+
     def __init__(self):
         super(Manager, self).__init__(CONF.catalog.driver)
 
@@ -190,6 +200,19 @@ class Driver(object):
         """
         raise exception.NotImplemented()
 
+    def export_services(self):
+        """Yields all services.
+
+        Drivers which can should override this to avoid holding all the
+        services in memory at once, as list_services() does.
+
+        """
+        return iter(self.list_services())
+
+    def export_endpoints(self):
+        """Yields all endpoints; see export_services()."""
+        return iter(self.list_endpoints())
+
     def get_catalog(self, user_id, tenant_id, metadata=None):
         """Retrieve and format the current service catalog.
 
@@ -19,6 +19,7 @@ from __future__ import absolute_import
 import grp
 import os
 import pwd
+import sys
 
 from oslo.config import cfg
 import pbr.version
@@ -146,6 +147,104 @@ class TokenFlush(BaseApp):
         token_manager.driver.flush_expired_tokens()
 
 
+class BulkImport(BaseApp):
+    """Import identity, assignment and catalog data from a JSON lines file."""
+
+    name = 'bulk_import'
+
+    @classmethod
+    def add_argument_parser(cls, subparsers):
+        parser = super(BulkImport, cls).add_argument_parser(subparsers)
+        parser.add_argument('file',
+                            help=('File of records, one JSON object per '
+                                  'line, or - to read them from stdin.'))
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help=('Number of records created at once. '
+                                  'Defaults to [bulk_import] batch_size.'))
+        parser.add_argument('--errors', default=None,
+                            help=('File to write the records which failed '
+                                  'to, as JSON lines. Defaults to stderr.'))
+        return parser
+
+    @staticmethod
+    def main():
+        from keystone import catalog
+        from keystone.contrib import bulk_import
+        from keystone import identity
+
+        def progress(record_type, report):
+            print '%s: %d imported, %d failed' % (
+                record_type, report.imported[record_type],
+                report.failed[record_type])
+
+        identity_api = identity.Manager()
+        importer = bulk_import.Importer(identity_api,
+                                        identity_api.assignment_api,
+                                        batch_size=CONF.command.batch_size,
+                                        progress=progress,
+                                        catalog_api=catalog.Manager())
+        if CONF.command.file == '-':
+            report = importer.import_lines(sys.stdin)
+        else:
+            with open(CONF.command.file) as f:
+                report = importer.import_lines(f)
+
+        errors = sys.stderr
+        if CONF.command.errors:
+            errors = open(CONF.command.errors, 'w')
+        try:
+            for error in report.to_dict()['errors']:
+                errors.write(jsonutils.dumps(error) + '\n')
+        finally:
+            if errors is not sys.stderr:
+                errors.close()
+
+        print 'Imported %d records, %d failed' % (
+            sum(report.imported.values()), len(report.errors))
+
+
+class Export(BaseApp):
+    """Export identity, assignment and catalog data as JSON lines."""
+
+    name = 'export'
+
+    @classmethod
+    def add_argument_parser(cls, subparsers):
+        parser = super(Export, cls).add_argument_parser(subparsers)
+        parser.add_argument('file', default='-', nargs='?',
+                            help=('File to write the records to, one JSON '
+                                  'object per line, as read by bulk_import. '
+                                  'Defaults to stdout.'))
+        return parser
+
+    @staticmethod
+    def main():
+        from keystone import catalog
+        from keystone.contrib import bulk_import
+        from keystone import identity
+
+        identity_api = identity.Manager()
+        records = bulk_import.export_records(identity_api,
+                                             identity_api.assignment_api,
+                                             catalog.Manager())
+        out = sys.stdout
+        if CONF.command.file != '-':
+            out = open(CONF.command.file, 'w')
+        counts = {}
+        try:
+            for record_type, ref in records:
+                out.write(bulk_import.format_record(record_type, ref))
+                counts[record_type] = counts.get(record_type, 0) + 1
+        finally:
+            if out is not sys.stdout:
+                out.close()
+
+        # stdout may be the export itself
+        for record_type in bulk_import.RECORD_TYPES:
+            sys.stderr.write('%s: %d exported\n' % (
+                record_type, counts.get(record_type, 0)))
+
+
 class ImportLegacy(BaseApp):
     """Import a legacy database."""
 
@@ -202,8 +301,10 @@ class ImportNovaAuth(BaseApp):
 
 
 CMDS = [
+    BulkImport,
     DbSync,
     DbVersion,
+    Export,
     ExportLegacyCatalog,
     ImportLegacy,
     ImportNovaAuth,
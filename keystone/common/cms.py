@@ -2,12 +2,14 @@ import hashlib
 
 from keystone.common import environment
 from keystone.common import logging
+from keystone.common import manager
 
 
 LOG = logging.getLogger(__name__)
 PKI_ANS1_PREFIX = 'MII'
 
 
+@manager.timed(__name__ + '.cms_verify')
 def cms_verify(formatted, signing_cert_file_name, ca_file_name):
     """Verifies the signature of the contents IAW CMS syntax."""
     process = environment.subprocess.Popen(["openssl", "cms", "-verify",
@@ -97,6 +99,7 @@ def is_ans1_token(token):
     return token[:3] == PKI_ANS1_PREFIX
 
 
+@manager.timed(__name__ + '.cms_sign_text')
 def cms_sign_text(text, signing_cert_file_name, signing_key_file_name):
     """Uses OpenSSL to sign a document
     Produces a Base64 encoding of a DER formatted CMS Document
@@ -192,6 +192,9 @@ def configure():
     register_int('compute_port', default=8774)
     register_int('admin_port', default=35357)
     register_int('public_port', default=5000)
+    register_int('admin_workers', default=0)
+    register_int('public_workers', default=0)
+    register_int('worker_shutdown_timeout', default=60)
     register_str(
         'public_endpoint', default='http://localhost:%(public_port)s/')
     register_str('admin_endpoint', default='http://localhost:%(admin_port)s/')
@@ -210,6 +213,13 @@ def configure():
 
     # identity
     register_str('default_domain_id', group='identity', default='default')
+    register_int('password_cache_time', group='identity', default=0)
+    register_int('password_cache_size', group='identity', default=1000)
+    register_list('password_hash_tiers', group='identity', default=[])
+    register_list('password_hash_domain_tiers', group='identity', default=[])
+    register_str('password_hash_attribute', group='identity',
+                 default='password_hash_tier')
+    register_bool('password_rehash_on_login', group='identity', default=True)
 
     # trust
     register_bool('enabled', group='trust', default=True)
@@ -254,10 +264,20 @@ def configure():
     register_str('cert_subject', group='signing',
                  default='/C=US/ST=Unset/L=Unset/O=Unset/CN=www.example.com')
 
+    # kvs
+    register_str('path', group='kvs', default=None)
+
     # sql
     register_str('connection', group='sql', secret=True,
                  default='sqlite:///keystone.db')
     register_int('idle_timeout', group='sql', default=200)
+    register_int('pool_size', group='sql', default=None)
+    register_int('max_overflow', group='sql', default=None)
+    register_int('pool_timeout', group='sql', default=None)
+    register_bool('pool_pre_ping', group='sql', default=False)
+    register_list('read_connection', group='sql', secret=True, default=[])
+    register_list('primary_only_backends', group='sql', default=[])
+    register_int('primary_read_window', group='sql', default=5)
 
     #assignment has no default for backward compatibility reasons.
     #If assignment is not specified, the identity driver chooses the backend
@@ -283,14 +303,26 @@ def configure():
         default='keystone.policy.backends.sql.Policy')
     register_str(
         'driver', group='token', default='keystone.token.backends.sql.Token')
+    register_str(
+        'codec', group='token', default='keystone.token.codec.JsonCodec')
+    register_int('compression', group='token', default=0)
+    register_bool('intern_catalog', group='token', default=True)
+    register_int('revocation_events_max_wait', group='token', default=30)
+    register_int('revocation_poll_interval', group='token', default=1)
     register_str(
         'driver', group='trust', default='keystone.trust.backends.sql.Trust')
     register_str(
         'driver', group='ec2', default='keystone.contrib.ec2.backends.kvs.Ec2')
+    register_int('cache_time', group='ec2', default=0)
+    register_int('cache_size', group='ec2', default=1000)
     register_str(
         'driver',
         group='stats',
         default='keystone.contrib.stats.backends.kvs.Stats')
+    register_int('flush_interval', group='stats', default=10)
+    register_int('max_tracked_values', group='stats', default=100)
+    register_int('buffer_size', group='notifications', default=1000)
+    register_int('max_wait', group='notifications', default=30)
 
     # ldap
     register_str('url', group='ldap', default='ldap://localhost')
@@ -83,6 +83,26 @@ def flatten(d, parent_key=''):
     return dict(items)
 
 
+def query_int(context, name, default):
+    """Returns the query parameter name as a non-negative integer.
+
+    :returns: default if the parameter is not given
+    :raises: keystone.exception.ValidationError if it is something else
+
+    """
+    value = context['query_string'].get(name)
+    if value is None:
+        return default
+    try:
+        value = int(value)
+    except ValueError:
+        value = -1
+    if value < 0:
+        msg = _('%s must be a non-negative integer') % name
+        raise exception.ValidationError(message=msg)
+    return value
+
+
 def protected(f):
     """Wraps API calls with role based access controls (RBAC)."""
     @functools.wraps(f)
@@ -165,6 +185,60 @@ class V2Controller(wsgi.Application):
             self._delete_tokens_for_trust(trust['trustee_user_id'],
                                           trust['id'])
 
+    def _delete_tokens_for_users(self, user_ids, project_id=None):
+        """Deletes the tokens of several users, and of their trusts.
+
+        Token drivers which cannot revoke in bulk are called once per user
+        and trust, as _delete_tokens_for_user() does.
+
+        """
+        user_ids = set(user_ids)
+        if not user_ids:
+            return
+        try:
+            trusts = self.trust_api.list_trusts_for_users(list(user_ids))
+        except exception.NotImplemented:
+            trusts = dict((trust['id'], trust)
+                          for user_id in user_ids
+                          for trust in (
+                              self.trust_api.list_trusts_for_trustee(user_id) +
+                              self.trust_api.list_trusts_for_trustor(user_id)))
+            trusts = trusts.values()
+
+        try:
+            self.token_api.delete_tokens_for_users(list(user_ids),
+                                                   project_id=project_id)
+        except exception.NotImplemented:
+            for user_id in user_ids:
+                self.token_api.delete_tokens(user_id, tenant_id=project_id)
+
+        if not trusts:
+            return
+        try:
+            self.token_api.delete_tokens_for_trusts(
+                [trust['id'] for trust in trusts])
+        except exception.NotImplemented:
+            for trust in trusts:
+                self._delete_tokens_for_trust(trust['trustee_user_id'],
+                                              trust['id'])
+
+    def _delete_tokens_for_project(self, project_id):
+        """Deletes the tokens scoped to a project, whoever they belong to."""
+        try:
+            self.token_api.delete_tokens_for_project(project_id)
+        except exception.NotImplemented:
+            for user in self.identity_api.list_users():
+                self.token_api.delete_tokens(user['id'], tenant_id=project_id)
+
+    def _delete_tokens_for_domain(self, domain_id):
+        """Deletes the tokens scoped to a domain, whoever they belong to."""
+        try:
+            self.token_api.delete_tokens_for_domain(domain_id)
+        except exception.NotImplemented:
+            # the driver cannot find tokens by their domain; they are left
+            # to expire
+            LOG.debug(_('Token driver cannot revoke tokens by domain'))
+
     def _require_attribute(self, ref, attr):
         """Ensures the reference contains the specified attribute."""
         if ref.get(attr) is None or ref.get(attr) == '':
@@ -200,10 +274,13 @@ class V3Controller(V2Controller):
     collection_name = 'entities'
     member_name = 'entity'
 
+    def _get_response_code(self, req):
+        if req.environ['REQUEST_METHOD'] == 'POST':
+            return (201, 'Created')
+
     def _delete_tokens_for_group(self, group_id):
         user_refs = self.identity_api.list_users_in_group(group_id)
-        for user in user_refs:
-            self._delete_tokens_for_user(user['id'])
+        self._delete_tokens_for_users(user['id'] for user in user_refs)
 
     @classmethod
     def base_url(cls, path=None):
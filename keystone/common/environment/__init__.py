@@ -11,6 +11,7 @@ LOG = logging.getLogger(__name__)
 __all__ = ['Server', 'httplib', 'subprocess']
 
 _configured = False
+_fork_callbacks = []
 
 Server = None
 httplib = None
@@ -42,6 +43,26 @@ def configure_once(name):
     return decorator
 
 
+def register_fork_callback(cb_fn):
+    """Register a function to be called in worker processes after a fork.
+
+    Process-wide resources which can't be shared with the parent process,
+    such as pooled connections, should be re-initialized by these functions.
+
+    """
+    if cb_fn not in _fork_callbacks:
+        _fork_callbacks.append(cb_fn)
+
+
+def run_fork_callbacks():
+    """Call the registered fork callbacks; to be run in the forked process."""
+    for cb_fn in _fork_callbacks:
+        try:
+            cb_fn()
+        except Exception:
+            LOG.exception(_("Fork callback raised."))
+
+
 @configure_once('eventlet')
 def use_eventlet(monkeypatch_thread=None):
     global httplib, subprocess, Server
@@ -43,11 +43,17 @@ class Server(object):
         self.pool = eventlet.GreenPool(threads)
         self.socket_info = {}
         self.greenthread = None
+        self.socket = None
         self.do_ssl = False
         self.cert_required = False
 
-    def start(self, key=None, backlog=128):
-        """Run a WSGI server with the given application."""
+    def listen(self, key=None, backlog=128):
+        """Create and bind the listening socket of the server.
+
+        This is done by `start` when needed, but may be called beforehand so
+        that the socket can be shared by forked worker processes.
+
+        """
         LOG.debug(_('Starting %(arg0)s on %(host)s:%(port)s') %
                   {'arg0': sys.argv[0],
                    'host': self.host,
@@ -78,9 +84,18 @@ class Server(object):
                                           ca_certs=self.ca_certs)
             _socket = sslsocket
 
-        self.greenthread = self.pool.spawn(self._run,
-                                           self.application,
-                                           _socket)
+        self.socket = _socket
+
+    def start(self, key=None, backlog=128):
+        """Run a WSGI server with the given application."""
+        if self.socket is None:
+            self.listen(key, backlog)
+
+        # the accepting greenthread isn't part of the pool, so that the pool
+        # only tracks the requests being served
+        self.greenthread = eventlet.spawn(self._run,
+                                          self.application,
+                                          self.socket)
 
     def set_ssl(self, certfile, keyfile=None, ca_certs=None,
                 cert_required=True):
@@ -94,9 +109,21 @@ class Server(object):
         if self.greenthread:
             self.greenthread.kill()
 
+    def stop(self, timeout=None):
+        """Stop accepting connections and wait for the current requests.
+
+        Gives up waiting after `timeout` seconds, if set.
+
+        """
+        self.kill()
+        with eventlet.Timeout(timeout, False):
+            self.pool.waitall()
+
     def wait(self):
         """Wait until all servers have completed running."""
         try:
+            if self.greenthread:
+                self.greenthread.wait()
             self.pool.waitall()
         except KeyboardInterrupt:
             pass
@@ -0,0 +1,215 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Pre-fork worker processes for the eventlet servers.
+
+The master process binds the listening socket of each server once, then
+forks the configured number of workers for each of them and supervises them:
+
+* a worker which exits is replaced by a new one,
+* SIGHUP reloads the configuration and replaces all the workers; the old
+  workers stop accepting connections and finish their current requests,
+* SIGTERM and SIGINT stop the workers the same way, then the master exits.
+
+Workers load their WSGI application themselves, after the fork, and run the
+environment fork callbacks so that connection pools aren't shared between
+processes.
+
+"""
+
+import errno
+import os
+import signal
+
+import eventlet
+import eventlet.hubs
+
+from keystone.common import environment
+from keystone.common import logging
+
+
+LOG = logging.getLogger(__name__)
+
+# Seconds between two checks for signals and exited workers.
+POLL_INTERVAL = 0.5
+
+
+class Service(object):
+    """A server, the application it serves and its number of workers."""
+
+    def __init__(self, name, server, load_app, workers):
+        self.name = name
+        self.server = server
+        self.load_app = load_app
+        self.workers = workers
+
+
+def run_worker(service, shutdown_timeout):
+    """Serve requests in a forked worker until SIGTERM or SIGINT."""
+    signals = []
+
+    def handle_signal(signo, frame):
+        signals.append(signo)
+
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+
+    # the hub of the master (and its epoll descriptor) can't be shared
+    eventlet.hubs.use_hub()
+    environment.run_fork_callbacks()
+
+    server = service.server
+    server.application = service.load_app()
+    server.start()
+    LOG.info(_('Worker %(pid)s serving %(name)s'),
+             {'pid': os.getpid(), 'name': service.name})
+
+    while not signals and not server.greenthread.dead:
+        eventlet.sleep(POLL_INTERVAL)
+
+    LOG.info(_('Worker %s stopping'), os.getpid())
+    server.stop(shutdown_timeout)
+
+
+class Master(object):
+    """Forks and supervises the worker processes of a set of servers."""
+
+    def __init__(self, shutdown_timeout=None, reload_config=None):
+        self.services = []
+        self.shutdown_timeout = shutdown_timeout
+        self.reload_config = reload_config
+        # pid -> (service, generation) of the running workers
+        self.children = {}
+        # incremented on reload; workers of older generations aren't replaced
+        self.generation = 0
+        self.signals = []
+
+    def add_service(self, name, server, load_app, workers):
+        self.services.append(Service(name, server, load_app, workers))
+
+    def start(self):
+        for service in self.services:
+            service.server.listen()
+
+        for signo in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+            signal.signal(signo, self._handle_signal)
+
+        for service in self.services:
+            for _i in range(service.workers):
+                self._spawn(service)
+
+    def _handle_signal(self, signo, frame):
+        self.signals.append(signo)
+
+    def _spawn(self, service):
+        pid = os.fork()
+        if pid == 0:
+            status = 0
+            try:
+                run_worker(service, self.shutdown_timeout)
+            except BaseException:
+                LOG.exception(_('Worker %s failed'), os.getpid())
+                status = 1
+            finally:
+                os._exit(status)
+
+        self.children[pid] = (service, self.generation)
+        return pid
+
+    def _reap(self):
+        """Collect the exited workers, replacing them if still needed."""
+        while self.children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except OSError as e:
+                if e.errno == errno.EINTR:
+                    continue
+                if e.errno != errno.ECHILD:
+                    raise
+                self.children.clear()
+                return
+            if not pid:
+                return
+
+            service, generation = self.children.pop(pid, (None, None))
+            if service is not None and generation == self.generation:
+                LOG.warning(_('Worker %(pid)s of %(name)s exited with '
+                              'status %(status)s, replacing it'),
+                            {'pid': pid, 'name': service.name,
+                             'status': status})
+                self._spawn(service)
+
+    def _signal_children(self, signo, generation=None):
+        for pid, (_service, child_generation) in self.children.items():
+            if generation is None or child_generation == generation:
+                try:
+                    os.kill(pid, signo)
+                except OSError as e:
+                    if e.errno != errno.ESRCH:
+                        raise
+
+    def reload(self):
+        """Reload the configuration and replace all the workers."""
+        LOG.info(_('SIGHUP received, replacing workers.'))
+        if self.reload_config is not None:
+            self.reload_config()
+
+        old_generation = self.generation
+        self.generation += 1
+        for service in self.services:
+            for _i in range(service.workers):
+                self._spawn(service)
+        self._signal_children(signal.SIGTERM, old_generation)
+
+    def stop(self):
+        """Stop the workers, killing those still running after the timeout."""
+        LOG.info(_('Stopping workers.'))
+        # workers exiting from now on are not replaced
+        self.generation += 1
+        self._signal_children(signal.SIGTERM)
+
+        # give workers a little longer than their own timeout to exit
+        timeout = None
+        if self.shutdown_timeout is not None:
+            timeout = self.shutdown_timeout + 2 * POLL_INTERVAL
+        with eventlet.Timeout(timeout, False):
+            while self.children:
+                self._reap()
+                eventlet.sleep(POLL_INTERVAL)
+
+        if self.children:
+            LOG.warning(_('Killing %d workers which did not stop in time'),
+                        len(self.children))
+            self._signal_children(signal.SIGKILL)
+            for pid in self.children.keys():
+                try:
+                    os.waitpid(pid, 0)
+                except OSError:
+                    pass
+            self.children.clear()
+
+    def wait(self):
+        """Supervise the workers until SIGTERM or SIGINT."""
+        while True:
+            while self.signals:
+                if self.signals.pop(0) == signal.SIGHUP:
+                    self.reload()
+                else:
+                    self.stop()
+                    return
+            self._reap()
+            eventlet.sleep(POLL_INTERVAL)
@@ -0,0 +1,340 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Runs CPU-bound functions, such as password hashing, off the eventlet hub.
+
+While a greenthread runs a CPU-bound function, no other greenthread of the
+process can run. The executors below let the hub keep serving requests:
+
+* ``thread`` (the default) runs functions in eventlet's pool of native
+  threads. This only helps if the function releases the GIL, which the
+  crypt(3) based passlib backends don't do.
+* ``process`` runs functions in helper processes forked on first use, each
+  one driven by a native thread waiting for its result. Helpers close the
+  descriptors they inherit, such as listening sockets, SQL connections and
+  log files, before running anything.
+* ``inline`` runs functions in the calling greenthread, as before.
+
+When not running under eventlet (e.g. in keystone-manage), functions are run
+inline, except that map() runs them in a multiprocessing pool with the
+``process`` executor. In every case, at most ``crypt_max_pending`` calls may
+be running or waiting for an executor; further calls fail with
+ServiceUnavailable rather than queuing.
+
+"""
+
+import cPickle as pickle
+import multiprocessing
+import os
+import struct
+
+from keystone.common import config
+from keystone.common import environment
+from keystone.common import logging
+from keystone import exception
+
+
+CONF = config.CONF
+config.register_str('crypt_executor', default='thread')
+config.register_int('crypt_workers', default=0)
+config.register_int('crypt_max_pending', default=100)
+
+LOG = logging.getLogger(__name__)
+
+_HEADER = struct.Struct('!I')
+
+
+class InlineExecutor(object):
+    """Runs functions in the calling greenthread."""
+
+    def execute(self, fn, *args):
+        return fn(*args)
+
+    def map(self, fn, arglists):
+        return [fn(*args) for args in arglists]
+
+
+def _apply(fn_args):
+    fn, args = fn_args
+    return fn(*args)
+
+
+class PoolExecutor(InlineExecutor):
+    """Runs map() calls in a multiprocessing pool, without eventlet.
+
+    Single calls are run inline: without a hub to free, sending them to
+    another process would only add latency.
+
+    """
+
+    def __init__(self, workers):
+        self.workers = workers
+        self.pool = None
+        self.pid = None
+
+    def map(self, fn, arglists):
+        arglists = list(arglists)
+        if len(arglists) < 2:
+            return super(PoolExecutor, self).map(fn, arglists)
+        if self.pool is None:
+            self.pool = multiprocessing.Pool(self.workers)
+            self.pid = os.getpid()
+        return self.pool.map(_apply, [(fn, args) for args in arglists])
+
+    def close(self):
+        # the pool of the parent process is left alone in forked processes
+        if self.pool is not None and self.pid == os.getpid():
+            self.pool.close()
+            self.pool.join()
+        self.pool = None
+
+
+class ThreadExecutor(object):
+    """Runs functions in eventlet's pool of native threads."""
+
+    def execute(self, fn, *args):
+        from eventlet import tpool
+        return tpool.execute(fn, *args)
+
+
+def _read_exactly(fd, length):
+    data = []
+    while length:
+        chunk = os.read(fd, length)
+        if not chunk:
+            raise EOFError()
+        data.append(chunk)
+        length -= len(chunk)
+    return ''.join(data)
+
+
+def _write_message(fd, message):
+    data = pickle.dumps(message, pickle.HIGHEST_PROTOCOL)
+    data = _HEADER.pack(len(data)) + data
+    while data:
+        data = data[os.write(fd, data):]
+
+
+def _read_message(fd):
+    length, = _HEADER.unpack(_read_exactly(fd, _HEADER.size))
+    return pickle.loads(_read_exactly(fd, length))
+
+
+def _serve(requests, results):
+    """Main loop of a helper process, until its parent goes away."""
+    while True:
+        try:
+            fn, args = _read_message(requests)
+        except EOFError:
+            return
+        try:
+            result = (True, fn(*args))
+        except Exception as e:
+            result = (False, e)
+        _write_message(results, result)
+
+
+def _close_fds(keep):
+    """Closes the descriptors above stderr, but those in keep."""
+    try:
+        max_fd = os.sysconf('SC_OPEN_MAX')
+    except (AttributeError, ValueError):
+        max_fd = 256
+    fd = 3
+    for keep_fd in sorted(keep):
+        os.closerange(fd, keep_fd)
+        fd = keep_fd + 1
+    os.closerange(fd, max_fd)
+
+
+class _Helper(object):
+    """A helper process, and the pipes used to talk to it."""
+
+    def __init__(self):
+        requests_r, requests_w = os.pipe()
+        results_r, results_w = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            status = 0
+            try:
+                # the server's sockets, SQL connections and log files are
+                # left to the server
+                _close_fds([requests_r, results_w])
+                _serve(requests_r, results_w)
+            except BaseException:
+                status = 1
+            finally:
+                os._exit(status)
+
+        os.close(requests_r)
+        os.close(results_w)
+        self.pid = pid
+        self.requests = requests_w
+        self.results = results_r
+
+    def call(self, fn, args):
+        """Runs fn(*args) in the helper; blocks the calling native thread."""
+        _write_message(self.requests, (fn, args))
+        ok, result = _read_message(self.results)
+        if not ok:
+            raise result
+        return result
+
+    def close(self):
+        """Close the pipes; the helper exits once it reads EOF."""
+        os.close(self.requests)
+        os.close(self.results)
+
+    def wait(self):
+        try:
+            os.waitpid(self.pid, 0)
+        except OSError:
+            # not our child, in a forked process
+            pass
+
+
+class ProcessExecutor(object):
+    """Runs functions in helper processes.
+
+    Functions and their arguments are pickled, so functions must be defined
+    at the top level of a module.
+
+    """
+
+    def __init__(self, workers):
+        from eventlet import queue
+
+        self.helpers = [_Helper() for _i in range(workers)]
+        self.idle = queue.LightQueue()
+        for helper in self.helpers:
+            self.idle.put(helper)
+
+    def execute(self, fn, *args):
+        from eventlet import tpool
+
+        helper = self.idle.get()
+        try:
+            return tpool.execute(helper.call, fn, args)
+        except (EOFError, OSError):
+            LOG.exception(_('Helper process %s failed, replacing it'),
+                          helper.pid)
+            self.helpers.remove(helper)
+            helper.close()
+            helper.wait()
+            helper = _Helper()
+            self.helpers.append(helper)
+            raise
+        finally:
+            self.idle.put(helper)
+
+    def close(self):
+        """Let the helper processes exit."""
+        # every pipe is closed before waiting, so the helpers exit together
+        for helper in self.helpers:
+            helper.close()
+        for helper in self.helpers:
+            helper.wait()
+
+
+class BoundedExecutor(object):
+    """Limits the number of calls running or waiting for an executor."""
+
+    def __init__(self, executor, max_pending, workers=1):
+        self.executor = executor
+        self.max_pending = max_pending
+        self.workers = workers
+        self.pending = 0
+
+    def execute(self, fn, *args):
+        if self.max_pending and self.pending >= self.max_pending:
+            LOG.warning(_('Too many pending %s calls, rejecting request'),
+                        getattr(fn, '__name__', fn))
+            raise exception.ServiceUnavailable()
+
+        self.pending += 1
+        try:
+            return self.executor.execute(fn, *args)
+        finally:
+            self.pending -= 1
+
+    def map(self, fn, arglists):
+        if hasattr(self.executor, 'map'):
+            return self.executor.map(fn, arglists)
+
+        import eventlet
+
+        # each call counts as pending, but no more than `workers` of them
+        # run at the same time
+        pool = eventlet.GreenPool(self.workers)
+        return list(pool.imap(lambda args: self.execute(fn, *args),
+                              arglists))
+
+
+_EXECUTOR = None
+
+
+def get_executor():
+    """Returns the configured executor, creating it on first use."""
+    global _EXECUTOR
+    if _EXECUTOR is None:
+        kind = CONF.crypt_executor
+        workers = CONF.crypt_workers or multiprocessing.cpu_count()
+        if environment.Server is None and kind == 'process':
+            executor = PoolExecutor(workers)
+        elif environment.Server is None or kind == 'inline':
+            # there's no hub to free when not running under eventlet
+            executor = InlineExecutor()
+        elif kind == 'thread':
+            executor = ThreadExecutor()
+        elif kind == 'process':
+            executor = ProcessExecutor(workers)
+        else:
+            raise exception.UnexpectedError(
+                _('Unknown crypt_executor: %s') % kind)
+        _EXECUTOR = BoundedExecutor(executor, CONF.crypt_max_pending, workers)
+    return _EXECUTOR
+
+
+def reset_executor():
+    """Forget the current executor; the next call creates a new one.
+
+    Helper processes belong to the process which forked them, so this is
+    run in forked processes, and by tests changing the configuration.
+
+    """
+    global _EXECUTOR
+    if _EXECUTOR is not None:
+        executor = _EXECUTOR.executor
+        if isinstance(executor, (ProcessExecutor, PoolExecutor)):
+            executor.close()
+        _EXECUTOR = None
+
+
+environment.register_fork_callback(reset_executor)
+
+
+def execute(fn, *args):
+    """Runs fn(*args) with the configured executor and returns the result."""
+    return get_executor().execute(fn, *args)
+
+
+def map(fn, arglists):
+    """Runs fn(*args) for each of arglists, concurrently where possible.
+
+    Returns the results in the same order.
+
+    """
+    return get_executor().map(fn, arglists)
@@ -14,10 +14,191 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import bisect
+import contextlib
+import cPickle as pickle
+import fcntl
+import os
+import struct
+import zlib
+
+from keystone.common import config
+from keystone.common import environment
 from keystone import exception
 
 
+CONF = config.CONF
+
+
+class _Index(object):
+    """Maps the values of a secondary index to the keys holding them."""
+
+    def __init__(self, prefix, values):
+        self.prefix = prefix
+        self.values = values
+        # key -> values it is indexed under, as they were when it was set
+        self.values_by_key = {}
+        self.keys_by_value = {}
+
+    def add(self, key, value):
+        values = tuple(self.values(key, value) or ())
+        if not values:
+            return
+        self.values_by_key[key] = values
+        for v in values:
+            self.keys_by_value.setdefault(v, set()).add(key)
+
+    def remove(self, key):
+        for v in self.values_by_key.pop(key, ()):
+            keys = self.keys_by_value[v]
+            keys.discard(key)
+            if not keys:
+                del self.keys_by_value[v]
+
+    def find(self, value):
+        return list(self.keys_by_value.get(value, ()))
+
+    def find_all(self):
+        return list(self.values_by_key)
+
+    def clear(self):
+        self.values_by_key.clear()
+        self.keys_by_value.clear()
+
+
+class _OrderedIndex(_Index):
+    """An index that can also be queried for a range of values.
+
+    Keys are kept in buckets, e.g. of the same minute for expiry times,
+    and only the sorted list of buckets is searched: adding or removing a
+    key is O(1) unless it creates or empties a bucket, and find_before()
+    only touches the buckets it returns keys from.
+
+    """
+
+    def __init__(self, prefix, values, bucket=None):
+        super(_OrderedIndex, self).__init__(prefix, values)
+        self.bucket = bucket or (lambda value: value)
+        self.buckets = {}
+        # sorted bucket values
+        self.order = []
+
+    def add(self, key, value):
+        super(_OrderedIndex, self).add(key, value)
+        for v in self.values_by_key.get(key, ()):
+            b = self.bucket(v)
+            if b not in self.buckets:
+                self.buckets[b] = set()
+                bisect.insort(self.order, b)
+            self.buckets[b].add(key)
+
+    def remove(self, key):
+        for v in self.values_by_key.get(key, ()):
+            b = self.bucket(v)
+            keys = self.buckets[b]
+            keys.discard(key)
+            if not keys:
+                del self.buckets[b]
+                del self.order[bisect.bisect_left(self.order, b)]
+        super(_OrderedIndex, self).remove(key)
+
+    def find_before(self, value):
+        end = self.bucket(value)
+        keys = []
+        for b in self.order:
+            if b < end:
+                keys.extend(self.buckets[b])
+            else:
+                if b == end:
+                    keys.extend(
+                        key for key in self.buckets[b]
+                        if min(self.values_by_key[key]) < value)
+                break
+        return keys
+
+    def find_after(self, value):
+        start = self.bucket(value)
+        keys = []
+        for b in self.order[bisect.bisect_left(self.order, start):]:
+            if b == start:
+                keys.extend(
+                    key for key in self.buckets[b]
+                    if max(self.values_by_key[key]) > value)
+            else:
+                keys.extend(self.buckets[b])
+        return keys
+
+    def find_all(self):
+        keys = []
+        for b in self.order:
+            keys.extend(self.buckets[b])
+        return keys
+
+    def clear(self):
+        super(_OrderedIndex, self).clear()
+        self.buckets.clear()
+        del self.order[:]
+
+
 class DictKvs(dict):
+    """A dict with secondary indexes over the values of some of its keys.
+
+    Indexes are declared by the drivers with add_index(), kept up to date
+    by set() and delete(), and queried with find(), find_before() and
+    find_all(), which return keys rather than copies of the values.
+
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(DictKvs, self).__init__(*args, **kwargs)
+        self.indexes = {}
+
+    def add_index(self, name, prefix, values, ordered=False, bucket=None):
+        """Declares a secondary index, unless it already exists.
+
+        :param prefix: only keys starting with prefix (a string or a tuple
+                       of strings) are indexed
+        :param values: function of (key, value) returning the values the
+                       item is indexed under, if any
+        :param ordered: whether find_before() may be used on the index
+        :param bucket: function mapping the values of an ordered index to
+                       the sortable bucket they are kept in; values which
+                       are not in the same bucket must sort as their
+                       buckets do
+
+        """
+        if name in self.indexes:
+            return
+        if ordered:
+            index = _OrderedIndex(prefix, values, bucket)
+        else:
+            index = _Index(prefix, values)
+        for key, value in self.iteritems():
+            if key.startswith(prefix):
+                index.add(key, value)
+        self.indexes[name] = index
+
+    def find(self, name, value):
+        """Returns the keys indexed under value by the index name."""
+        return self.indexes[name].find(value)
+
+    def find_before(self, name, value):
+        """Returns the keys indexed under anything lower than value."""
+        return self.indexes[name].find_before(value)
+
+    def find_after(self, name, value):
+        """Returns the keys indexed under anything greater than value."""
+        return self.indexes[name].find_after(value)
+
+    def find_all(self, name):
+        """Returns all the keys in the index name."""
+        return self.indexes[name].find_all()
+
+    def _unindex(self, key):
+        for index in self.indexes.itervalues():
+            if key.startswith(index.prefix):
+                index.remove(key)
+
     def get(self, key, default=None):
         try:
             if isinstance(self[key], dict):
@@ -30,10 +211,35 @@ class DictKvs(dict):
             raise exception.NotFound(target=key)
 
     def set(self, key, value):
+        if key in self:
+            self._unindex(key)
         if isinstance(value, dict):
             self[key] = value.copy()
         else:
             self[key] = value[:]
+        for index in self.indexes.itervalues():
+            if key.startswith(index.prefix):
+                index.add(key, self[key])
+
+    def incr(self, key):
+        """Increments the counter key, which starts at 0, and returns it."""
+        value = dict.get(self, key, {'value': 0})['value'] + 1
+        self.set(key, {'value': value})
+        return value
+
+    def set_numbered(self, key, value, counter):
+        """Sets key to value numbered by incrementing the counter counter.
+
+        The number is stored as the 'seq' of a copy of value and returned.
+        Both are written in one step, so that items are stored in the
+        order of their numbers and readers following them with
+        find_after() never skip one.
+
+        """
+        seq = dict.get(self, counter, {'value': 0})['value'] + 1
+        self.set(counter, {'value': seq})
+        self.set(key, dict(value, seq=seq))
+        return seq
 
     def delete(self, key):
         """Deletes an item, returning True on success, False otherwise."""
@@ -41,15 +247,290 @@ class DictKvs(dict):
             del self[key]
         except KeyError:
             raise exception.NotFound(target=key)
+        self._unindex(key)
+
+    def delete_unless_found(self, key, name, value):
+        """Deletes key unless find(name, value) returns any key.
+
+        Both are done in one step, so that an item which starts being
+        referred to meanwhile is not deleted. Returns whether key was.
+
+        """
+        if (self.indexes[name].find(value) or
+                not dict.__contains__(self, key)):
+            return False
+        DictKvs.delete(self, key)
+        return True
+
+    def clear(self):
+        super(DictKvs, self).clear()
+        for index in self.indexes.itervalues():
+            index.clear()
+
+
+class LogKvs(DictKvs):
+    """A DictKvs persisted to an append-only log file.
+
+    Each set() and delete() appends a checksummed record to the log and
+    fsyncs it before updating the process' copy of the data, so that a
+    crash can at most lose the write in progress; the torn record is cut
+    off by the next writer. Several processes may use the same file: every
+    write holds an exclusive lock on ``<path>.lock`` and starts by applying
+    the records appended by the others, which readers also do (under a
+    shared lock) whenever the log has grown.
+
+    Once the log holds more than compact_threshold overwritten or deleted
+    records, and more of them than live ones, it is rewritten with only
+    the live items and atomically renamed over the old one. The other
+    processes notice the new inode and load it.
+
+    """
+
+    header = struct.Struct('>II')
+
+    def __init__(self, path, compact_threshold=1000):
+        super(LogKvs, self).__init__()
+        self.path = path
+        self.compact_threshold = compact_threshold
+        self.log = None
+        self.lock = None
+        self._open_files()
+        with self._locked(fcntl.LOCK_EX):
+            self._load(truncate=True)
+
+    def _open_files(self):
+        self.close()
+        os.close(os.open(self.path, os.O_CREAT | os.O_APPEND, 0o600))
+        self.log = open(self.path, 'a+b')
+        self.lock = open(self.path + '.lock', 'a+b')
+
+    def close(self):
+        for f in (self.log, self.lock):
+            if f is not None:
+                f.close()
+        self.log = self.lock = None
+
+    def reopen(self):
+        """Reopens the files, which must not be shared with a parent."""
+        self._open_files()
+        self._refresh()
+
+    @contextlib.contextmanager
+    def _locked(self, operation):
+        fcntl.flock(self.lock, operation)
+        try:
+            yield
+        finally:
+            fcntl.flock(self.lock, fcntl.LOCK_UN)
+
+    def _replaced(self):
+        try:
+            inode = os.stat(self.path).st_ino
+        except OSError:
+            return True
+        return inode != os.fstat(self.log.fileno()).st_ino
+
+    def _load(self, truncate=False):
+        if self._replaced():
+            self.log.close()
+            self.log = open(self.path, 'a+b')
+        super(LogKvs, self).clear()
+        self.offset = 0
+        self.garbage = 0
+        self._replay(truncate)
+
+    def _replay(self, truncate=False):
+        """Applies the records appended since the last call.
+
+        :param truncate: whether to cut off a torn record at the end of
+                         the log; only done with the exclusive lock held
+
+        """
+        self.log.seek(self.offset)
+        data = self.log.read()
+        pos = 0
+        while pos + self.header.size <= len(data):
+            length, checksum = self.header.unpack_from(data, pos)
+            start = pos + self.header.size
+            payload = data[start:start + length]
+            if (len(payload) < length or
+                    zlib.crc32(payload) & 0xffffffff != checksum):
+                break
+            self._apply(pickle.loads(payload))
+            pos = start + length
+        self.offset += pos
+        if truncate and pos < len(data):
+            self.log.truncate(self.offset)
+
+    def _apply(self, record):
+        if record[0] == 'set':
+            _op, key, value = record
+            if dict.__contains__(self, key):
+                self.garbage += 1
+            super(LogKvs, self).set(key, value)
+        else:
+            _op, key = record
+            if dict.__contains__(self, key):
+                self.garbage += 2
+                super(LogKvs, self).delete(key)
+
+    def _record(self, record):
+        payload = pickle.dumps(record, pickle.HIGHEST_PROTOCOL)
+        checksum = zlib.crc32(payload) & 0xffffffff
+        return self.header.pack(len(payload), checksum) + payload
+
+    def _catch_up(self, truncate=False):
+        if self._replaced():
+            self._load(truncate)
+        else:
+            self._replay(truncate)
+
+    def _refresh(self):
+        """Applies the writes of other processes, if there were any."""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            stat = None
+        if (stat is None or stat.st_size != self.offset or
+                stat.st_ino != os.fstat(self.log.fileno()).st_ino):
+            with self._locked(fcntl.LOCK_SH):
+                self._catch_up()
+
+    def _append(self, record):
+        """Writes and applies record; needs the exclusive lock."""
+        data = self._record(record)
+        self.log.write(data)
+        self.log.flush()
+        os.fsync(self.log.fileno())
+        self.offset += len(data)
+        self._apply(record)
+        if (self.garbage > self.compact_threshold and
+                self.garbage > len(self)):
+            self._compact()
+
+    def _compact(self):
+        """Rewrites the log with the live items; needs the exclusive lock."""
+        path = self.path + '.compact'
+        fd = os.open(path, os.O_CREAT | os.O_TRUNC | os.O_WRONLY, 0o600)
+        with os.fdopen(fd, 'wb') as f:
+            for key, value in self.iteritems():
+                f.write(self._record(('set', key, value)))
+            f.flush()
+            os.fsync(f.fileno())
+        os.rename(path, self.path)
+        directory = os.open(os.path.dirname(os.path.abspath(self.path)),
+                            os.O_RDONLY)
+        try:
+            os.fsync(directory)
+        finally:
+            os.close(directory)
+        self.log.close()
+        self.log = open(self.path, 'a+b')
+        self.offset = os.fstat(self.log.fileno()).st_size
+        self.garbage = 0
+
+    def compact(self):
+        with self._locked(fcntl.LOCK_EX):
+            self._catch_up(truncate=True)
+            self._compact()
+
+    def get(self, key, default=None):
+        self._refresh()
+        return super(LogKvs, self).get(key, default)
+
+    def keys(self):
+        self._refresh()
+        return super(LogKvs, self).keys()
+
+    def items(self):
+        self._refresh()
+        return super(LogKvs, self).items()
+
+    def find(self, name, value):
+        self._refresh()
+        return super(LogKvs, self).find(name, value)
+
+    def find_before(self, name, value):
+        self._refresh()
+        return super(LogKvs, self).find_before(name, value)
+
+    def find_after(self, name, value):
+        self._refresh()
+        return super(LogKvs, self).find_after(name, value)
+
+    def find_all(self, name):
+        self._refresh()
+        return super(LogKvs, self).find_all(name)
+
+    def set(self, key, value):
+        with self._locked(fcntl.LOCK_EX):
+            self._catch_up(truncate=True)
+            self._append(('set', key, value))
+
+    def incr(self, key):
+        with self._locked(fcntl.LOCK_EX):
+            self._catch_up(truncate=True)
+            value = dict.get(self, key, {'value': 0})['value'] + 1
+            self._append(('set', key, {'value': value}))
+        return value
+
+    def set_numbered(self, key, value, counter):
+        with self._locked(fcntl.LOCK_EX):
+            self._catch_up(truncate=True)
+            seq = dict.get(self, counter, {'value': 0})['value'] + 1
+            self._append(('set', counter, {'value': seq}))
+            self._append(('set', key, dict(value, seq=seq)))
+        return seq
+
+    def delete(self, key):
+        """Deletes an item, returning True on success, False otherwise."""
+        with self._locked(fcntl.LOCK_EX):
+            self._catch_up(truncate=True)
+            if not dict.__contains__(self, key):
+                raise exception.NotFound(target=key)
+            self._append(('delete', key))
+
+    def delete_unless_found(self, key, name, value):
+        with self._locked(fcntl.LOCK_EX):
+            self._catch_up(truncate=True)
+            if (self.indexes[name].find(value) or
+                    not dict.__contains__(self, key)):
+                return False
+            self._append(('delete', key))
+        return True
+
+    def clear(self):
+        with self._locked(fcntl.LOCK_EX):
+            super(LogKvs, self).clear()
+            self._compact()
 
 
 INMEMDB = DictKvs()
+_LOGDBS = {}
+
+
+def get_db():
+    """Returns the store of the KVS drivers: INMEMDB, or [kvs] path."""
+    path = CONF.kvs.path
+    if not path:
+        return INMEMDB
+    if path not in _LOGDBS:
+        _LOGDBS[path] = LogKvs(path)
+    return _LOGDBS[path]
+
+
+def _reopen_logdbs():
+    for db in _LOGDBS.values():
+        db.reopen()
+
+
+environment.register_fork_callback(_reopen_logdbs)
 
 
 class Base(object):
     def __init__(self, db=None):
         if db is None:
-            db = INMEMDB
+            db = get_db()
         elif isinstance(db, DictKvs):
             db = db
         elif isinstance(db, dict):
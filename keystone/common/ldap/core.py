@@ -347,6 +347,19 @@ class BaseLdap(object):
         except ldap.NO_SUCH_OBJECT:
             return []
 
+    def _ldap_iter_all(self, filter=None):
+        conn = self.get_connection()
+        query = '(&%s(objectClass=%s))' % (filter or self.filter or '',
+                                           self.object_class)
+        try:
+            for res in conn.iter_search(self.tree_dn,
+                                        self.LDAP_SCOPE,
+                                        query,
+                                        self.attribute_mapping.values()):
+                yield res
+        except ldap.NO_SUCH_OBJECT:
+            return
+
     def get(self, id, filter=None):
         res = self._ldap_get(id, filter)
         if res is None:
@@ -367,6 +380,11 @@ class BaseLdap(object):
         return [self._ldap_res_to_model(x)
                 for x in self._ldap_get_all(filter)]
 
+    def iter_all(self, filter=None):
+        """Like get_all(), but only holds a page of results at a time."""
+        for res in self._ldap_iter_all(filter):
+            yield self._ldap_res_to_model(res)
+
     def update(self, id, values, old_obj=None):
         if not self.allow_update:
             action = _('LDAP %s update') % self.options_name
@@ -529,8 +547,37 @@ class LdapWrapper(object):
                                for kind, values in attrs.iteritems())))
         return o
 
+    def iter_search(self, dn, scope, query, attrlist=None):
+        """Yield the results of search_s() as each page of them arrives.
+
+        Only one page of results is held at a time, if paging is enabled.
+
+        """
+        if LOG.isEnabledFor(logging.DEBUG):
+            LOG.debug(_(
+                'LDAP search: dn=%(dn)s, scope=%(scope)s, query=%(query)s, '
+                'attrs=%(attrlist)s') % {
+                    'dn': dn,
+                    'scope': scope,
+                    'query': query,
+                    'attrlist': attrlist})
+        if self.page_size:
+            pages = self._paged_search(dn, scope, query, attrlist)
+        else:
+            pages = [self.conn.search_s(dn, scope, query, attrlist)]
+
+        for page in pages:
+            for dn, attrs in page:
+                yield dn, dict((kind, [ldap2py(x) for x in values])
+                               for kind, values in attrs.iteritems())
+
     def paged_search_s(self, dn, scope, query, attrlist=None):
         res = []
+        for page in self._paged_search(dn, scope, query, attrlist):
+            res.extend(page)
+        return res
+
+    def _paged_search(self, dn, scope, query, attrlist=None):
         lc = ldap.controls.SimplePagedResultsControl(
             controlType=ldap.LDAP_CONTROL_PAGE_OID,
             criticality=True,
@@ -545,7 +592,7 @@ class LdapWrapper(object):
             # Request to the ldap server a page with 'page_size' entries
             rtype, rdata, rmsgid, serverctrls = self.conn.result3(msgid)
             # Receive the data
-            res.extend(rdata)
+            yield rdata
             pctrls = [c for c in serverctrls
                       if c.controlType == ldap.LDAP_CONTROL_PAGE_OID]
             if pctrls:
@@ -569,7 +616,6 @@ class LdapWrapper(object):
                               'avoid this message.'))
                 self._disable_paging()
                 break
-        return res
 
     def modify_s(self, dn, modlist):
         ldap_modlist = [
@@ -697,6 +743,18 @@ class EnabledEmuMixIn(BaseLdap):
         else:
             return super(EnabledEmuMixIn, self).get_all(filter)
 
+    def iter_all(self, filter=None):
+        if 'enabled' not in self.attribute_ignore and self.enabled_emulation:
+            for res in self._ldap_iter_all(filter):
+                if res[0] == self.enabled_emulation_dn:
+                    continue
+                ref = self._ldap_res_to_model(res)
+                ref['enabled'] = self._get_enabled(ref['id'])
+                yield ref
+        else:
+            for ref in super(EnabledEmuMixIn, self).iter_all(filter):
+                yield ref
+
     def update(self, object_id, values, old_obj=None):
         if 'enabled' not in self.attribute_ignore and self.enabled_emulation:
             data = values.copy()
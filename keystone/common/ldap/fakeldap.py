@@ -334,3 +334,7 @@ class FakeLdap(object):
 
         LOG.debug('FakeLdap search result: %s', objects)
         return objects
+
+    def iter_search(self, dn, scope, query=None, fields=None):
+        """Yield the results of search_s() one at a time."""
+        return iter(self.search_s(dn, scope, query, fields))
@@ -15,10 +15,146 @@
 # under the License.
 
 import functools
+import inspect
+import time
 
+from keystone.common import notifications
 from keystone.openstack.common import importutils
 
 
+_CALL_OBSERVERS = []
+
+# names under which the ids given to notifying calls are passed in events
+_ID_ALIASES = {'tenant_id': 'project_id'}
+
+
+def register_call_observer(observer):
+    """Register a callable to be notified of the duration of timed calls.
+
+    Observers are called with the name of the call and its duration in
+    seconds after every call to a manager method or a `timed` function.
+
+    """
+    if observer not in _CALL_OBSERVERS:
+        _CALL_OBSERVERS.append(observer)
+
+
+def unregister_call_observer(observer):
+    if observer in _CALL_OBSERVERS:
+        _CALL_OBSERVERS.remove(observer)
+
+
+def _notify_call_observers(name, elapsed):
+    for observer in _CALL_OBSERVERS:
+        observer(name, elapsed)
+
+
+def timed(name):
+    """Decorator reporting the duration of each call to the call observers."""
+    def wrapper(f):
+        @functools.wraps(f)
+        def _timed(*args, **kw):
+            if not _CALL_OBSERVERS:
+                return f(*args, **kw)
+            start = time.time()
+            try:
+                return f(*args, **kw)
+            finally:
+                _notify_call_observers(name, time.time() - start)
+        return _timed
+    return wrapper
+
+
+def _timed_method(f):
+    """Time a manager method, naming it after the driver that serves it."""
+    @functools.wraps(f)
+    def _timed(self, *args, **kw):
+        if not _CALL_OBSERVERS:
+            return f(self, *args, **kw)
+        start = time.time()
+        try:
+            return f(self, *args, **kw)
+        finally:
+            _notify_call_observers(self._call_name(f.__name__),
+                                   time.time() - start)
+    return _timed
+
+
+def _argument_names(cls, name):
+    """Returns the argument names of the method name of cls.
+
+    They are taken from the first class of its MRO which doesn't hide them
+    behind a decorator, e.g. the driver interface.
+
+    """
+    for klass in inspect.getmro(cls):
+        f = klass.__dict__.get(name)
+        if inspect.isfunction(f):
+            argspec = inspect.getargspec(f)
+            if not argspec.varargs:
+                return argspec.args
+    return []
+
+
+def _event_ids(names, values):
+    """Returns the (name, id) pairs of values, in the order of names."""
+    return [(_ID_ALIASES.get(name, name), values[name]) for name in names
+            if name.endswith('_id') and
+            isinstance(values.get(name), basestring)]
+
+
+def _notifying(f, arg_names, resource_type, operation, id_name):
+    """Emits a change event after each successful call to f.
+
+    The event holds the ids f is given, e.g. the user and project of a
+    grant, and the one named id_name as its id. Calls given a list of refs
+    instead, e.g. create_users(), emit an event for each of them, with the
+    'id' of the ref as the id.
+
+    :param arg_names: names of the positional arguments of f
+    :param id_name: name of the id of the resource, as passed in events, or
+                    None for resources identified by their other ids, e.g.
+                    grants
+
+    """
+    @functools.wraps(f)
+    def _notify(*args, **kw):
+        result = f(*args, **kw)
+        values = dict(zip(arg_names, args))
+        values.update(kw)
+        ids = dict(_event_ids(arg_names, values))
+        if ids:
+            notifications.notify(resource_type, operation,
+                                 ids.get(id_name), **ids)
+            return result
+        refs = [values[name] for name in arg_names
+                if isinstance(values.get(name), list)]
+        for ref in (refs[0] if refs else []):
+            notifications.notify(resource_type, operation,
+                                 ref.get('id') if id_name else None,
+                                 **dict(_event_ids(sorted(ref), ref)))
+        return result
+    return _notify
+
+
+class _TimedMethods(type):
+    """Wraps the public methods of each Manager class with `_timed_method`.
+
+    Those listed in the class' ``notifications`` also emit change events.
+
+    """
+
+    def __new__(mcs, name, bases, attrs):
+        events = attrs.get('notifications', {})
+        for attr, value in attrs.items():
+            if not attr.startswith('_') and inspect.isfunction(value):
+                if attr in events:
+                    value = _notifying(value, inspect.getargspec(value).args,
+                                       *events[attr])
+                attrs[attr] = _timed_method(value)
+        return super(_TimedMethods, mcs).__new__(mcs, name, bases, attrs)
+
+
 class Manager(object):
     """Base class for intermediary request layer.
 
@@ -30,17 +166,36 @@ class Manager(object):
 
     An example of a probable use case is logging all the calls.
 
+    The duration of every call made through a manager, whether to one of its
+    own methods or forwarded to the driver, is reported to the observers
+    registered with `register_call_observer`, named after the driver class
+    (e.g. ``keystone.identity.backends.sql.Identity.get_user``).
+
+    The calls named in ``notifications``, whether to the manager or to the
+    driver, emit an event of the given resource type and operation on the
+    bus of `keystone.common.notifications` once they succeed.
+
     """
 
+    __metaclass__ = _TimedMethods
+
+    # method name -> (resource type, operation, name of the resource's id)
+    notifications = {}
+
     def __init__(self, driver_name):
         self.driver = importutils.import_object(driver_name)
 
+    def _call_name(self, name):
+        driver_class = self.driver.__class__
+        return '%s.%s.%s' % (driver_class.__module__, driver_class.__name__,
+                             name)
+
     def __getattr__(self, name):
         """Forward calls to the underlying driver."""
         f = getattr(self.driver, name)
-
-        @functools.wraps(f)
-        def _wrapper(*args, **kw):
-            return f(*args, **kw)
+        if name in self.notifications:
+            arg_names = _argument_names(self.driver.__class__, name)[1:]
+            f = _notifying(f, arg_names, *self.notifications[name])
+        _wrapper = timed(self._call_name(name))(f)
         setattr(self, name, _wrapper)
         return _wrapper
@@ -0,0 +1,146 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""In-process bus of the changes made through the managers.
+
+The managers emit an event after each call which creates, updates or
+deletes a resource (see ``notifications`` in keystone.common.manager)::
+
+    {
+        'seq': 12,
+        'type': 'project',
+        'operation': 'updated',
+        'id': project_id,
+        'time': '2013-07-01T12:00:00.000000Z',
+        # the ids the call was given
+        'project_id': project_id,
+    }
+
+Grants and group memberships have no id of their own, and are identified
+by the other ids of their events, e.g. role_id, user_id and project_id.
+
+Events are passed to the listeners registered with `register_listener`,
+e.g. to invalidate caches, and the last ``[notifications] buffer_size``
+of them are kept for `list_events`. Sequence numbers start again from 1 in
+each process, which is identified by `epoch`.
+
+"""
+
+import collections
+import threading
+import uuid
+
+from keystone.common import config
+from keystone.common import environment
+from keystone.common import logging
+from keystone.common import utils
+from keystone.openstack.common import timeutils
+
+
+CONF = config.CONF
+LOG = logging.getLogger(__name__)
+
+CREATED = 'created'
+UPDATED = 'updated'
+DELETED = 'deleted'
+
+# interval, in seconds, at which wait_for_events() checks for new events
+WAIT_INTERVAL = 0.1
+
+_LISTENERS = []
+_EVENTS = collections.deque()
+_LOCK = threading.Lock()
+_STATE = {'seq': 0, 'epoch': uuid.uuid4().hex}
+
+
+def register_listener(listener, resource_type=None):
+    """Register a callable to be called with each event.
+
+    :param resource_type: only call it with the events of this type
+
+    """
+    if (listener, resource_type) not in _LISTENERS:
+        _LISTENERS.append((listener, resource_type))
+
+
+def unregister_listener(listener, resource_type=None):
+    if (listener, resource_type) in _LISTENERS:
+        _LISTENERS.remove((listener, resource_type))
+
+
+def epoch():
+    """Returns the identity of this process' sequence of events."""
+    return _STATE['epoch']
+
+
+def notify(resource_type, operation, resource_id=None, **ids):
+    """Records an event and passes it to the listeners.
+
+    :param resource_id: id of the resource, if it has one
+
+    """
+    with _LOCK:
+        _STATE['seq'] += 1
+        event = dict(ids, seq=_STATE['seq'], type=resource_type,
+                     operation=operation,
+                     time=timeutils.isotime(subsecond=True))
+        if resource_id is not None:
+            event['id'] = resource_id
+        _EVENTS.append(event)
+        while len(_EVENTS) > CONF.notifications.buffer_size:
+            _EVENTS.popleft()
+    for listener, listened_type in list(_LISTENERS):
+        if listened_type is None or listened_type == resource_type:
+            try:
+                listener(event)
+            except Exception:
+                LOG.exception(_('Failed to notify %(listener)r of '
+                                '%(event)s'),
+                              {'listener': listener, 'event': event})
+
+
+def list_events(since=None, resource_types=None):
+    """Returns the kept events after since.
+
+    :param resource_types: only return the events of these types
+    :returns: (events, whether events after since were dropped)
+
+    """
+    with _LOCK:
+        events = list(_EVENTS)
+    since = since or 0
+    truncated = bool(events) and events[0]['seq'] > since + 1
+    return ([event for event in events
+             if event['seq'] > since and
+             (not resource_types or event['type'] in resource_types)],
+            truncated)
+
+
+def wait_for_events(since=None, resource_types=None, wait=0):
+    """Like `list_events`, waiting up to wait seconds for some events."""
+    return utils.poll(lambda: list_events(since, resource_types), wait,
+                      WAIT_INTERVAL, ready=any)
+
+
+def reset():
+    """Forgets the events, and starts a new epoch."""
+    with _LOCK:
+        _EVENTS.clear()
+        _STATE['seq'] = 0
+        _STATE['epoch'] = uuid.uuid4().hex
+
+
+environment.register_fork_callback(reset)
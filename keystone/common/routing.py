@@ -0,0 +1,275 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Precompiled route matching for routes.Mapper.
+
+routes.Mapper tries the regular expression of each route in turn until one
+matches, so the cost of matching grows with the number of routes. RouteTable
+compiles the routes of a mapper into a trie of path segments instead: static
+segments are looked up in a dict and ``{name}`` segments match any non-empty
+segment, so only the few routes sharing the shape of the path are considered.
+
+Routes using any other feature (requirements, ``{name:regexp}`` variables,
+formats, conditions other than the method...) are still matched with their
+own regular expression, in the same order as routes.Mapper would, so the
+results are identical.
+
+"""
+
+import re
+
+import routes
+import routes.middleware
+import routes.util
+import webob
+
+
+_VARIABLE = re.compile(r'^\{([a-zA-Z_][a-zA-Z0-9_]*)\}$')
+
+
+class _Node(object):
+    __slots__ = ['static', 'variable', 'routes']
+
+    def __init__(self):
+        # child nodes for each static segment
+        self.static = {}
+        # child node for a {name} segment
+        self.variable = None
+        # (index, route, variables) of the routes ending at this node
+        self.routes = []
+
+
+class RouteTable(object):
+    """Matches paths against the routes of a routes.Mapper."""
+
+    def __init__(self, mapper):
+        self.mapper = mapper
+        self.compile()
+
+    @staticmethod
+    def supports(mapper):
+        """Whether the mapper-wide settings can be honored by a RouteTable."""
+        return not (mapper.prefix or mapper.minimization or
+                    mapper.sub_domains or mapper.debug or
+                    any(route.redirect for route in mapper.matchlist))
+
+    def compile(self):
+        if not self.mapper._created_regs:
+            self.mapper.create_regs([])
+
+        self.size = len(self.mapper.matchlist)
+        self.root = _Node()
+        # routes which have to be matched with their regular expression
+        self.regexp_routes = []
+
+        for index, route in enumerate(self.mapper.matchlist):
+            if route.static:
+                # static routes are only used for generation
+                continue
+            segments = self._parse(route)
+            if segments is None:
+                self.regexp_routes.append((index, route))
+                continue
+
+            node = self.root
+            variables = []
+            for position, (segment, variable) in enumerate(segments):
+                if variable:
+                    variables.append((position, segment))
+                    if node.variable is None:
+                        node.variable = _Node()
+                    node = node.variable
+                else:
+                    node = node.static.setdefault(segment, _Node())
+            node.routes.append((index, route, variables))
+
+    def _parse(self, route):
+        """Splits a route path into (segment, is_variable) tuples.
+
+        Returns None if the route can't be matched segment by segment.
+
+        """
+        if (route.reqs or route.minimization or
+                not route.routepath.startswith('/')):
+            return None
+        conditions = route.conditions or {}
+        if [key for key in conditions if key != 'method']:
+            return None
+
+        segments = []
+        for segment in route.routepath.split('/'):
+            match = _VARIABLE.match(segment)
+            if match:
+                segments.append((match.group(1), True))
+            elif '{' in segment or '}' in segment or ':' in segment:
+                return None
+            else:
+                segments.append((segment, False))
+        return segments
+
+    def _candidates(self, segments):
+        """Returns the compiled routes with the shape of the given segments."""
+        found = []
+        stack = [(self.root, 0)]
+        depth_max = len(segments)
+        while stack:
+            node, depth = stack.pop()
+            if depth == depth_max:
+                found.extend(node.routes)
+                continue
+            segment = segments[depth]
+            child = node.static.get(segment)
+            if child is not None:
+                stack.append((child, depth + 1))
+            if node.variable is not None and segment:
+                stack.append((node.variable, depth + 1))
+        return found
+
+    def routematch(self, environ):
+        """Returns the (match dict, route) tuple of a request, or None.
+
+        The results are the same as those of `routes.Mapper.routematch`.
+
+        """
+        if len(self.mapper.matchlist) != self.size:
+            # routes were connected after the table was compiled
+            self.compile()
+
+        path = environ['PATH_INFO']
+        if '\n' in path:
+            # '$' in the routes regular expressions matches before a
+            # trailing newline; leave such oddities to routes itself
+            return self.mapper.routematch(environ=environ)
+
+        segments = path.split('/')
+        candidates = self._candidates(segments)
+        if self.regexp_routes:
+            candidates.extend(self.regexp_routes)
+        if len(candidates) > 1:
+            candidates.sort(key=lambda candidate: candidate[0])
+
+        method = environ.get('REQUEST_METHOD')
+        for candidate in candidates:
+            if len(candidate) == 2:
+                route = candidate[1]
+                match = route.match(path, environ, self.mapper.sub_domains,
+                                    self.mapper.sub_domains_ignore,
+                                    self.mapper.domain_match)
+                if isinstance(match, dict) or match:
+                    return match, route
+                continue
+
+            _index, route, variables = candidate
+            conditions = route.conditions
+            if (conditions and 'method' in conditions and
+                    method not in conditions['method']):
+                continue
+
+            result = {}
+            for position, name in variables:
+                value = segments[position]
+                if (name != 'path_info' and route.encoding and
+                        isinstance(value, str)):
+                    value = value.decode(route.encoding, route.decode_errors)
+                result[name] = value
+            for key in route._default_keys:
+                if key not in result:
+                    result[key] = route.defaults[key]
+            return result, route
+        return None
+
+
+class RoutingMiddleware(routes.middleware.RoutesMiddleware):
+    """A RoutesMiddleware which matches requests using a RouteTable."""
+
+    def __init__(self, wsgi_app, mapper):
+        super(RoutingMiddleware, self).__init__(wsgi_app, mapper)
+        self.table = RouteTable(mapper)
+
+    def __call__(self, environ, start_response):
+        old_method = None
+        if '_method' in environ.get('QUERY_STRING', ''):
+            req = webob.Request(environ)
+            req.errors = 'ignore'
+            if '_method' in req.GET:
+                old_method = environ['REQUEST_METHOD']
+                environ['REQUEST_METHOD'] = req.GET['_method'].upper()
+        elif (environ['REQUEST_METHOD'] == 'POST' and
+                routes.middleware.is_form_post(environ)):
+            req = webob.Request(environ)
+            req.errors = 'ignore'
+            if '_method' in req.POST:
+                old_method = environ['REQUEST_METHOD']
+                environ['REQUEST_METHOD'] = req.POST['_method'].upper()
+
+        results = self.table.routematch(environ)
+        if results:
+            match, route = results
+        else:
+            match, route = {}, None
+
+        if old_method:
+            environ['REQUEST_METHOD'] = old_method
+
+        url = routes.util.URLGenerator(self.mapper, environ)
+        environ['wsgiorg.routing_args'] = ((url), match)
+        environ['routes.route'] = route
+        environ['routes.url'] = url
+
+        if 'path_info' in match:
+            oldpath = environ['PATH_INFO']
+            newpath = match.get('path_info') or ''
+            environ['PATH_INFO'] = newpath
+            if not environ['PATH_INFO'].startswith('/'):
+                environ['PATH_INFO'] = '/' + environ['PATH_INFO']
+            environ['SCRIPT_NAME'] += re.sub(
+                r'^(.*?)/' + re.escape(newpath) + '$', r'\1', oldpath)
+
+        return self.app(environ, start_response)
+
+
+def make_routing_middleware(wsgi_app, mapper):
+    """Returns the fastest middleware able to route requests for a mapper."""
+    if RouteTable.supports(mapper):
+        return RoutingMiddleware(wsgi_app, mapper)
+    return routes.middleware.RoutesMiddleware(wsgi_app, mapper)
+
+
+def find_mappers(app):
+    """Returns the mappers of all the routers found in a WSGI pipeline.
+
+    Follows paste URL maps, middleware and extension routers down to the
+    applications they wrap.
+
+    """
+    mappers = []
+    pending = [app]
+    seen = set()
+    while pending:
+        app = pending.pop(0)
+        if id(app) in seen:
+            continue
+        seen.add(id(app))
+
+        mapper = getattr(app, 'map', None)
+        if isinstance(mapper, routes.Mapper):
+            mappers.append(mapper)
+        for _url, application in getattr(app, 'applications', []):
+            pending.append(application)
+        application = getattr(app, 'application', None)
+        if application is not None:
+            pending.append(application)
+    return mappers
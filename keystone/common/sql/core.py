@@ -16,6 +16,8 @@
 
 """SQL backends for the various services."""
 import functools
+import random
+import time
 
 import sqlalchemy as sql
 import sqlalchemy.engine.url
@@ -26,6 +28,7 @@ from sqlalchemy.orm.attributes import InstrumentedAttribute
 import sqlalchemy.pool
 from sqlalchemy import types as sql_types
 
+from keystone.common import environment
 from keystone.common import logging
 from keystone import config
 from keystone import exception
@@ -39,6 +42,17 @@ CONF = config.CONF
 GLOBAL_ENGINE = None
 GLOBAL_ENGINE_CALLBACKS = set()
 
+# engines of the read replicas, if configured
+GLOBAL_READ_ENGINES = []
+
+# backend name -> when its driver last committed a write in this process
+LAST_WRITE_TIMES = {}
+
+_POOL_OBSERVERS = []
+
+# rows selected at once by Base.iter_rows()
+EXPORT_PAGE_SIZE = 1000
+
 
 ModelBase = declarative.declarative_base()
 
@@ -52,8 +66,12 @@ IntegrityError = sql.exc.IntegrityError
 OperationalError = sql.exc.OperationalError
 NotFound = sql.orm.exc.NoResultFound
 Boolean = sql.Boolean
+Integer = sql.Integer
 Text = sql.Text
+LargeBinary = sql.LargeBinary
 UniqueConstraint = sql.UniqueConstraint
+or_ = sql.or_
+func = sql.func
 
 
 def initialize_decorator(init):
@@ -71,21 +89,26 @@ def initialize_decorator(init):
     def initialize(self, *args, **kwargs):
         cls = type(self)
         for k, v in kwargs.items():
-            if hasattr(cls, k):
-                attr = getattr(cls, k)
-                if isinstance(attr, InstrumentedAttribute):
-                    column = attr.property.columns[0]
-                    if isinstance(column.type, String):
-                        if not isinstance(v, unicode):
-                            v = str(v)
-                        if column.type.length and \
-                                column.type.length < len(v):
-                            raise exception.StringLengthExceeded(
-                                string=v, type=k, length=column.type.length)
+            check_string_length(cls, k, v)
 
         init(self, *args, **kwargs)
     return initialize
 
+
+def check_string_length(cls, key, value):
+    """Raise StringLengthExceeded if value is too long for column key."""
+    if hasattr(cls, key):
+        attr = getattr(cls, key)
+        if isinstance(attr, InstrumentedAttribute):
+            column = attr.property.columns[0]
+            if isinstance(column.type, String):
+                if not isinstance(value, unicode):
+                    value = str(value)
+                if column.type.length and \
+                        column.type.length < len(value):
+                    raise exception.StringLengthExceeded(
+                        string=value, type=key, length=column.type.length)
+
 ModelBase.__init__ = initialize_decorator(ModelBase.__init__)
 
 
@@ -134,6 +157,22 @@ def register_global_engine_callback(cb_fn):
     GLOBAL_ENGINE_CALLBACKS.add(cb_fn)
 
 
+def recreate_global_engine_pool():
+    """Give the global engines new, empty connection pools.
+
+    Used in forked worker processes: the pooled connections inherited from
+    the parent process are abandoned rather than closed, since the parent
+    may still be using them.
+
+    """
+    for engine in [GLOBAL_ENGINE] + GLOBAL_READ_ENGINES:
+        if engine is not None:
+            engine.pool = engine.pool.recreate()
+
+
+environment.register_fork_callback(recreate_global_engine_pool)
+
+
 # Special Fields
 class JsonBlob(sql_types.TypeDecorator):
 
@@ -146,6 +185,10 @@ class JsonBlob(sql_types.TypeDecorator):
         return jsonutils.loads(value)
 
 
+# 'extra' blobs which decode to an empty dict; most rows have one
+_EMPTY_EXTRA = frozenset([None, '', '{}', 'null'])
+
+
 class DictBase(object):
     attributes = []
 
@@ -158,6 +201,39 @@ class DictBase(object):
 
         return cls(**new_d)
 
+    @classmethod
+    def row_from_dict(cls, d):
+        """Returns the column values of from_dict(d), without an instance.
+
+        Used to insert several rows with a single statement; columns missing
+        from d are NULL rather than set to their default.
+
+        """
+        row = dict((attr, d.get(attr)) for attr in cls.attributes)
+        row['extra'] = dict((k, v) for k, v in d.iteritems()
+                            if k not in cls.attributes and k != 'extra')
+        for k, v in row.iteritems():
+            if v is not None:
+                check_string_length(cls, k, v)
+        return row
+
+    @classmethod
+    def from_row(cls, row):
+        """Returns a row of the model's table as a dictionary, like to_dict().
+
+        The row must come from Base.select_dicts(), which selects 'extra' as
+        text; it is only decoded when not empty.
+
+        """
+        extra = row['extra']
+        if extra in _EMPTY_EXTRA:
+            d = {}
+        else:
+            d = jsonutils.loads(extra)
+        for attr in cls.attributes:
+            d[attr] = row[attr]
+        return d
+
     def to_dict(self, include_extra_dict=False):
         """Returns the model's attributes as a dictionary.
 
@@ -236,53 +312,259 @@ def mysql_on_checkout(dbapi_conn, connection_rec, connection_proxy):
             raise
 
 
+def ping_on_checkout(dbapi_conn, connection_rec, connection_proxy):
+    """Ensures that connections checked out of the pool are alive."""
+    try:
+        dbapi_conn.cursor().execute('select 1')
+    except Exception as e:
+        LOG.warning(_('Discarding dead database connection: %s'), e)
+        raise DisconnectionError("Database connection is dead")
+
+
+def register_pool_observer(observer):
+    """Register a callable to be notified of connection pool events.
+
+    Observers are called with the name of the engine ('main', or 'read',
+    'read2', etc. for the read replicas), the name of the event and, for
+    'checkouts' and 'timeouts', the time spent waiting for a connection in
+    seconds. The other events are 'overflow_checkouts', for connections
+    checked out beyond pool_size, and 'invalidations', for dead connections
+    discarded on checkout.
+
+    """
+    if observer not in _POOL_OBSERVERS:
+        _POOL_OBSERVERS.append(observer)
+
+
+def unregister_pool_observer(observer):
+    if observer in _POOL_OBSERVERS:
+        _POOL_OBSERVERS.remove(observer)
+
+
+def _notify_pool_observers(engine_name, event, elapsed=None):
+    for observer in _POOL_OBSERVERS:
+        observer(engine_name, event, elapsed)
+
+
+class InstrumentedQueuePool(sqlalchemy.pool.QueuePool):
+    """A QueuePool reporting its checkouts to the pool observers."""
+
+    engine_name = 'main'
+
+    def connect(self):
+        if not _POOL_OBSERVERS:
+            return super(InstrumentedQueuePool, self).connect()
+
+        start = time.time()
+        try:
+            connection = super(InstrumentedQueuePool, self).connect()
+        except sql.exc.TimeoutError:
+            _notify_pool_observers(self.engine_name, 'timeouts',
+                                   time.time() - start)
+            raise
+        _notify_pool_observers(self.engine_name, 'checkouts',
+                               time.time() - start)
+        if self.overflow() > 0:
+            _notify_pool_observers(self.engine_name, 'overflow_checkouts')
+        return connection
+
+    def recreate(self):
+        pool = super(InstrumentedQueuePool, self).recreate()
+        pool.engine_name = self.engine_name
+        return pool
+
+
+def _reporting_invalidations(ping, engine_name):
+    """Wraps a checkout listener to report the connections it discards."""
+    def listener(dbapi_conn, connection_rec, connection_proxy):
+        try:
+            ping(dbapi_conn, connection_rec, connection_proxy)
+        except DisconnectionError:
+            _notify_pool_observers(engine_name, 'invalidations')
+            raise
+    return listener
+
+
+def create_engine(connection, engine_name='main'):
+    """Return a new SQLAlchemy engine configured from CONF.sql."""
+    connection_dict = sql.engine.url.make_url(connection)
+
+    engine_config = {
+        'convert_unicode': True,
+        'echo': CONF.debug and CONF.verbose,
+        'pool_recycle': CONF.sql.idle_timeout,
+    }
+
+    if 'sqlite' in connection_dict.drivername:
+        engine_config['poolclass'] = sqlalchemy.pool.StaticPool
+    else:
+        engine_config['poolclass'] = InstrumentedQueuePool
+        for option in ('pool_size', 'max_overflow', 'pool_timeout'):
+            value = getattr(CONF.sql, option)
+            if value is not None:
+                engine_config[option] = value
+
+    engine = sql.create_engine(connection, **engine_config)
+    if isinstance(engine.pool, InstrumentedQueuePool):
+        engine.pool.engine_name = engine_name
+
+    ping = None
+    if engine.name == 'mysql':
+        ping = mysql_on_checkout
+    elif CONF.sql.pool_pre_ping:
+        ping = ping_on_checkout
+    if ping is not None:
+        sql.event.listen(engine, 'checkout',
+                         _reporting_invalidations(ping, engine_name))
+    return engine
+
+
 # Backends
 class Base(object):
     _engine = None
     _sessionmaker = None
+    _read_sessionmakers = None
+
+    def get_session(self, autocommit=True, expire_on_commit=False,
+                    read_only=False):
+        """Return a SQLAlchemy session.
 
-    def get_session(self, autocommit=True, expire_on_commit=False):
-        """Return a SQLAlchemy session."""
+        Sessions which are only used to read may be bound to one of the read
+        replicas instead of the main database; see use_read_replica().
+
+        """
+        engine = self.get_bind(read_only)
+        if engine is self._engine:
+            if self._sessionmaker is None:
+                self._sessionmaker = self.get_sessionmaker(engine)
+                for event in ('after_commit', 'after_bulk_update',
+                              'after_bulk_delete'):
+                    sql.event.listen(self._sessionmaker, event,
+                                     self._record_write)
+            return self._sessionmaker(autocommit=autocommit,
+                                      expire_on_commit=expire_on_commit)
+
+        if self._read_sessionmakers is None:
+            self._read_sessionmakers = {}
+        if engine not in self._read_sessionmakers:
+            self._read_sessionmakers[engine] = self.get_sessionmaker(engine)
+        return self._read_sessionmakers[engine](
+            autocommit=autocommit, expire_on_commit=expire_on_commit)
+
+    def get_bind(self, read_only=False):
+        """Return the engine to use for a session; see get_session()."""
+        if read_only and self.use_read_replica():
+            return random.choice(self.get_read_engines())
         self._engine = self._engine or self.get_engine()
-        self._sessionmaker = self._sessionmaker or self.get_sessionmaker(
-            self._engine)
-        return self._sessionmaker(autocommit=autocommit,
-                                  expire_on_commit=expire_on_commit)
+        return self._engine
 
-    def get_engine(self, allow_global_engine=True):
-        """Return a SQLAlchemy engine.
+    def insert_dicts(self, session, model, refs):
+        """Insert dicts, as given to model.from_dict(), into model's table.
 
-        If allow_global_engine is True and an in-memory sqlite connection
-        string is provided by CONF, all backends will share a global sqlalchemy
-        engine.
+        The rows are inserted with a single executemany() call, which the
+        MySQL driver turns into a multi-row INSERT.
 
         """
-        def new_engine():
-            connection_dict = sql.engine.url.make_url(CONF.sql.connection)
+        if refs:
+            session.execute(model.__table__.insert(),
+                            [model.row_from_dict(ref) for ref in refs])
 
-            engine_config = {
-                'convert_unicode': True,
-                'echo': CONF.debug and CONF.verbose,
-                'pool_recycle': CONF.sql.idle_timeout,
-            }
+    def select_dicts(self, model, whereclause=None, read_only=True):
+        """Return the rows of a model's table as dictionaries.
 
-            if 'sqlite' in connection_dict.drivername:
-                engine_config['poolclass'] = sqlalchemy.pool.StaticPool
+        Lightweight read path for listing: the rows are selected with a Core
+        select(), without a session or model instances, and are returned as
+        model.to_dict() would return them.
 
-            engine = sql.create_engine(CONF.sql.connection, **engine_config)
+        """
+        query = sql.select(_select_columns(model), whereclause)
+        result = self.get_bind(read_only).execute(query)
+        return [model.from_row(row) for row in result]
+
+    def iter_dicts(self, model, page_size=EXPORT_PAGE_SIZE, read_only=True):
+        """Yield the rows of a model's table as dictionaries.
+
+        Like select_dicts(), but for whole tables of any size: see
+        iter_rows().
+
+        """
+        for row in self.iter_rows(model, page_size, read_only):
+            yield model.from_row(row)
 
-            if engine.name == 'mysql':
-                sql.event.listen(engine, 'checkout', mysql_on_checkout)
+    def iter_rows(self, model, page_size=EXPORT_PAGE_SIZE, read_only=True):
+        """Yield the rows of a model's table, page_size rows at a time.
 
-            return engine
+        The pages are selected in primary key order, each one starting after
+        the last row of the previous one, so that only one page is held in
+        memory and no cursor or transaction stays open between pages.
 
+        """
+        keys = list(model.__table__.primary_key.columns)
+        bind = self.get_bind(read_only)
+        last = None
+        while True:
+            query = sql.select(_select_columns(model))
+            if last is not None:
+                query = query.where(_after(keys, last))
+            query = query.order_by(*keys).limit(page_size)
+            rows = bind.execute(query).fetchall()
+            for row in rows:
+                yield row
+            if len(rows) < page_size:
+                return
+            last = [rows[-1][key.name] for key in keys]
+
+    def get_backend_name(self):
+        """Return the name of the service of this driver, e.g. 'identity'."""
+        parts = self.__module__.split('.')
+        if 'backends' in parts:
+            return parts[parts.index('backends') - 1]
+        return self.__module__
+
+    def _record_write(self, session, *args):
+        """Session listener remembering when this backend last wrote."""
+        LAST_WRITE_TIMES[self.get_backend_name()] = time.time()
+
+    def use_read_replica(self):
+        """Whether read-only sessions may be bound to a read replica.
+
+        Not if no read replica is configured, if this driver is listed in
+        primary_only_backends, or within primary_read_window seconds of a
+        write committed by a driver of the same backend in this process, so
+        that it reads its own writes.
+
+        """
+        if not CONF.sql.read_connection:
+            return False
+        backend_name = self.get_backend_name()
+        if backend_name in CONF.sql.primary_only_backends:
+            return False
+        last_write = LAST_WRITE_TIMES.get(backend_name, 0)
+        return time.time() - last_write >= CONF.sql.primary_read_window
+
+    def get_read_engines(self):
+        """Return the engines of the read replicas, shared by all backends."""
+        if not GLOBAL_READ_ENGINES:
+            for i, connection in enumerate(CONF.sql.read_connection):
+                name = 'read%s' % (i + 1) if i else 'read'
+                GLOBAL_READ_ENGINES.append(create_engine(connection, name))
+        return GLOBAL_READ_ENGINES
+
+    def get_engine(self, allow_global_engine=True):
+        """Return a SQLAlchemy engine.
+
+        If allow_global_engine is True and an in-memory sqlite connection
+        string is provided by CONF, all backends will share a global sqlalchemy
+        engine.
+
+        """
         if not allow_global_engine:
-            return new_engine()
+            return create_engine(CONF.sql.connection)
 
         if GLOBAL_ENGINE:
             return GLOBAL_ENGINE
 
-        engine = new_engine()
+        engine = create_engine(CONF.sql.connection)
 
         # auto-build the db to support wsgi server w/ in-memory backend
         if CONF.sql.connection == 'sqlite://':
@@ -301,6 +583,26 @@ class Base(object):
             expire_on_commit=expire_on_commit)
 
 
+def _select_columns(model):
+    """Columns to select for model.from_row()."""
+    columns = []
+    for column in model.__table__.c:
+        if column.name == 'extra':
+            # decoded by model.from_row() if not empty
+            column = sql.type_coerce(column, sql.Text).label('extra')
+        columns.append(column)
+    return columns
+
+
+def _after(columns, values):
+    """Where clause of the rows which sort after values, by columns."""
+    clauses = []
+    for i, column in enumerate(columns):
+        equal = [c == v for c, v in zip(columns[:i], values[:i])]
+        clauses.append(sql.and_(*(equal + [column > values[i]])))
+    return sql.or_(*clauses)
+
+
 def handle_conflicts(type='object'):
     """Converts IntegrityError into HTTP 409 Conflict."""
     def decorator(method):
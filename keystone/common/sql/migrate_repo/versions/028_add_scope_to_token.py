@@ -0,0 +1,59 @@
+import json
+
+import sqlalchemy as sql
+from sqlalchemy import orm
+
+from keystone.openstack.common import timeutils
+
+
+def _token_scope(extra):
+    """Returns the (tenant_id, domain_id) a token's data is scoped to."""
+    tenant_id = (extra.get('tenant') or {}).get('id')
+    token_data = (extra.get('token_data') or {}).get('token') or {}
+    domain_id = (token_data.get('domain') or {}).get('id')
+    return tenant_id, domain_id
+
+
+def upgrade(migrate_engine):
+    meta = sql.MetaData()
+    meta.bind = migrate_engine
+    token_table = sql.Table('token', meta, autoload=True)
+
+    token_table.create_column(sql.Column('tenant_id', sql.String(64),
+                                         nullable=True))
+    token_table.create_column(sql.Column('domain_id', sql.String(64),
+                                         nullable=True))
+    for column in ('user_id', 'tenant_id', 'domain_id'):
+        idx = sql.Index('ix_token_%s' % column, token_table.c[column])
+        idx.create(migrate_engine)
+
+    # only tokens that can still be revoked need their scope
+    session = orm.sessionmaker(bind=migrate_engine)()
+    query = session.query(token_table).filter_by(valid=True)
+    query = query.filter(token_table.c.expires > timeutils.utcnow())
+    for token_ref in query.all():
+        tenant_id, domain_id = _token_scope(json.loads(token_ref.extra))
+        if tenant_id is None and domain_id is None:
+            continue
+        q = token_table.update()
+        q = q.where(token_table.c.id == token_ref.id)
+        q = q.values({token_table.c.tenant_id: tenant_id,
+                      token_table.c.domain_id: domain_id})
+        migrate_engine.execute(q)
+    session.close()
+
+
+def downgrade(migrate_engine):
+    meta = sql.MetaData()
+    meta.bind = migrate_engine
+    token_table = sql.Table('token', meta, autoload=True)
+
+    names = set('ix_token_%s' % column
+                for column in ('user_id', 'tenant_id', 'domain_id'))
+    for idx in list(token_table.indexes):
+        if idx.name in names:
+            idx.drop(migrate_engine)
+            # SQLite recreates the table to drop columns, with its indexes
+            token_table.indexes.remove(idx)
+    token_table.drop_column('domain_id')
+    token_table.drop_column('tenant_id')
@@ -0,0 +1,28 @@
+import sqlalchemy as sql
+
+
+def credential_table(meta):
+    # SQLite still carries the credential table's foreign key to the old
+    # tenant table, so it cannot be autoloaded there; only the indexed
+    # columns are needed
+    return sql.Table('credential', meta,
+                     sql.Column('user_id', sql.String(64)),
+                     sql.Column('project_id', sql.String(64)))
+
+
+def upgrade(migrate_engine):
+    meta = sql.MetaData()
+    meta.bind = migrate_engine
+    credential = credential_table(meta)
+    for column in ('user_id', 'project_id'):
+        idx = sql.Index('ix_credential_%s' % column, credential.c[column])
+        idx.create(migrate_engine)
+
+
+def downgrade(migrate_engine):
+    meta = sql.MetaData()
+    meta.bind = migrate_engine
+    credential = credential_table(meta)
+    for column in ('user_id', 'project_id'):
+        idx = sql.Index('ix_credential_%s' % column, credential.c[column])
+        idx.drop(migrate_engine)
@@ -0,0 +1,41 @@
+import sqlalchemy as sql
+
+
+def upgrade(migrate_engine):
+    meta = sql.MetaData()
+    meta.bind = migrate_engine
+    token_table = sql.Table('token', meta, autoload=True)
+
+    token_table.create_column(sql.Column('record', sql.LargeBinary(),
+                                         nullable=True))
+    token_table.create_column(sql.Column('catalog_id', sql.String(64),
+                                         nullable=True))
+    idx = sql.Index('ix_token_catalog_id', token_table.c.catalog_id)
+    idx.create(migrate_engine)
+
+    token_catalog_table = sql.Table(
+        'token_catalog',
+        meta,
+        sql.Column('id', sql.String(64), primary_key=True),
+        sql.Column('record', sql.LargeBinary(), nullable=False))
+    token_catalog_table.create(migrate_engine, checkfirst=True)
+
+
+def downgrade(migrate_engine):
+    meta = sql.MetaData()
+    meta.bind = migrate_engine
+    token_table = sql.Table('token', meta, autoload=True)
+    token_catalog_table = sql.Table('token_catalog', meta, autoload=True)
+    token_catalog_table.drop(migrate_engine, checkfirst=True)
+
+    # tokens stored as records can't be read without the record column
+    migrate_engine.execute(
+        token_table.delete().where(token_table.c.record.isnot(None)))
+
+    for idx in list(token_table.indexes):
+        if idx.name == 'ix_token_catalog_id':
+            idx.drop(migrate_engine)
+            # SQLite recreates the table to drop columns, with its indexes
+            token_table.indexes.remove(idx)
+    token_table.drop_column('catalog_id')
+    token_table.drop_column('record')
@@ -0,0 +1,29 @@
+import sqlalchemy as sql
+
+
+def upgrade(migrate_engine):
+    meta = sql.MetaData()
+    meta.bind = migrate_engine
+
+    revocation_event_table = sql.Table(
+        'revocation_event',
+        meta,
+        sql.Column('seq', sql.Integer(), primary_key=True,
+                   autoincrement=True),
+        sql.Column('token_id', sql.String(64), nullable=False),
+        sql.Column('user_id', sql.String(64), nullable=True),
+        sql.Column('project_id', sql.String(64), nullable=True),
+        sql.Column('trust_id', sql.String(64), nullable=True),
+        sql.Column('expires', sql.DateTime(), nullable=True))
+    revocation_event_table.create(migrate_engine, checkfirst=True)
+    idx = sql.Index('ix_revocation_event_expires',
+                    revocation_event_table.c.expires)
+    idx.create(migrate_engine)
+
+
+def downgrade(migrate_engine):
+    meta = sql.MetaData()
+    meta.bind = migrate_engine
+    revocation_event_table = sql.Table('revocation_event', meta,
+                                       autoload=True)
+    revocation_event_table.drop(migrate_engine, checkfirst=True)
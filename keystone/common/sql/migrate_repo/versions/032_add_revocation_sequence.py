@@ -0,0 +1,29 @@
+import sqlalchemy as sql
+
+
+def upgrade(migrate_engine):
+    meta = sql.MetaData()
+    meta.bind = migrate_engine
+
+    revocation_event_table = sql.Table('revocation_event', meta,
+                                       autoload=True)
+    revocation_sequence_table = sql.Table(
+        'revocation_sequence',
+        meta,
+        sql.Column('id', sql.Integer(), primary_key=True,
+                   autoincrement=False),
+        sql.Column('value', sql.Integer(), nullable=False))
+    revocation_sequence_table.create(migrate_engine, checkfirst=True)
+
+    last_seq = sql.select(
+        [sql.func.max(revocation_event_table.c.seq)]).scalar()
+    revocation_sequence_table.insert().values(id=1,
+                                              value=last_seq or 0).execute()
+
+
+def downgrade(migrate_engine):
+    meta = sql.MetaData()
+    meta.bind = migrate_engine
+    revocation_sequence_table = sql.Table('revocation_sequence', meta,
+                                          autoload=True)
+    revocation_sequence_table.drop(migrate_engine, checkfirst=True)
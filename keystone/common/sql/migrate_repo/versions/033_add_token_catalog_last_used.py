@@ -0,0 +1,18 @@
+import sqlalchemy as sql
+
+
+def upgrade(migrate_engine):
+    meta = sql.MetaData()
+    meta.bind = migrate_engine
+    token_catalog_table = sql.Table('token_catalog', meta, autoload=True)
+    # catalogs without one are marked as used by the next token storing
+    # them, and collected meanwhile if no token refers to them
+    token_catalog_table.create_column(sql.Column('last_used', sql.DateTime(),
+                                                 nullable=True))
+
+
+def downgrade(migrate_engine):
+    meta = sql.MetaData()
+    meta.bind = migrate_engine
+    token_catalog_table = sql.Table('token_catalog', meta, autoload=True)
+    token_catalog_table.drop_column('last_used')
@@ -19,6 +19,7 @@
 #    under the License.
 
 import hashlib
+import hmac
 import json
 import os
 import time
@@ -27,6 +28,7 @@ import passlib.hash
 
 from keystone.common import config
 from keystone.common import environment
+from keystone.common import executor
 from keystone.common import logging
 from keystone import exception
 
@@ -37,6 +39,7 @@ config.register_int('crypt_strength', default=40000)
 LOG = logging.getLogger(__name__)
 
 MAX_PASSWORD_LENGTH = 4096
+DEFAULT_PASSWORD_TIER = 'default'
 
 
 def read_cached_file(filename, cache_info, reload_func=None):
@@ -78,14 +81,47 @@ def trunc_password(password):
         raise exception.ValidationError(attribute='string', target='password')
 
 
-def hash_user_password(user):
-    """Hash a user dict's password without modifying the passed-in dict."""
+def hash_user_password(user, tier=None):
+    """Hash a user dict's password without modifying the passed-in dict.
+
+    The password is hashed according to the given tier, or to the tier of
+    the user if None.
+
+    """
     try:
         password = user['password']
     except KeyError:
         return user
     else:
-        return dict(user, password=hash_password(password))
+        if tier is None:
+            tier = password_tier(user)
+        return dict(user, password=hash_password(password, tier))
+
+
+def hash_user_passwords(users):
+    """Hash the passwords of several user dicts, in parallel if possible.
+
+    Returns new dicts, as hash_user_password() would for each user.
+
+    """
+    users = [dict(user) for user in users]
+    tiers = password_hash_tiers()
+    indexes = []
+    arglists = []
+    for i, user in enumerate(users):
+        if 'password' not in user:
+            continue
+        password_utf8 = trunc_password(user['password']).encode('utf-8')
+        if _identify(password_utf8):
+            user['password'] = password_utf8
+            continue
+        scheme, rounds = tiers[password_tier(user)]
+        indexes.append(i)
+        arglists.append((scheme, password_utf8, rounds))
+
+    for i, hashed in zip(indexes, executor.map(_encrypt, arglists)):
+        users[i]['password'] = hashed
+    return users
 
 
 def hash_ldap_user_password(user):
@@ -98,14 +134,120 @@ def hash_ldap_user_password(user):
         return dict(user, password=ldap_hash_password(password))
 
 
-def hash_password(password):
+# (crypt_strength, password_hash_tiers) -> (tiers, handlers of their schemes)
+_PASSWORD_HASH_TIERS = {}
+
+
+def _parsed_password_hash_tiers():
+    """Returns the parsed tiers and the handlers of their schemes.
+
+    They are parsed once for the current values of the options, and again
+    when these change, e.g. when the configuration is reloaded.
+
+    """
+    key = (CONF.crypt_strength, tuple(CONF.identity.password_hash_tiers))
+    parsed = _PASSWORD_HASH_TIERS.get(key)
+    if parsed is not None:
+        return parsed
+    tiers = {DEFAULT_PASSWORD_TIER: ('sha512_crypt', CONF.crypt_strength)}
+    for entry in CONF.identity.password_hash_tiers:
+        try:
+            name, scheme, rounds = entry.split(':')
+            rounds = int(rounds)
+        except ValueError:
+            raise exception.UnexpectedError(
+                _('Invalid password hash tier %s, expected '
+                  'name:scheme:rounds') % entry)
+        handler = getattr(passlib.hash, scheme, None)
+        if handler is None or 'rounds' not in handler.setting_kwds:
+            raise exception.UnexpectedError(
+                _('Invalid password hash tier %s, unknown scheme or scheme '
+                  'without rounds') % entry)
+        tiers[name] = (scheme, rounds)
+    handlers = [getattr(passlib.hash, scheme)
+                for scheme in set(scheme for scheme, _r in tiers.values())]
+    _PASSWORD_HASH_TIERS.clear()
+    _PASSWORD_HASH_TIERS[key] = (tiers, handlers)
+    return tiers, handlers
+
+
+def password_hash_tiers():
+    """Returns the configured password hashing tiers.
+
+    :returns: dict of tier name to (passlib scheme, rounds). The 'default'
+              tier is sha512_crypt with crypt_strength rounds unless
+              configured otherwise. The dict is shared, and mustn't be
+              modified.
+
+    """
+    return _parsed_password_hash_tiers()[0]
+
+
+def password_tier(user):
+    """Returns the password hashing tier of a user dict.
+
+    The tier is set by the user attribute named by password_hash_attribute,
+    or else by the user's domain, or else is the default one.
+
+    """
+    tier = user.get(CONF.identity.password_hash_attribute)
+    if not tier:
+        extra = user.get('extra')
+        if isinstance(extra, dict):
+            tier = extra.get(CONF.identity.password_hash_attribute)
+    if not tier:
+        for entry in CONF.identity.password_hash_domain_tiers:
+            domain_id, _sep, domain_tier = entry.partition(':')
+            if domain_id == user.get('domain_id'):
+                tier = domain_tier
+                break
+    if tier and tier not in password_hash_tiers():
+        LOG.warning(_('Unknown password hash tier %s, using the default '
+                      'one'), tier)
+        tier = None
+    return tier or DEFAULT_PASSWORD_TIER
+
+
+def _identify(hashed):
+    """Returns the passlib handler of a hash, if of a configured scheme."""
+    for handler in _parsed_password_hash_tiers()[1]:
+        if handler.identify(hashed):
+            return handler
+
+
+def password_needs_rehash(user):
+    """Whether the hash of a user dict's password differs from its tier's.
+
+    Always False when password_rehash_on_login is disabled, or when the
+    stored password isn't a hash of a configured scheme.
+
+    """
+    if not CONF.identity.password_rehash_on_login or not user.get('password'):
+        return False
+    handler = _identify(user['password'])
+    if handler is None:
+        return False
+    scheme, rounds = password_hash_tiers()[password_tier(user)]
+    return (handler.name != scheme or
+            handler.from_string(user['password']).rounds != rounds)
+
+
+def hash_password(password, tier=DEFAULT_PASSWORD_TIER):
     """Hash a password. Hard."""
     password_utf8 = trunc_password(password).encode('utf-8')
-    if passlib.hash.sha512_crypt.identify(password_utf8):
+    if _identify(password_utf8):
         return password_utf8
-    h = passlib.hash.sha512_crypt.encrypt(password_utf8,
-                                          rounds=CONF.crypt_strength)
-    return h
+    scheme, rounds = password_hash_tiers()[tier]
+    return executor.execute(_encrypt, scheme, password_utf8, rounds)
+
+
+def _encrypt(scheme, password_utf8, rounds):
+    handler = getattr(passlib.hash, scheme)
+    return handler.encrypt(password_utf8, rounds=rounds)
+
+
+def _verify(scheme, password_utf8, hashed):
+    return getattr(passlib.hash, scheme).verify(password_utf8, hashed)
 
 
 def ldap_hash_password(password):
@@ -132,7 +274,76 @@ def check_password(password, hashed):
     if password is None:
         return False
     password_utf8 = trunc_password(password).encode('utf-8')
-    return passlib.hash.sha512_crypt.verify(password_utf8, hashed)
+    handler = _identify(hashed) or passlib.hash.sha512_crypt
+    return executor.execute(_verify, handler.name, password_utf8, hashed)
+
+
+class VerifiedPasswordCache(object):
+    """Remembers successful password verifications for a short time.
+
+    Entries are keyed by user ID and hold an HMAC of the password, keyed with
+    a secret generated for each process, and the stored hash the password
+    was verified against. A changed password, whose stored hash differs, is
+    therefore never served from the cache, even by other processes.
+
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """Forget all entries and generate a new secret."""
+        self.secret = os.urandom(32)
+        # user_id -> (password HMAC, stored hash, expiry time)
+        self.entries = {}
+
+    def _digest(self, password):
+        password_utf8 = trunc_password(password).encode('utf-8')
+        return hmac.new(self.secret, password_utf8, hashlib.sha256).digest()
+
+    def check(self, user_id, password, hashed):
+        """Whether the password was recently verified against hashed."""
+        entry = self.entries.get(user_id)
+        if entry is None:
+            return False
+        digest, entry_hashed, expires = entry
+        if expires < time.time() or entry_hashed != hashed:
+            self.entries.pop(user_id, None)
+            return False
+        return auth_str_equal(self._digest(password), digest)
+
+    def add(self, user_id, password, hashed):
+        now = time.time()
+        if len(self.entries) >= CONF.identity.password_cache_size:
+            for key, (_digest, _hashed, expires) in self.entries.items():
+                if expires < now:
+                    del self.entries[key]
+            if len(self.entries) >= CONF.identity.password_cache_size:
+                self.entries.popitem()
+        self.entries[user_id] = (self._digest(password), hashed,
+                                 now + CONF.identity.password_cache_time)
+
+    def invalidate(self, user_id):
+        self.entries.pop(user_id, None)
+
+
+PASSWORD_CACHE = VerifiedPasswordCache()
+environment.register_fork_callback(PASSWORD_CACHE.reset)
+
+
+def check_user_password(user_id, password, hashed):
+    """Check a user's password, using the verified password cache if on."""
+    if password is None:
+        return False
+    if not CONF.identity.password_cache_time:
+        return check_password(password, hashed)
+
+    if PASSWORD_CACHE.check(user_id, password, hashed):
+        return True
+    if not check_password(password, hashed):
+        return False
+    PASSWORD_CACHE.add(user_id, password, hashed)
+    return True
 
 
 # From python 2.7
@@ -176,6 +387,21 @@ def git(*args):
     return check_output(['git'] + list(args))
 
 
+def poll(fetch, wait, interval, ready=bool):
+    """Calls fetch until ready() is true of its result, or wait elapsed.
+
+    fetch is called again every interval seconds, and its last result is
+    returned, e.g. for long-polling requests.
+
+    """
+    deadline = time.time() + wait
+    while True:
+        result = fetch()
+        if ready(result) or time.time() >= deadline:
+            return result
+        time.sleep(min(interval, max(deadline - time.time(), 0)))
+
+
 def unixtime(dt_obj):
     """Format datetime object as unix timestamp
 
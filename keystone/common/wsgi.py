@@ -22,15 +22,15 @@
 
 import re
 
-import routes.middleware
+import routes
 import webob.dec
 import webob.exc
 
 from keystone.common import config
 from keystone.common import logging
+from keystone.common import routing
 from keystone.common import utils
 from keystone import exception
-from keystone.openstack.common import importutils
 from keystone.openstack.common import jsonutils
 
 
@@ -45,6 +45,12 @@ CONTEXT_ENV = 'openstack.context'
 PARAMS_ENV = 'openstack.params'
 
 
+# Parameter names are normalized through a bounded cache, as they come from
+# request bodies as well as from routes.
+_NORMALIZED_ARGS = {}
+_MAX_NORMALIZED_ARGS = 1024
+
+
 _RE_PASS = re.compile(r'([\'"].*?password[\'"]\s*:\s*u?[\'"]).*?([\'"])',
                       re.DOTALL)
 
@@ -159,12 +165,14 @@ class Application(BaseApplication):
         arg_dict = req.environ['wsgiorg.routing_args'][1]
         action = arg_dict.pop('action')
         del arg_dict['controller']
-        LOG.debug(_('arg_dict: %s'), arg_dict)
+        if LOG.isEnabledFor(logging.DEBUG):
+            LOG.debug(_('arg_dict: %s'), arg_dict)
 
         # allow middleware up the stack to provide context, params and headers.
         context = req.environ.get(CONTEXT_ENV, {})
-        context['query_string'] = dict(req.params.iteritems())
-        context['headers'] = dict(req.headers.iteritems())
+        # NOTE: read-only views over the request rather than copies
+        context['query_string'] = req.params
+        context['headers'] = req.headers
         context['path'] = req.environ['PATH_INFO']
         params = req.environ.get(PARAMS_ENV, {})
         if 'REMOTE_USER' in req.environ:
@@ -176,7 +184,7 @@ class Application(BaseApplication):
         context.setdefault('is_admin', False)
 
         # TODO(termie): do some basic normalization on methods
-        method = getattr(self, action)
+        method = self._get_action(action)
 
         # NOTE(vish): make sure we have no unicode keys for py2.6.
         params = self._normalize_dict(params)
@@ -210,16 +218,32 @@ class Application(BaseApplication):
         response_code = self._get_response_code(req)
         return render_response(body=result, status=response_code)
 
+    def _get_action(self, action):
+        """Returns the method handling an action.
+
+        Methods are looked up once per action and kept in a dispatch table,
+        which `Router` fills in for all of its routes when it is constructed.
+
+        """
+        dispatch_table = self.__dict__.setdefault('_dispatch_table', {})
+        try:
+            return dispatch_table[action]
+        except KeyError:
+            method = dispatch_table[action] = getattr(self, action)
+            return method
+
     def _get_response_code(self, req):
-        req_method = req.environ['REQUEST_METHOD']
-        controller = importutils.import_class('keystone.common.controller')
-        code = None
-        if isinstance(self, controller.V3Controller) and req_method == 'POST':
-            code = (201, 'Created')
-        return code
+        """Returns the status of a successful response, if not the default."""
+        return None
 
     def _normalize_arg(self, arg):
-        return str(arg).replace(':', '_').replace('-', '_')
+        try:
+            return _NORMALIZED_ARGS[arg]
+        except KeyError:
+            normalized = str(arg).replace(':', '_').replace('-', '_')
+            if len(_NORMALIZED_ARGS) < _MAX_NORMALIZED_ARGS:
+                _NORMALIZED_ARGS[arg] = normalized
+            return normalized
 
     def _normalize_dict(self, d):
         return dict([(self._normalize_arg(k), v)
@@ -403,8 +427,21 @@ class Router(object):
             logging.getLogger('routes.middleware').setLevel(logging.INFO)
 
         self.map = mapper
-        self._router = routes.middleware.RoutesMiddleware(self._dispatch,
-                                                          self.map)
+        self._router = routing.make_routing_middleware(self._dispatch,
+                                                       self.map)
+        self._build_dispatch_tables()
+
+    def _build_dispatch_tables(self):
+        """Resolve the action of each route to its controller's method."""
+        for route in self.map.matchlist:
+            controller = route.defaults.get('controller')
+            action = route.defaults.get('action')
+            if isinstance(controller, Application) and action:
+                try:
+                    controller._get_action(action)
+                except AttributeError:
+                    # reported as usual if the route is ever requested
+                    pass
 
     @webob.dec.wsgify(RequestClass=Request)
     def __call__(self, req):
@@ -14,6 +14,11 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import collections
+import syslog
+import threading
+import time
+
 import webob
 import webob.dec
 
@@ -24,15 +29,169 @@ from keystone.openstack.common import timeutils
 
 
 CONF = config.CONF
+config.register_str('file', group='access_log', default=None)
+config.register_bool('use_syslog', group='access_log', default=False)
+config.register_str('syslog_facility', group='access_log',
+                    default='LOG_USER')
+config.register_int('queue_size', group='access_log', default=1024)
+config.register_int('batch_size', group='access_log', default=64)
+
 LOG = logging.getLogger('access')
 APACHE_TIME_FORMAT = '%d/%b/%Y:%H:%M:%S'
 APACHE_LOG_FORMAT = (
     '%(remote_addr)s - %(remote_user)s [%(datetime)s] "%(method)s %(url)s '
     '%(http_version)s" %(status)s %(content_length)s')
 
+# Seconds between two writes of the queued records.
+FLUSH_INTERVAL = 1
+
+
+def log_to_logger(lines):
+    for line in lines:
+        LOG.info(line)
+
+
+def log_to_file(path):
+    def _log_to_file(lines):
+        with open(path, 'a') as f:
+            f.write('\n'.join(lines) + '\n')
+    return _log_to_file
+
+
+def log_to_syslog(facility):
+    syslog.openlog('keystone', 0, getattr(syslog, facility))
+
+    def _log_to_syslog(lines):
+        for line in lines:
+            syslog.syslog(syslog.LOG_INFO, line)
+    return _log_to_syslog
+
+
+class AccessLogWriter(object):
+    """Writes access log records in batches from a background thread.
+
+    Records are queued without blocking the request; once the queue is full,
+    new records are dropped and counted instead.
+
+    """
+
+    def __init__(self, write_batch, queue_size, batch_size):
+        self.write_batch = write_batch
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.records = collections.deque()
+        self.dropped = 0
+        self.reported_dropped = 0
+        self.thread = None
+
+    def write(self, record):
+        if len(self.records) >= self.queue_size:
+            self.dropped += 1
+            return
+        self.records.append(record)
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run)
+            self.thread.daemon = True
+            self.thread.start()
+
+    def flush(self):
+        """Write all queued records."""
+        while self.records:
+            batch = []
+            while self.records and len(batch) < self.batch_size:
+                batch.append(self.records.popleft())
+            try:
+                self.write_batch(batch)
+            except Exception:
+                LOG.exception(_('Failed to write %d access log records'),
+                              len(batch))
+
+        if self.dropped != self.reported_dropped:
+            LOG.warning(_('Access log queue full, dropped %d records'),
+                        self.dropped - self.reported_dropped)
+            self.reported_dropped = self.dropped
+
+    def _run(self):
+        while True:
+            self.flush()
+            time.sleep(FLUSH_INTERVAL)
+
+
+_WRITER = None
+
+
+def get_writer():
+    """Returns the access log writer, configuring it on first use."""
+    global _WRITER
+    if _WRITER is None:
+        if CONF.access_log.file:
+            write_batch = log_to_file(CONF.access_log.file)
+        elif CONF.access_log.use_syslog:
+            write_batch = log_to_syslog(CONF.access_log.syslog_facility)
+        else:
+            write_batch = log_to_logger
+        _WRITER = AccessLogWriter(write_batch,
+                                  CONF.access_log.queue_size,
+                                  CONF.access_log.batch_size)
+    return _WRITER
+
+
+_last_timestamp = (None, None)
+
+
+def format_time(now):
+    """Formats a time for the access log, at most once per second."""
+    global _last_timestamp
+    second = now.replace(microsecond=0)
+    if _last_timestamp[0] != second:
+        # timeutils may not return UTC, so we can't hardcode +0000
+        _last_timestamp = (second, '%s %s' % (
+            now.strftime(APACHE_TIME_FORMAT), now.strftime('%z') or '+0000'))
+    return _last_timestamp[1]
+
+
+class CountingIterator(object):
+    """Counts the length of a response body as it is streamed.
+
+    `callback` is called with the length once the server closes the iterator.
+
+    """
+
+    def __init__(self, app_iter, callback):
+        self.app_iter = app_iter
+        self.callback = callback
+        self.length = 0
+        self.closed = False
+
+    def __iter__(self):
+        for chunk in self.app_iter:
+            self.length += len(chunk)
+            yield chunk
+
+    def close(self):
+        try:
+            if hasattr(self.app_iter, 'close'):
+                self.app_iter.close()
+        finally:
+            if not self.closed:
+                self.closed = True
+                self.callback(self.length)
+
 
 class AccessLogMiddleware(wsgi.Middleware):
-    """Writes an access log to INFO."""
+    """Writes an access log to INFO, a file or syslog.
+
+    The response body is never buffered: its length is taken from the
+    Content-Length header or counted as it is streamed.
+
+    """
+
+    def _log(self, data, content_length=None):
+        # must be calculated *after* the application has been called
+        data['datetime'] = format_time(timeutils.utcnow())
+        if content_length is not None:
+            data['content_length'] = content_length or '-'
+        get_writer().write(APACHE_LOG_FORMAT % data)
 
     @webob.dec.wsgify
     def __call__(self, request):
@@ -47,15 +206,15 @@ class AccessLogMiddleware(wsgi.Middleware):
 
         try:
             response = request.get_response(self.application)
-            data['status'] = response.status_int
-            data['content_length'] = len(response.body) or '-'
-        finally:
-            # must be calculated *after* the application has been called
-            now = timeutils.utcnow()
-
-            # timeutils may not return UTC, so we can't hardcode +0000
-            data['datetime'] = '%s %s' % (now.strftime(APACHE_TIME_FORMAT),
-                                          now.strftime('%z') or '+0000')
+        except Exception:
+            self._log(data)
+            raise
 
-            LOG.info(APACHE_LOG_FORMAT % data)
+        data['status'] = response.status_int
+        if response.content_length is not None:
+            self._log(data, response.content_length)
+        else:
+            response.app_iter = CountingIterator(
+                response.app_iter,
+                lambda length: self._log(data, length))
         return response
@@ -0,0 +1,401 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Bulk import and export of identity, assignment and catalog data.
+
+Records are read as JSON lines, one record per line, each an object with a
+single attribute naming the type of the record, as in API requests, e.g.::
+
+    {"project": {"id": "acme", "name": "ACME"}}
+    {"user": {"name": "jdoe", "password": "secret", "email": "..."}}
+    {"grant": {"role_id": "...", "user_id": "...", "project_id": "..."}}
+
+Users, groups, projects and grants may also be written as they were before
+records could be exported, with a "type" attribute next to their other
+attributes, e.g. ``{"type": "user", "name": "jdoe"}``.
+
+Consecutive records of the same type are imported in batches of ``[bulk_import]
+batch_size`` records. Drivers which support it (SQL) create a whole batch of
+users, groups, projects or grants with a single multi-row INSERT per table,
+after hashing its passwords in parallel; other records, and those of other
+drivers, are created one at a time. When a batch fails, its records are
+retried one at a time so that only the faulty ones are reported.
+
+Exported records are written in the same format, in the order of
+RECORD_TYPES, so that an export can be imported into another backend.
+
+"""
+
+import uuid
+
+import webob.dec
+
+from keystone import catalog
+from keystone.common import extension
+from keystone.common import logging
+from keystone.common import utils
+from keystone.common import wsgi
+from keystone import config
+from keystone import exception
+from keystone import identity
+from keystone.openstack.common import jsonutils
+from keystone import policy
+from keystone import token
+
+
+CONF = config.CONF
+config.register_int('batch_size', group='bulk_import', default=500)
+
+LOG = logging.getLogger(__name__)
+
+extension_data = {
+    'name': 'Openstack Keystone Bulk Import API',
+    'namespace': 'http://docs.openstack.org/identity/api/ext/'
+                 'OS-BULK/v1.0',
+    'alias': 'OS-BULK',
+    'updated': '2013-07-07T12:00:0-00:00',
+    'description': 'Openstack Keystone Bulk Import API.',
+    'links': [
+        {
+            'rel': 'describedby',
+            # TODO(ayoung): needs a description
+            'type': 'text/html',
+            'href': 'https://github.com/openstack/identity-api',
+        }
+    ]}
+extension.register_admin_extension(extension_data['alias'], extension_data)
+
+# in the order they are exported, so that records only refer to earlier ones
+RECORD_TYPES = ['domain', 'role', 'project', 'user', 'group', 'membership',
+                'grant', 'service', 'endpoint']
+
+# attributes required by each record type, but grants
+REQUIRED_ATTRIBUTES = {
+    'domain': ['name'],
+    'role': ['name'],
+    'project': ['name'],
+    'user': ['name'],
+    'group': ['name'],
+    'membership': ['user_id', 'group_id'],
+    'service': ['type'],
+    'endpoint': ['service_id', 'interface', 'url'],
+}
+
+# record types which may also be named by a "type" attribute next to their
+# other attributes, as they were before records could be exported
+TYPE_ATTRIBUTE_RECORD_TYPES = ['user', 'group', 'project', 'grant']
+
+# record types which are given the default domain if they have none
+DOMAIN_RECORD_TYPES = ['project', 'user', 'group']
+
+
+class ImportReport(object):
+    """Counts the imported records and describes those which failed."""
+
+    def __init__(self):
+        self.imported = dict((record_type, 0) for record_type in RECORD_TYPES)
+        self.failed = dict((record_type, 0) for record_type in RECORD_TYPES)
+        self.errors = []
+
+    def add_error(self, line, record_type, record, error):
+        if record_type in self.failed:
+            self.failed[record_type] += 1
+        self.errors.append({'line': line,
+                            'type': record_type,
+                            'id': record.get('id'),
+                            'error': unicode(error)})
+
+    def to_dict(self):
+        # records are reported as their batch is imported, after the lines
+        # which could not be parsed
+        return {'imported': self.imported,
+                'failed': self.failed,
+                'errors': sorted(self.errors, key=lambda e: e['line'])}
+
+
+def parse_record(line):
+    """Returns the type and attributes of the record on a JSON line.
+
+    Records other than grants and memberships get a generated ID if they
+    have none, and users, groups and projects get the default domain.
+
+    :raises: keystone.exception.ValidationError
+
+    """
+    try:
+        record = jsonutils.loads(line)
+    except ValueError:
+        raise exception.ValidationError(attribute='valid JSON',
+                                        target='record')
+    if (isinstance(record, dict) and
+            record.get('type') in TYPE_ATTRIBUTE_RECORD_TYPES):
+        ref = dict(record)
+        record_type = ref.pop('type')
+    elif (not isinstance(record, dict) or len(record) != 1 or
+            record.keys()[0] not in RECORD_TYPES or
+            not isinstance(record.values()[0], dict)):
+        raise exception.ValidationError(
+            attribute='one of %s' % ', '.join(RECORD_TYPES), target='record')
+    else:
+        record_type, ref = record.items()[0]
+    if record_type == 'grant':
+        if not ref.get('role_id'):
+            raise exception.ValidationError(attribute='role_id',
+                                            target='grant')
+        if bool(ref.get('user_id')) == bool(ref.get('group_id')):
+            raise exception.ValidationError(attribute='user_id or group_id',
+                                            target='grant')
+        if bool(ref.get('project_id')) == bool(ref.get('domain_id')):
+            raise exception.ValidationError(
+                attribute='project_id or domain_id', target='grant')
+    else:
+        for attribute in REQUIRED_ATTRIBUTES[record_type]:
+            if not ref.get(attribute):
+                raise exception.ValidationError(attribute=attribute,
+                                                target=record_type)
+        if record_type != 'membership':
+            ref.setdefault('id', uuid.uuid4().hex)
+        if record_type in DOMAIN_RECORD_TYPES:
+            ref.setdefault('domain_id', CONF.identity.default_domain_id)
+    return record_type, ref
+
+
+def format_record(record_type, ref):
+    """Returns a record as a JSON line, as read by parse_record()."""
+    return jsonutils.dumps({record_type: ref}) + '\n'
+
+
+def export_records(identity_api, assignment_api, catalog_api):
+    """Yields the type and attributes of every record, by RECORD_TYPES.
+
+    Records are read from the export methods of the drivers, which page
+    through SQL tables and LDAP searches rather than listing everything at
+    once. Record types which a driver can't list are skipped.
+
+    """
+    exporters = {
+        'domain': assignment_api.export_domains,
+        'role': assignment_api.export_roles,
+        'project': assignment_api.export_projects,
+        'user': identity_api.export_users,
+        'group': identity_api.export_groups,
+        'membership': identity_api.export_memberships,
+        'grant': assignment_api.export_grants,
+        'service': catalog_api.export_services,
+        'endpoint': catalog_api.export_endpoints,
+    }
+    for record_type in RECORD_TYPES:
+        try:
+            for ref in exporters[record_type]():
+                yield record_type, ref
+        except exception.NotImplemented:
+            LOG.warning(_('Export of %s records is not supported by the '
+                          'driver, skipping them'), record_type)
+
+
+class Importer(object):
+    """Imports records through the identity and assignment managers.
+
+    :param progress: if given, called with the record type and the report
+                     after each batch
+
+    """
+
+    def __init__(self, identity_api, assignment_api, batch_size=None,
+                 progress=None, catalog_api=None):
+        self.identity_api = identity_api
+        self.assignment_api = assignment_api
+        self.catalog_api = catalog_api or catalog.Manager()
+        self.batch_size = batch_size or CONF.bulk_import.batch_size
+        self.progress = progress
+        self._supports_bulk = {}
+
+    def import_lines(self, lines):
+        """Imports the records read from an iterable of JSON lines.
+
+        :returns: an ImportReport
+
+        """
+        report = ImportReport()
+        batch_type = None
+        batch = []
+        for number, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            try:
+                record_type, record = parse_record(line)
+            except exception.ValidationError as e:
+                report.add_error(number, None, {}, e)
+                continue
+
+            if batch and (record_type != batch_type or
+                          len(batch) >= self.batch_size):
+                self.import_batch(batch_type, batch, report)
+                batch = []
+            batch_type = record_type
+            batch.append((number, record))
+
+        if batch:
+            self.import_batch(batch_type, batch, report)
+        return report
+
+    def _creators(self, record_type):
+        """Returns the functions creating many records and a single one.
+
+        The former is None if records of the type are always created one at
+        a time.
+
+        """
+        if record_type == 'domain':
+            return (None,
+                    lambda ref: self.identity_api.create_domain(ref['id'],
+                                                                ref))
+        elif record_type == 'role':
+            return (None,
+                    lambda ref: self.identity_api.create_role(ref['id'], ref))
+        elif record_type == 'membership':
+            return (None,
+                    lambda ref: self.identity_api.add_user_to_group(
+                        ref['user_id'], ref['group_id']))
+        elif record_type == 'service':
+            return (None,
+                    lambda ref: self.catalog_api.create_service(ref['id'],
+                                                                ref))
+        elif record_type == 'endpoint':
+            return (None,
+                    lambda ref: self.catalog_api.create_endpoint(ref['id'],
+                                                                 ref))
+        elif record_type == 'user':
+            return (self.identity_api.create_users,
+                    lambda ref: self.identity_api.create_user(ref['id'], ref))
+        elif record_type == 'group':
+            return (self.identity_api.create_groups,
+                    lambda ref: self.identity_api.create_group(ref['id'],
+                                                               ref))
+        elif record_type == 'project':
+            return (self.identity_api.create_projects,
+                    lambda ref: self.identity_api.create_project(ref['id'],
+                                                                 ref))
+        else:
+            return (self.assignment_api.create_grants,
+                    lambda ref: self.assignment_api.create_grant(**ref))
+
+    def supports_bulk(self, record_type):
+        """Whether the driver can create a batch of records at once."""
+        if record_type not in self._supports_bulk:
+            create_many, _create_one = self._creators(record_type)
+            if create_many is None:
+                self._supports_bulk[record_type] = False
+                return False
+            try:
+                create_many([])
+                self._supports_bulk[record_type] = True
+            except exception.NotImplemented:
+                self._supports_bulk[record_type] = False
+        return self._supports_bulk[record_type]
+
+    def import_batch(self, record_type, batch, report):
+        """Imports a list of (line number, record) of the same type."""
+        create_many, create_one = self._creators(record_type)
+        records = [record for _number, record in batch]
+
+        if self.supports_bulk(record_type):
+            try:
+                if record_type == 'user':
+                    # hashed once, even if the records are retried one at a
+                    # time; the drivers don't hash hashed passwords again
+                    records = utils.hash_user_passwords(records)
+                    batch = zip([number for number, _record in batch],
+                                records)
+                create_many(records)
+            except Exception as e:
+                LOG.info(_('Bulk creation of %(count)d %(type)s records '
+                           'failed, creating them one at a time: %(error)s'),
+                         {'count': len(records), 'type': record_type,
+                          'error': e})
+            else:
+                report.imported[record_type] += len(records)
+                self._report_progress(record_type, report)
+                return
+
+        for number, record in batch:
+            try:
+                create_one(record)
+            except exception.Error as e:
+                report.add_error(number, record_type, record, e)
+            except Exception as e:
+                LOG.exception(e)
+                report.add_error(number, record_type, record, e)
+            else:
+                report.imported[record_type] += 1
+        self._report_progress(record_type, report)
+
+    def _report_progress(self, record_type, report):
+        LOG.info(_('Bulk import: %(imported)d %(type)s records imported, '
+                   '%(failed)d failed'),
+                 {'imported': report.imported[record_type],
+                  'failed': report.failed[record_type],
+                  'type': record_type})
+        if self.progress is not None:
+            self.progress(record_type, report)
+
+
+class BulkImportExtension(wsgi.ExtensionRouter):
+    """Imports identity, assignment and catalog records from JSON lines.
+
+    The request body is read as it is imported, so this filter must come
+    before json_body in the pipeline.
+
+    """
+
+    def add_routes(self, mapper):
+        mapper.connect(
+            '/OS-BULK/import',
+            controller=BulkImportController(),
+            action='import_records',
+            conditions=dict(method=['POST']))
+
+
+class BulkImportController(wsgi.Application):
+    def __init__(self):
+        self.identity_api = identity.Manager()
+        self.assignment_api = self.identity_api.assignment_api
+        self.catalog_api = catalog.Manager()
+        self.policy_api = policy.Manager()
+        self.token_api = token.Manager()
+        super(BulkImportController, self).__init__()
+
+    @webob.dec.wsgify
+    def __call__(self, req):
+        # the body isn't parsed as JSON, unlike for the other controllers
+        context = req.environ.get(wsgi.CONTEXT_ENV, {})
+        context.setdefault('is_admin', False)
+        try:
+            report = self.import_records(context, req.body_file)
+        except exception.Error as e:
+            LOG.warning(e)
+            return wsgi.render_exception(e)
+        except Exception as e:
+            LOG.exception(e)
+            return wsgi.render_exception(
+                exception.UnexpectedError(exception=e))
+        return wsgi.render_response(body={'OS-BULK:import': report})
+
+    def import_records(self, context, body_file):
+        self.assert_admin(context)
+        importer = Importer(self.identity_api, self.assignment_api,
+                            catalog_api=self.catalog_api)
+        return importer.import_lines(iter(body_file.readline, '')).to_dict()
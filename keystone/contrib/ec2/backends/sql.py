@@ -34,7 +34,7 @@ class Ec2Credential(sql.ModelBase, sql.DictBase):
 
 class Ec2(sql.Base):
     def get_credential(self, credential_id):
-        session = self.get_session()
+        session = self.get_session(read_only=True)
         query = session.query(Ec2Credential)
         query = query.filter_by(access=credential_id)
         credential_ref = query.first()
@@ -43,7 +43,7 @@ class Ec2(sql.Base):
         return credential_ref.to_dict()
 
     def list_credentials(self, user_id):
-        session = self.get_session()
+        session = self.get_session(read_only=True)
         query = session.query(Ec2Credential)
         credential_refs = query.filter_by(user_id=user_id)
         return [x.to_dict() for x in credential_refs]
@@ -34,18 +34,27 @@ glance to list images needed to perform the requested task.
 
 """
 
+import copy
+import datetime
+import hashlib
+import hmac
+import os
+import time
 import uuid
 
 from keystoneclient.contrib.ec2 import utils as ec2_utils
 
 from keystone.common import controller
 from keystone.common import dependency
+from keystone.common import environment
 from keystone.common import extension
 from keystone.common import manager
 from keystone.common import utils
 from keystone.common import wsgi
 from keystone import config
 from keystone import exception
+from keystone.openstack.common import jsonutils
+from keystone.openstack.common import timeutils
 from keystone import token
 
 
@@ -71,6 +80,94 @@ extension.register_admin_extension(EXTENSION_DATA['alias'], EXTENSION_DATA)
 extension.register_public_extension(EXTENSION_DATA['alias'], EXTENSION_DATA)
 
 
+class Ec2AuthCache(object):
+    """Remembers recent EC2 credentials, signatures and tokens.
+
+    Each process keeps, for ``[ec2] cache_time`` seconds, the credentials
+    looked up by access key, the signed requests it has verified and the
+    token issued for each access key, project and set of roles, so that
+    repeated requests neither look them up nor write a new token.
+
+    Verified requests are keyed by an HMAC of the request and the secret it
+    was verified with, keyed with a random secret of the process.
+
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """Forget all entries and generate a new secret."""
+        self.secret = os.urandom(32)
+        # access -> (credential ref, expiry time)
+        self.credentials = {}
+        # request HMAC -> (True, expiry time)
+        self.signatures = {}
+        # (access, tenant_id, role ids) -> (token refs, expiry time)
+        self.tokens = {}
+
+    @property
+    def enabled(self):
+        return CONF.ec2.cache_time > 0
+
+    def _get(self, entries, key):
+        entry = entries.get(key)
+        if entry is None:
+            return None
+        value, expires = entry
+        if expires < time.time():
+            entries.pop(key, None)
+            return None
+        return value
+
+    def _set(self, entries, key, value):
+        now = time.time()
+        if len(entries) >= CONF.ec2.cache_size:
+            for k, (_value, expires) in entries.items():
+                if expires < now:
+                    del entries[k]
+            if len(entries) >= CONF.ec2.cache_size:
+                entries.popitem()
+        entries[key] = (value, now + CONF.ec2.cache_time)
+
+    def get_credential(self, access):
+        return self._get(self.credentials, access)
+
+    def set_credential(self, access, creds_ref):
+        self._set(self.credentials, access, creds_ref)
+
+    def _signature_key(self, creds_ref, credentials):
+        request = jsonutils.dumps([creds_ref['secret'], credentials],
+                                  sort_keys=True)
+        return hmac.new(self.secret, request, hashlib.sha256).digest()
+
+    def check_signature(self, creds_ref, credentials):
+        """Whether this very request was recently verified."""
+        return bool(self._get(self.signatures,
+                              self._signature_key(creds_ref, credentials)))
+
+    def add_signature(self, creds_ref, credentials):
+        self._set(self.signatures,
+                  self._signature_key(creds_ref, credentials), True)
+
+    def get_token(self, access, tenant_id, roles):
+        return self._get(self.tokens, (access, tenant_id, frozenset(roles)))
+
+    def set_token(self, access, tenant_id, roles, refs):
+        self._set(self.tokens, (access, tenant_id, frozenset(roles)), refs)
+
+    def invalidate(self, access):
+        """Forget a credential and the tokens issued for it."""
+        self.credentials.pop(access, None)
+        for key in self.tokens.keys():
+            if key[0] == access:
+                del self.tokens[key]
+
+
+AUTH_CACHE = Ec2AuthCache()
+environment.register_fork_callback(AUTH_CACHE.reset)
+
+
 @dependency.provider('ec2_api')
 class Manager(manager.Manager):
     """Default pivot point for the EC2 Credentials backend.
@@ -120,6 +217,15 @@ class Ec2Extension(wsgi.ExtensionRouter):
 @dependency.requires('catalog_api', 'ec2_api')
 class Ec2Controller(controller.V2Controller):
     def check_signature(self, creds_ref, credentials):
+        if not AUTH_CACHE.enabled:
+            return self._check_signature(creds_ref, credentials)
+        request = copy.deepcopy(credentials)
+        if AUTH_CACHE.check_signature(creds_ref, request):
+            return
+        self._check_signature(creds_ref, credentials)
+        AUTH_CACHE.add_signature(creds_ref, request)
+
+    def _check_signature(self, creds_ref, credentials):
         signer = ec2_utils.Ec2Signer(creds_ref['secret'])
         signature = signer.generate(credentials)
         if utils.auth_str_equal(credentials['signature'], signature):
@@ -165,10 +271,19 @@ class Ec2Controller(controller.V2Controller):
         if 'access' not in credentials:
             raise exception.Unauthorized(message='EC2 signature not supplied.')
 
-        creds_ref = self._get_credentials(credentials['access'])
+        creds_ref = self._get_cached_credentials(credentials['access'])
         self.check_signature(creds_ref, credentials)
 
-        # TODO(termie): don't create new tokens every time
+        if AUTH_CACHE.enabled:
+            roles = self.identity_api.get_roles_for_user_and_project(
+                creds_ref['user_id'], creds_ref['tenant_id'])
+            refs = AUTH_CACHE.get_token(creds_ref['access'],
+                                        creds_ref['tenant_id'], roles)
+            if refs is not None and self._token_still_valid(refs[0]):
+                token_ref, roles_ref, catalog_ref = copy.deepcopy(refs)
+                return token.controllers.Auth.format_authenticate(
+                    token_ref, roles_ref, catalog_ref)
+
         # TODO(termie): this is copied from TokenController.authenticate
         token_id = uuid.uuid4().hex
         tenant_ref = self.identity_api.get_project(creds_ref['tenant_id'])
@@ -198,12 +313,31 @@ class Ec2Controller(controller.V2Controller):
                            tenant=tenant_ref,
                            metadata=metadata_ref))
 
+        if AUTH_CACHE.enabled:
+            AUTH_CACHE.set_token(
+                creds_ref['access'], tenant_ref['id'], roles,
+                copy.deepcopy((token_ref, roles_ref, catalog_ref)))
+
         # TODO(termie): i don't think the ec2 middleware currently expects a
         #               full return, but it contains a note saying that it
         #               would be better to expect a full return
         return token.controllers.Auth.format_authenticate(
             token_ref, roles_ref, catalog_ref)
 
+    def _token_still_valid(self, token_ref):
+        """Whether a cached token may be handed out again.
+
+        The token must not have been revoked, and must stay valid for at
+        least as long as it could still be served from the cache.
+
+        """
+        try:
+            token_ref = self.token_api.get_token(token_ref['id'])
+        except exception.TokenNotFound:
+            return False
+        remaining = datetime.timedelta(seconds=CONF.ec2.cache_time)
+        return token_ref['expires'] > timeutils.utcnow() + remaining
+
     def create_credential(self, context, user_id, tenant_id):
         """Create a secret/access pair for use with ec2 style auth.
 
@@ -272,6 +406,7 @@ class Ec2Controller(controller.V2Controller):
 
         self._assert_valid_user_id(user_id)
         self._get_credentials(credential_id)
+        AUTH_CACHE.invalidate(credential_id)
         return self.ec2_api.delete_credential(credential_id)
 
     def _get_credentials(self, credential_id):
@@ -286,6 +421,16 @@ class Ec2Controller(controller.V2Controller):
             raise exception.Unauthorized(message='EC2 access key not found.')
         return creds
 
+    def _get_cached_credentials(self, credential_id):
+        """Return credentials from an ID, through the EC2 auth cache."""
+        if not AUTH_CACHE.enabled:
+            return self._get_credentials(credential_id)
+        creds = AUTH_CACHE.get_credential(credential_id)
+        if creds is None:
+            creds = self._get_credentials(credential_id)
+            AUTH_CACHE.set_credential(credential_id, copy.deepcopy(creds))
+        return copy.deepcopy(creds)
+
     def _assert_identity(self, context, user_id):
         """Check that the provided token belongs to the user.
 
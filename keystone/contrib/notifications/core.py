@@ -0,0 +1,112 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Long-polling of the identity, assignment and catalog change events.
+
+Services which cache projects, role assignments or the catalog ask for the
+events after the last one they have seen, and wait up to ``wait`` seconds
+for one to happen::
+
+    GET /v2.0/OS-NOTIFICATIONS/events?since=12&wait=30&types=project,grant
+
+    {"events": [{"seq": 13, "type": "grant", "operation": "created", ...}],
+     "next": 13, "epoch": "...", "truncated": false}
+
+Events are those of the process serving the request (see
+keystone.common.notifications). When ``truncated`` is true, some events
+after ``since`` were missed, e.g. because the process restarted or dropped
+them from its buffer, and clients should flush their caches.
+
+"""
+
+from keystone.common import controller
+from keystone.common import extension
+from keystone.common import notifications
+from keystone.common import wsgi
+from keystone import config
+from keystone import identity
+from keystone import policy
+from keystone import token
+
+
+CONF = config.CONF
+
+extension_data = {
+    'name': 'Openstack Keystone Notifications API',
+    'namespace': 'http://docs.openstack.org/identity/api/ext/'
+                 'OS-NOTIFICATIONS/v1.0',
+    'alias': 'OS-NOTIFICATIONS',
+    'updated': '2013-07-07T12:00:0-00:00',
+    'description': 'Openstack Keystone Notifications API.',
+    'links': [
+        {
+            'rel': 'describedby',
+            # TODO(ayoung): needs a description
+            'type': 'text/html',
+            'href': 'https://github.com/openstack/identity-api',
+        }
+    ]}
+extension.register_admin_extension(extension_data['alias'], extension_data)
+
+
+class NotificationsExtension(wsgi.ExtensionRouter):
+    """Reports the changes made through the managers."""
+
+    def add_routes(self, mapper):
+        mapper.connect(
+            '/OS-NOTIFICATIONS/events',
+            controller=NotificationsController(),
+            action='list_events',
+            conditions=dict(method=['GET']))
+
+
+class NotificationsController(wsgi.Application):
+    def __init__(self):
+        self.identity_api = identity.Manager()
+        self.policy_api = policy.Manager()
+        self.token_api = token.Manager()
+        super(NotificationsController, self).__init__()
+
+    def list_events(self, context):
+        """Returns the events after the since query parameter.
+
+        Waits up to the wait query parameter, in seconds, for one if there
+        are none yet. Events are filtered by the comma-separated list of
+        types of the types query parameter, if any. The since of a client
+        which gives the epoch of a previous response is only relevant to
+        that epoch.
+
+        """
+        self.assert_admin(context)
+        since = controller.query_int(context, 'since', None)
+        wait = min(controller.query_int(context, 'wait', 0),
+                   CONF.notifications.max_wait)
+        types = context['query_string'].get('types')
+        if types:
+            types = [t.strip() for t in types.split(',') if t.strip()]
+        epoch = context['query_string'].get('epoch')
+        stale = epoch is not None and epoch != notifications.epoch()
+        if stale:
+            since, wait = None, 0
+        events, truncated = notifications.wait_for_events(since, types, wait)
+        if events:
+            next_seq = events[-1]['seq']
+        else:
+            next_seq = since or 0
+        return {'events': events,
+                'next': next_seq,
+                'epoch': notifications.epoch(),
+                'truncated': truncated or stale}
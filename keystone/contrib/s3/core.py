@@ -65,7 +65,7 @@ class S3Extension(wsgi.ExtensionRouter):
 
 
 class S3Controller(ec2.Ec2Controller):
-    def check_signature(self, creds_ref, credentials):
+    def _check_signature(self, creds_ref, credentials):
         msg = base64.urlsafe_b64decode(str(credentials['token']))
         key = str(creds_ref['secret'])
         signed = base64.encodestring(
@@ -15,7 +15,12 @@
 # under the License.
 
 from keystone.common import kvs
+from keystone import config
 from keystone.contrib import stats
+from keystone import exception
+
+
+CONF = config.CONF
 
 
 class Stats(kvs.Base, stats.Driver):
@@ -32,3 +37,35 @@ class Stats(kvs.Base, stats.Driver):
         counter = stats[category].setdefault(value, 0)
         stats[category][value] = counter + 1
         self.set_stats(api, stats)
+
+    def _worker_key(self, api, worker):
+        return 'stats-%s-%s' % (api, worker)
+
+    def _workers_key(self, api):
+        return 'stats-workers-%s' % api
+
+    def flush_stats(self, api, worker, stats_ref):
+        key = self._worker_key(api, worker)
+        merged = stats.merge_stats([self.db.get(key, {}), stats_ref],
+                                   CONF.stats.max_tracked_values)
+        self.db.set(key, merged)
+
+        workers = self.db.get(self._workers_key(api), [])
+        if worker not in workers:
+            workers.append(worker)
+            self.db.set(self._workers_key(api), workers)
+
+    def get_worker_stats(self, api):
+        workers = self.db.get(self._workers_key(api), [])
+        return [self.db.get(self._worker_key(api, worker), {})
+                for worker in workers]
+
+    def delete_stats(self, api):
+        keys = [self._worker_key(api, worker)
+                for worker in self.db.get(self._workers_key(api), [])]
+        keys += [self._workers_key(api), 'stats-%s' % api]
+        for key in keys:
+            try:
+                self.db.delete(key)
+            except exception.NotFound:
+                pass
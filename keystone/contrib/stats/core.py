@@ -14,9 +14,15 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import bisect
+import os
+import socket
+import time
+
 from keystone.common import extension
 from keystone.common import logging
 from keystone.common import manager
+from keystone.common import sql
 from keystone.common import wsgi
 from keystone import config
 from keystone import exception
@@ -45,6 +51,157 @@ extension_data = {
     ]}
 extension.register_admin_extension(extension_data['alias'], extension_data)
 
+# Statistics of calls made through the managers to the backends are collected
+# under this name rather than under the API which made the call.
+BACKEND_API = 'backend'
+
+# Events of the SQL connection pools are collected under this name.
+SQL_API = 'sql'
+
+# Latency histograms are stored as categories named with this prefix, mapping
+# the index of each bucket in LATENCY_BUCKETS to a number of calls.
+LATENCY_PREFIX = 'latency:'
+
+# Upper bounds, in milliseconds, of the latency histogram buckets; longer
+# calls are counted in an additional overflow bucket.
+LATENCY_BUCKETS = [0.5, 1, 2, 3, 5, 7.5, 10, 15, 20, 30, 50, 75, 100, 150,
+                   200, 300, 500, 750, 1000, 1500, 2000, 3000, 5000, 10000,
+                   30000]
+
+LATENCY_PERCENTILES = [50, 95, 99]
+
+
+def increment_bounded(counters, value, limit, count=1):
+    """Count `value` in `counters` while tracking at most `limit` values.
+
+    Implements the Space-Saving algorithm: once the table is full, the least
+    frequent value is evicted and the newcomer inherits its count, so the most
+    frequent values (e.g. the busiest remote addresses) are always retained.
+
+    """
+    if value in counters or len(counters) < limit:
+        counters[value] = counters.get(value, 0) + count
+    else:
+        evicted = min(counters, key=counters.get)
+        counters[value] = counters.pop(evicted) + count
+
+
+def merge_stats(stats_refs, limit):
+    """Sum several stats dicts, keeping the `limit` top values per category."""
+    merged = {}
+    for stats_ref in stats_refs:
+        for category, counters in stats_ref.iteritems():
+            merged_counters = merged.setdefault(category, {})
+            for value, count in counters.iteritems():
+                merged_counters[value] = merged_counters.get(value, 0) + count
+
+    for category, counters in merged.iteritems():
+        if category.startswith(LATENCY_PREFIX):
+            continue
+        if len(counters) > limit:
+            top = sorted(counters.iteritems(), key=lambda x: x[1],
+                         reverse=True)[:limit]
+            merged[category] = dict(top)
+    return merged
+
+
+def summarize_latency(histogram):
+    """Computes the call count and latency percentiles of a histogram.
+
+    Percentiles are reported in milliseconds, as the upper bound of the bucket
+    they fall into.
+
+    """
+    count = sum(histogram.itervalues())
+    summary = {'count': count}
+    buckets = sorted(histogram.iteritems())
+    for percentile in LATENCY_PERCENTILES:
+        rank = count * percentile / 100.0
+        seen = 0
+        for bucket, bucket_count in buckets:
+            seen += bucket_count
+            if seen >= rank:
+                break
+        bucket = min(bucket, len(LATENCY_BUCKETS) - 1)
+        summary['p%s' % percentile] = LATENCY_BUCKETS[bucket]
+    return summary
+
+
+def worker_id():
+    """Identifies the current process among all workers reporting stats."""
+    return '%s:%s' % (socket.gethostname(), os.getpid())
+
+
+def route_template(request):
+    """Returns the route template matched for a request.
+
+    Unlike the raw path, the template (e.g. ``/v2.0/tenants/{tenant_id}``)
+    has a bounded number of values.
+
+    """
+    route = request.environ.get('routes.route')
+    if route is None:
+        return '(unmatched)'
+    return request.script_name + route.routepath
+
+
+class Aggregator(object):
+    """Per-process statistics counters, periodically flushed to the backend.
+
+    Counters are plain dicts updated without any locking: no greenthread
+    switch can occur while they are modified, and a flush swaps in a fresh set
+    of counters before writing the old ones to the backend.
+
+    """
+
+    def __init__(self):
+        self.counters = {}
+        self.last_flush = time.time()
+
+    def increment(self, api, category, value):
+        counters = self.counters.setdefault(api, {}).setdefault(category, {})
+        increment_bounded(counters, value, CONF.stats.max_tracked_values)
+
+    def record_latency(self, api, name, elapsed):
+        """Add a duration, in seconds, to the latency histogram of `name`."""
+        histogram = self.counters.setdefault(api, {}).setdefault(
+            LATENCY_PREFIX + name, {})
+        bucket = bisect.bisect_left(LATENCY_BUCKETS, elapsed * 1000)
+        histogram[bucket] = histogram.get(bucket, 0) + 1
+
+    def record_call(self, name, elapsed):
+        """Call observer timing the calls made through the managers."""
+        self.record_latency(BACKEND_API, name, elapsed)
+
+    def record_pool_event(self, engine_name, event, elapsed=None):
+        """Pool observer counting SQL connection pool events per engine.
+
+        The time spent waiting for a connection is recorded as the latency of
+        '<engine> <event>'.
+
+        """
+        self.increment(SQL_API, event, engine_name)
+        if elapsed is not None:
+            self.record_latency(SQL_API, '%s %s' % (engine_name, event),
+                                elapsed)
+
+    def flush(self, stats_api, force=False):
+        """Write the counters collected since the last flush, if it's due."""
+        now = time.time()
+        if not force and now - self.last_flush < CONF.stats.flush_interval:
+            return
+        self.last_flush = now
+        counters, self.counters = self.counters, {}
+        worker = worker_id()
+        for api, stats_ref in counters.iteritems():
+            stats_api.flush_stats(api, worker, stats_ref)
+
+    def reset(self):
+        self.counters = {}
+
+
+AGGREGATOR = Aggregator()
+
 
 class Manager(manager.Manager):
     """Default pivot point for the Stats backend.
@@ -73,6 +230,27 @@ class Driver(object):
         """Increment the counter for an individual statistic."""
         raise exception.NotImplemented()
 
+    def flush_stats(self, api, worker, stats_ref):
+        """Add counters collected by a worker process to its statistics.
+
+        Each worker only ever updates its own statistics, so concurrent
+        flushes from several workers never contend for the same record.
+
+        """
+        raise exception.NotImplemented()
+
+    def get_worker_stats(self, api):
+        """Retrieve the statistics flushed by each worker for an interface.
+
+        :returns: a list of stats dicts, one per worker
+
+        """
+        raise exception.NotImplemented()
+
+    def delete_stats(self, api):
+        """Discard all statistics for an interface."""
+        raise exception.NotImplemented()
+
 
 class StatsExtension(wsgi.ExtensionRouter):
     """Reports on previously-collected request/response statistics."""
@@ -100,42 +278,62 @@ class StatsController(wsgi.Application):
         self.token_api = token.Manager()
         super(StatsController, self).__init__()
 
+    def _get_api_stats(self, api):
+        stats_ref = merge_stats(self.stats_api.get_worker_stats(api),
+                                CONF.stats.max_tracked_values)
+        latency = {}
+        for category in stats_ref.keys():
+            if category.startswith(LATENCY_PREFIX):
+                name = category[len(LATENCY_PREFIX):]
+                latency[name] = summarize_latency(stats_ref.pop(category))
+        return {
+            'type': 'identity',
+            'api': api,
+            'extra': stats_ref,
+            'latency': latency,
+        }
+
     def get_stats(self, context):
         self.assert_admin(context)
+        AGGREGATOR.flush(self.stats_api, force=True)
         return {
             'OS-STATS:stats': [
-                {
-                    'type': 'identity',
-                    'api': 'admin',
-                    'extra': self.stats_api.get_stats('admin'),
-                },
-                {
-                    'type': 'identity',
-                    'api': 'public',
-                    'extra': self.stats_api.get_stats('public'),
-                },
+                self._get_api_stats('admin'),
+                self._get_api_stats('public'),
+                self._get_api_stats(BACKEND_API),
+                self._get_api_stats(SQL_API),
             ]
         }
 
     def reset_stats(self, context):
         self.assert_admin(context)
-        self.stats_api.set_stats('public', dict())
-        self.stats_api.set_stats('admin', dict())
+        AGGREGATOR.reset()
+        self.stats_api.delete_stats('public')
+        self.stats_api.delete_stats('admin')
+        self.stats_api.delete_stats(BACKEND_API)
+        self.stats_api.delete_stats(SQL_API)
 
 
 class StatsMiddleware(wsgi.Middleware):
-    """Monitors various request/response attribute statistics."""
+    """Monitors various request/response attribute statistics.
+
+    Requests are counted by matched route template rather than by raw path,
+    and each statistic tracks a bounded number of distinct values. The latency
+    of each route, and of each call made through the managers, is recorded in
+    a histogram.
+
+    """
 
     request_attributes = ['application_url',
                           'method',
-                          'path',
-                          'path_qs',
                           'remote_addr']
 
     response_attributes = ['status_int']
 
     def __init__(self, *args, **kwargs):
         self.stats_api = Manager()
+        manager.register_call_observer(AGGREGATOR.record_call)
+        sql.register_pool_observer(AGGREGATOR.record_pool_event)
         return super(StatsMiddleware, self).__init__(*args, **kwargs)
 
     def _resolve_api(self, host):
@@ -148,15 +346,26 @@ class StatsMiddleware(wsgi.Middleware):
 
     def capture_stats(self, host, obj, attributes):
         """Collect each attribute from the given object."""
+        api = self._resolve_api(host)
         for attribute in attributes:
-            self.stats_api.increment_stat(
-                self._resolve_api(host), attribute, getattr(obj, attribute))
+            AGGREGATOR.increment(api, attribute, getattr(obj, attribute))
 
     def process_request(self, request):
         """Monitor incoming request attributes."""
+        request.environ['keystone.stats.start_time'] = time.time()
         self.capture_stats(request.host, request, self.request_attributes)
 
     def process_response(self, request, response):
         """Monitor outgoing response attributes."""
         self.capture_stats(request.host, response, self.response_attributes)
+
+        api = self._resolve_api(request.host)
+        route = route_template(request)
+        AGGREGATOR.increment(api, 'route', route)
+        start_time = request.environ.get('keystone.stats.start_time')
+        if start_time is not None:
+            AGGREGATOR.record_latency(api,
+                                      '%s %s' % (request.method, route),
+                                      time.time() - start_time)
+        AGGREGATOR.flush(self.stats_api)
         return response
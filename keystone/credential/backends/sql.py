@@ -48,10 +48,14 @@ class Credential(sql.Base, credential.Driver):
             session.flush()
         return ref.to_dict()
 
-    def list_credentials(self):
-        session = self.get_session()
-        refs = session.query(CredentialModel).all()
-        return [ref.to_dict() for ref in refs]
+    def list_credentials(self, user_id=None, project_id=None):
+        session = self.get_session(read_only=True)
+        query = session.query(CredentialModel)
+        if user_id is not None:
+            query = query.filter_by(user_id=user_id)
+        if project_id is not None:
+            query = query.filter_by(project_id=project_id)
+        return [ref.to_dict() for ref in query.all()]
 
     def _get_credential(self, session, credential_id):
         ref = session.query(CredentialModel).get(credential_id)
@@ -60,7 +64,7 @@ class Credential(sql.Base, credential.Driver):
         return ref
 
     def get_credential(self, credential_id):
-        session = self.get_session()
+        session = self.get_session(read_only=True)
         return self._get_credential(session, credential_id).to_dict()
 
     @sql.handle_conflicts(type='credential')
@@ -86,3 +90,16 @@ class Credential(sql.Base, credential.Driver):
             ref = self._get_credential(session, credential_id)
             session.delete(ref)
             session.flush()
+
+    def _delete_credentials(self, **criteria):
+        session = self.get_session()
+        with session.begin():
+            query = session.query(CredentialModel).filter_by(**criteria)
+            query.delete(synchronize_session=False)
+            session.flush()
+
+    def delete_credentials_for_user(self, user_id):
+        self._delete_credentials(user_id=user_id)
+
+    def delete_credentials_for_project(self, project_id):
+        self._delete_credentials(project_id=project_id)
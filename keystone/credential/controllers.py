@@ -27,9 +27,11 @@ class CredentialV3(controller.V3Controller):
         ref = self.credential_api.create_credential(ref['id'], ref)
         return CredentialV3.wrap_member(context, ref)
 
-    @controller.protected
-    def list_credentials(self, context):
-        refs = self.credential_api.list_credentials()
+    @controller.filterprotected('user_id', 'project_id')
+    def list_credentials(self, context, filters):
+        query = context['query_string']
+        refs = self.credential_api.list_credentials(
+            user_id=query.get('user_id'), project_id=query.get('project_id'))
         return CredentialV3.wrap_collection(context, refs)
 
     @controller.protected
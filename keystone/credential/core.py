@@ -52,9 +52,12 @@ class Driver(object):
         """
         raise exception.NotImplemented()
 
-    def list_credentials(self):
+    def list_credentials(self, user_id=None, project_id=None):
         """List all credentials in the system.
 
+        If user_id or project_id is given, only the credentials of that
+        user or project are listed.
+
         :returns: a list of credential_refs or an empty list.
 
         """
@@ -85,3 +88,11 @@ class Driver(object):
 
         """
         raise exception.NotImplemented()
+
+    def delete_credentials_for_user(self, user_id):
+        """Deletes all the credentials of a user, if any."""
+        raise exception.NotImplemented()
+
+    def delete_credentials_for_project(self, project_id):
+        """Deletes all the credentials of a project, if any."""
+        raise exception.NotImplemented()
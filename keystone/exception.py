@@ -244,6 +244,14 @@ class NotImplemented(Error):
     title = 'Not Implemented'
 
 
+class ServiceUnavailable(Error):
+    """The service is temporarily unable to handle the request, please retry
+    later.
+    """
+    code = 503
+    title = 'Service Unavailable'
+
+
 class PasteConfigNotFound(UnexpectedError):
     """The Keystone paste configuration file %(config_file)s could not be
     found.
@@ -20,9 +20,14 @@ from keystone import exception
 from keystone import identity
 
 
+def _user_groups(key, user_ref):
+    return user_ref.get('groups')
+
+
 class Identity(kvs.Base, identity.Driver):
     def __init__(self):
         super(Identity, self).__init__()
+        self.db.add_index('user_group', 'user-', _user_groups)
 
     def default_assignment_driver(self):
         return "keystone.assignment.backends.kvs.Assignment"
@@ -34,8 +39,11 @@ class Identity(kvs.Base, identity.Driver):
             user_ref = self._get_user(user_id)
         except exception.UserNotFound:
             raise AssertionError('Invalid user / password')
-        if not utils.check_password(password, user_ref.get('password')):
+        if not utils.check_user_password(user_id, password,
+                                         user_ref.get('password')):
             raise AssertionError('Invalid user / password')
+        if utils.password_needs_rehash(user_ref):
+            self.update_user(user_id, {'password': password})
         return identity.filter_user(user_ref)
 
     def _get_user(self, user_id):
@@ -61,6 +69,15 @@ class Identity(kvs.Base, identity.Driver):
         user_ids = self.db.get('user_list', [])
         return [self.get_user(x) for x in user_ids]
 
+    def export_users(self):
+        for user_id in self.db.get('user_list', []):
+            yield identity.filter_exported_user(self._get_user(user_id))
+
+    def export_memberships(self):
+        for user_id in self.db.get('user_list', []):
+            for group_id in self._get_user(user_id).get('groups', []):
+                yield {'user_id': user_id, 'group_id': group_id}
+
     # CRUD
     def create_user(self, user_id, user):
         try:
@@ -103,7 +120,8 @@ class Identity(kvs.Base, identity.Driver):
         except exception.NotFound:
             raise exception.UserNotFound(user_id=user_id)
         new_user = old_user.copy()
-        user = utils.hash_user_password(user)
+        new_user.update(user)
+        user = utils.hash_user_password(user, utils.password_tier(new_user))
         new_user.update(user)
         if new_user['id'] != user_id:
             raise exception.ValidationError('Cannot change user ID')
@@ -137,11 +155,8 @@ class Identity(kvs.Base, identity.Driver):
 
     def list_users_in_group(self, group_id):
         self.get_group(group_id)
-        user_keys = filter(lambda x: x.startswith("user-"), self.db.keys())
-        user_refs = [self.db.get(key) for key in user_keys]
-        user_refs_for_group = filter(lambda x: group_id in x['groups'],
-                                     user_refs)
-        return [identity.filter_user(x) for x in user_refs_for_group]
+        user_keys = self.db.find('user_group', group_id)
+        return [identity.filter_user(self.db.get(key)) for key in user_keys]
 
     def list_groups_for_user(self, user_id):
         user_ref = self._get_user(user_id)
@@ -223,13 +238,11 @@ class Identity(kvs.Base, identity.Driver):
         except exception.NotFound:
             raise exception.GroupNotFound(group_id=group_id)
         # Delete any entries in the group lists of all users
-        user_keys = filter(lambda x: x.startswith("user-"), self.db.keys())
-        user_refs = [self.db.get(key) for key in user_keys]
-        for user_ref in user_refs:
+        for key in self.db.find('user_group', group_id):
+            user_ref = self.db.get(key)
             groups = set(user_ref.get('groups', []))
-            if group_id in groups:
-                groups.remove(group_id)
-                self.update_user(user_ref['id'], {'groups': list(groups)})
+            groups.remove(group_id)
+            self.update_user(user_ref['id'], {'groups': list(groups)})
 
         # Now delete the group itself
         self.db.delete('group-%s' % group_id)
@@ -87,6 +87,24 @@ class Identity(identity.Driver):
     def list_users(self):
         return self.assignment._set_default_domain(self.user.get_all())
 
+    def export_users(self):
+        # userPassword is hashed for the LDAP server, which other backends
+        # can't verify, so it isn't exported
+        for user in self.user.iter_all():
+            user = identity.filter_user(user)
+            user.pop('enabled_nomask', None)
+            yield self.assignment._set_default_domain(user)
+
+    def export_groups(self):
+        for group in self.group.iter_all():
+            yield self.assignment._set_default_domain(group)
+
+    def export_memberships(self):
+        for group in self.group.iter_all():
+            for user_dn in self.group.list_group_users(group['id']):
+                yield {'user_id': self.user._dn_to_id(user_dn),
+                       'group_id': group['id']}
+
     def get_user_by_name(self, user_name, domain_id):
         self.assignment._validate_default_domain_id(domain_id)
         ref = identity.filter_user(self.user.get_by_name(user_name))
@@ -264,7 +282,7 @@ class UserApi(common_ldap.EnabledEmuMixIn, common_ldap.BaseLdap):
 
     def check_password(self, user_id, password):
         user = self.get(user_id)
-        return utils.check_password(password, user.password)
+        return utils.check_user_password(user_id, password, user.password)
 
     def get_filtered(self, user_id):
         user = self.get(user_id)
@@ -81,7 +81,8 @@ class Identity(sql.Base, identity.Driver):
         https://blueprints.launchpad.net/keystone/+spec/sql-identiy-pam
 
         """
-        return utils.check_password(password, user_ref.password)
+        return utils.check_user_password(user_ref.id, password,
+                                         user_ref.password)
 
     # Identity interface
     def authenticate(self, user_id=None, password=None):
@@ -93,7 +94,10 @@ class Identity(sql.Base, identity.Driver):
             raise AssertionError('Invalid user / password')
         if not self._check_password(password, user_ref):
             raise AssertionError('Invalid user / password')
-        return identity.filter_user(user_ref.to_dict())
+        user_dict = user_ref.to_dict()
+        if utils.password_needs_rehash(user_dict):
+            self.update_user(user_id, {'password': password})
+        return identity.filter_user(user_dict)
 
     # user crud
 
@@ -107,10 +111,20 @@ class Identity(sql.Base, identity.Driver):
             session.flush()
         return identity.filter_user(user_ref.to_dict())
 
-    def list_users(self):
+    @sql.handle_conflicts(type='user')
+    def create_users(self, users):
+        users = utils.hash_user_passwords(users)
         session = self.get_session()
-        user_refs = session.query(User)
-        return [identity.filter_user(x.to_dict()) for x in user_refs]
+        with session.begin():
+            self.insert_dicts(session, User, users)
+        return [identity.filter_user(user) for user in users]
+
+    def list_users(self):
+        return [identity.filter_user(x) for x in self.select_dicts(User)]
+
+    def export_users(self):
+        for user in self.iter_dicts(User):
+            yield identity.filter_exported_user(user)
 
     def _get_user(self, session, user_id):
         user_ref = session.query(User).get(user_id)
@@ -119,11 +133,11 @@ class Identity(sql.Base, identity.Driver):
         return user_ref
 
     def get_user(self, user_id):
-        session = self.get_session()
+        session = self.get_session(read_only=True)
         return identity.filter_user(self._get_user(session, user_id).to_dict())
 
     def get_user_by_name(self, user_name, domain_id):
-        session = self.get_session()
+        session = self.get_session(read_only=True)
         query = session.query(User)
         query = query.filter_by(name=user_name)
         query = query.filter_by(domain_id=domain_id)
@@ -142,7 +156,9 @@ class Identity(sql.Base, identity.Driver):
         with session.begin():
             user_ref = self._get_user(session, user_id)
             old_user_dict = user_ref.to_dict()
-            user = utils.hash_user_password(user)
+            old_user_dict.update(user)
+            user = utils.hash_user_password(
+                user, utils.password_tier(old_user_dict))
             for k in user:
                 old_user_dict[k] = user[k]
             new_user = User.from_dict(old_user_dict)
@@ -170,7 +186,7 @@ class Identity(sql.Base, identity.Driver):
             session.flush()
 
     def check_user_in_group(self, user_id, group_id):
-        session = self.get_session()
+        session = self.get_session(read_only=True)
         self.get_group(group_id)
         self.get_user(user_id)
         query = session.query(UserGroupMembership)
@@ -194,7 +210,7 @@ class Identity(sql.Base, identity.Driver):
             session.flush()
 
     def list_groups_for_user(self, user_id):
-        session = self.get_session()
+        session = self.get_session(read_only=True)
         self.get_user(user_id)
         query = session.query(UserGroupMembership)
         query = query.filter_by(user_id=user_id)
@@ -202,7 +218,7 @@ class Identity(sql.Base, identity.Driver):
         return [self.get_group(x.group_id) for x in membership_refs]
 
     def list_users_in_group(self, group_id):
-        session = self.get_session()
+        session = self.get_session(read_only=True)
         self.get_group(group_id)
         query = session.query(UserGroupMembership)
         query = query.filter_by(group_id=group_id)
@@ -234,11 +250,25 @@ class Identity(sql.Base, identity.Driver):
             session.flush()
         return ref.to_dict()
 
-    def list_groups(self):
+    @sql.handle_conflicts(type='group')
+    def create_groups(self, groups):
         session = self.get_session()
+        with session.begin():
+            self.insert_dicts(session, Group, groups)
+        return groups
+
+    def list_groups(self):
+        session = self.get_session(read_only=True)
         refs = session.query(Group).all()
         return [ref.to_dict() for ref in refs]
 
+    def export_groups(self):
+        return self.iter_dicts(Group)
+
+    def export_memberships(self):
+        for row in self.iter_rows(UserGroupMembership):
+            yield {'user_id': row.user_id, 'group_id': row.group_id}
+
     def _get_group(self, session, group_id):
         ref = session.query(Group).get(group_id)
         if not ref:
@@ -246,7 +276,7 @@ class Identity(sql.Base, identity.Driver):
         return ref
 
     def get_group(self, group_id):
-        session = self.get_session()
+        session = self.get_session(read_only=True)
         return self._get_group(session, group_id).to_dict()
 
     @sql.handle_conflicts(type='group')
@@ -423,28 +423,16 @@ class DomainV3(controller.V3Controller):
 
         ref = self.identity_api.update_domain(domain_id, domain)
 
-        # disable owned users & projects when the API user specifically set
-        #     enabled=False
-        # FIXME(dolph): need a driver call to directly revoke all tokens by
-        #               project or domain, regardless of user
+        # revoke the tokens of owned users & projects, and of the domain
+        #     itself, when the API user specifically set enabled=False
         if not domain.get('enabled', True):
-            projects = [x for x in self.identity_api.list_projects()
-                        if x.get('domain_id') == domain_id]
-            for user in self.identity_api.list_users():
-                # TODO(dolph): disable domain-scoped tokens
-                """
-                self.token_api.revoke_tokens(
-                    user_id=user['id'],
-                    domain_id=domain_id)
-                """
-                # revoke all tokens for users owned by this domain
-                if user.get('domain_id') == domain_id:
-                    self._delete_tokens_for_user(user['id'])
-                else:
-                    # only revoke tokens on projects owned by this domain
-                    for project in projects:
-                        self._delete_tokens_for_user(
-                            user['id'], project_id=project['id'])
+            self._delete_tokens_for_users(
+                user['id'] for user in self.identity_api.list_users()
+                if user.get('domain_id') == domain_id)
+            for project in self.identity_api.list_projects():
+                if project.get('domain_id') == domain_id:
+                    self._delete_tokens_for_project(project['id'])
+            self._delete_tokens_for_domain(domain_id)
         return DomainV3.wrap_member(context, ref)
 
     def _delete_domain_contents(self, context, domain_id):
@@ -474,11 +462,13 @@ class DomainV3(controller.V3Controller):
         # Consider removing this code once these have been fixed.
         user_refs = self.identity_api.list_users()
         user_refs = [r for r in user_refs if r['domain_id'] == domain_id]
+        disabled_user_ids = []
         for user in user_refs:
             if user['enabled']:
                 user['enabled'] = False
                 self.identity_api.update_user(user['id'], user)
-                self._delete_tokens_for_user(user['id'])
+                disabled_user_ids.append(user['id'])
+        self._delete_tokens_for_users(disabled_user_ids)
 
         # Now, for safety, reload list of users, as well as projects, that are
         # owned by this domain.
@@ -573,9 +563,7 @@ class ProjectV3(controller.V3Controller):
 
     def _delete_project(self, context, project_id):
         # Delete any credentials that reference this project
-        for cred in self.credential_api.list_credentials():
-            if cred['project_id'] == project_id:
-                self.credential_api.delete_credential(cred['id'])
+        self.credential_api.delete_credentials_for_project(project_id)
         # Finally delete the project itself - the backend is
         # responsible for deleting any role assignments related
         # to this project
@@ -641,9 +629,7 @@ class UserV3(controller.V3Controller):
 
     def _delete_user(self, context, user_id):
         # Delete any credentials that reference this user
-        for cred in self.credential_api.list_credentials():
-            if cred['user_id'] == user_id:
-                self.credential_api.delete_credential(cred['id'])
+        self.credential_api.delete_credentials_for_user(user_id)
 
         # Make sure any tokens are marked as deleted
         self._delete_tokens_for_user(user_id)
@@ -699,8 +685,7 @@ class GroupV3(controller.V3Controller):
 
         user_refs = self.identity_api.list_users_in_group(group_id)
         self.identity_api.delete_group(group_id)
-        for user in user_refs:
-            self._delete_tokens_for_user(user['id'])
+        self._delete_tokens_for_users(user['id'] for user in user_refs)
 
     @controller.protected
     def delete_group(self, context, group_id):
@@ -21,6 +21,8 @@ from keystone import clean
 from keystone.common import dependency
 from keystone.common import logging
 from keystone.common import manager
+from keystone.common import notifications
+from keystone.common import utils
 from keystone import config
 from keystone import exception
 
@@ -52,6 +54,24 @@ def filter_user(user_ref):
     return user_ref
 
 
+def filter_exported_user(user_ref):
+    """Filter a user dict like filter_user(), but keep its password hash."""
+    password = user_ref.get('password')
+    user_ref = filter_user(user_ref)
+    if password:
+        user_ref['password'] = password
+    return user_ref
+
+
+def _invalidate_password_cache(event):
+    """Forgets the verified passwords of updated and deleted users."""
+    if event['operation'] in (notifications.UPDATED, notifications.DELETED):
+        utils.PASSWORD_CACHE.invalidate(event['id'])
+
+
+notifications.register_listener(_invalidate_password_cache, 'user')
+
+
 @dependency.provider('identity_api')
 class Manager(manager.Manager):
     """Default pivot point for the Identity backend.
@@ -61,6 +81,20 @@ class Manager(manager.Manager):
 
     """
 
+    notifications = {
+        'create_user': ('user', notifications.CREATED, 'user_id'),
+        'create_users': ('user', notifications.CREATED, 'user_id'),
+        'update_user': ('user', notifications.UPDATED, 'user_id'),
+        'delete_user': ('user', notifications.DELETED, 'user_id'),
+        'create_group': ('group', notifications.CREATED, 'group_id'),
+        'create_groups': ('group', notifications.CREATED, 'group_id'),
+        'update_group': ('group', notifications.UPDATED, 'group_id'),
+        'delete_group': ('group', notifications.DELETED, 'group_id'),
+        'add_user_to_group': ('group_membership', notifications.CREATED, None),
+        'remove_user_from_group': ('group_membership', notifications.DELETED,
+                                   None),
+    }
+
     def __init__(self, assignment_api=None):
         super(Manager, self).__init__(CONF.identity.driver)
         if assignment_api is None:
@@ -69,11 +103,24 @@ class Manager(manager.Manager):
         self.driver.assignment = assignment_api
 
     def create_user(self, user_id, user_ref):
+        user = self._clean_new_user(user_ref)
+        return self.driver.create_user(user_id, user)
+
+    def create_users(self, user_refs):
+        """Creates several users at once, all or none of them.
+
+        :raises: keystone.exception.NotImplemented if the driver can't
+
+        """
+        users = [self._clean_new_user(user_ref) for user_ref in user_refs]
+        return self.driver.create_users(users)
+
+    def _clean_new_user(self, user_ref):
         user = user_ref.copy()
         user['name'] = clean.user_name(user['name'])
         user.setdefault('enabled', True)
         user['enabled'] = clean.user_enabled(user['enabled'])
-        return self.driver.create_user(user_id, user)
+        return user
 
     def update_user(self, user_id, user_ref):
         user = user_ref.copy()
@@ -83,17 +130,47 @@ class Manager(manager.Manager):
             user['enabled'] = clean.user_enabled(user['enabled'])
         return self.driver.update_user(user_id, user)
 
+    def delete_user(self, user_id):
+        self.driver.delete_user(user_id)
+
     def create_group(self, group_id, group_ref):
         group = group_ref.copy()
         group.setdefault('description', '')
         return self.driver.create_group(group_id, group)
 
+    def create_groups(self, group_refs):
+        """Creates several groups at once, all or none of them.
+
+        :raises: keystone.exception.NotImplemented if the driver can't
+
+        """
+        groups = []
+        for group_ref in group_refs:
+            group = group_ref.copy()
+            group.setdefault('description', '')
+            groups.append(group)
+        return self.driver.create_groups(groups)
+
     def create_project(self, tenant_id, tenant_ref):
+        tenant = self._clean_new_project(tenant_ref)
+        return self.assignment_api.create_project(tenant_id, tenant)
+
+    def create_projects(self, tenant_refs):
+        """Creates several projects at once, all or none of them.
+
+        :raises: keystone.exception.NotImplemented if the driver can't
+
+        """
+        tenants = [self._clean_new_project(tenant_ref)
+                   for tenant_ref in tenant_refs]
+        return self.assignment_api.create_projects(tenants)
+
+    def _clean_new_project(self, tenant_ref):
         tenant = tenant_ref.copy()
         tenant.setdefault('enabled', True)
         tenant['enabled'] = clean.project_enabled(tenant['enabled'])
         tenant.setdefault('description', '')
-        return self.assignment_api.create_project(tenant_id, tenant)
+        return tenant
 
     def update_project(self, tenant_id, tenant_ref):
         tenant = tenant_ref.copy()
@@ -224,6 +301,16 @@ class Driver(object):
         """
         raise exception.NotImplemented()
 
+    def create_users(self, users):
+        """Creates several users at once, all or none of them.
+
+        :param users: list of user_refs, including their ID
+        :returns: a list of user_refs
+        :raises: keystone.exception.Conflict
+
+        """
+        raise exception.NotImplemented()
+
     def list_users(self):
         """List all users in the system.
 
@@ -311,6 +398,16 @@ class Driver(object):
         """
         raise exception.NotImplemented()
 
+    def create_groups(self, groups):
+        """Creates several groups at once, all or none of them.
+
+        :param groups: list of group_refs, including their ID
+        :returns: a list of group_refs
+        :raises: keystone.exception.Conflict
+
+        """
+        raise exception.NotImplemented()
+
     def list_groups(self):
         """List all groups in the system.
 
@@ -353,6 +450,33 @@ class Driver(object):
         """
         raise exception.NotImplemented()
 
+    def export_users(self):
+        """Yields all users, including the hash of their password if stored.
+
+        Drivers which can should override this to avoid holding all the users
+        in memory at once, as list_users() does.
+
+        """
+        return iter(self.list_users())
+
+    def export_groups(self):
+        """Yields all groups.
+
+        Drivers which can should override this to avoid holding all the
+        groups in memory at once, as list_groups() does.
+
+        """
+        return iter(self.list_groups())
+
+    def export_memberships(self):
+        """Yields a dict with a user_id and a group_id per group membership.
+
+        """
+        groups = self.export_groups()
+        return ({'user_id': user['id'], 'group_id': group['id']}
+                for group in groups
+                for user in self.list_users_in_group(group['id']))
+
     #end of identity
 
     # Assignments
@@ -20,6 +20,10 @@
 """
 Starting point for routing EC2 requests.
 
+Connections to Keystone are kept alive and reused. With
+keystone_ec2_cache_time set, the token Keystone returned for an identical
+signed request is reused for that many seconds.
+
 """
 
 import urlparse
@@ -32,16 +36,47 @@ from nova import flags
 from nova import utils
 from nova import wsgi
 
+from keystone.middleware import http_pool
+
 
 FLAGS = flags.FLAGS
 flags.DEFINE_string('keystone_ec2_url',
                     'http://localhost:5000/v2.0/ec2tokens',
                     'URL to get token from ec2 request.')
+flags.DEFINE_float('keystone_ec2_timeout', 10,
+                   'Timeout of requests to keystone_ec2_url, in seconds.')
+flags.DEFINE_integer('keystone_ec2_pool_size', 10,
+                     'Connections to keystone_ec2_url kept alive.')
+flags.DEFINE_integer('keystone_ec2_retries', 1,
+                     'Times a failed request to keystone_ec2_url is retried.')
+flags.DEFINE_integer('keystone_ec2_cache_time', 0,
+                     'Seconds a token is reused for the same signed request.')
 
 
 class EC2Token(wsgi.Middleware):
     """Authenticate an EC2 request with keystone and convert to token."""
 
+    def __init__(self, application):
+        super(EC2Token, self).__init__(application)
+        self.http_pool = http_pool.ConnectionPool(
+            self._connect,
+            max_idle=FLAGS.keystone_ec2_pool_size,
+            retries=FLAGS.keystone_ec2_retries)
+        self.result_cache = http_pool.ResultCache(
+            FLAGS.keystone_ec2_cache_time)
+
+    def _connect(self):
+        # Disable 'has no x member' pylint error
+        # for httplib and urlparse
+        # pylint: disable-msg=E1101
+        o = urlparse.urlparse(FLAGS.keystone_ec2_url)
+        if o.scheme == 'http':
+            return httplib.HTTPConnection(
+                o.netloc, timeout=FLAGS.keystone_ec2_timeout)
+        else:
+            return httplib.HTTPSConnection(
+                o.netloc, timeout=FLAGS.keystone_ec2_timeout)
+
     @webob.dec.wsgify(RequestClass=wsgi.Request)
     def __call__(self, req):
         # Read request signature and access id.
@@ -67,30 +102,25 @@ class EC2Token(wsgi.Middleware):
                 'params': auth_params,
             }
         }
-        creds_json = utils.dumps(creds)
-        headers = {'Content-Type': 'application/json'}
-
-        # Disable 'has no x member' pylint error
-        # for httplib and urlparse
-        # pylint: disable-msg=E1101
-        o = urlparse.urlparse(FLAGS.keystone_ec2_url)
-        if o.scheme == 'http':
-            conn = httplib.HTTPConnection(o.netloc)
-        else:
-            conn = httplib.HTTPSConnection(o.netloc)
-        conn.request('POST', o.path, body=creds_json, headers=headers)
-        response = conn.getresponse().read()
-        conn.close()
-
-        # NOTE(vish): We could save a call to keystone by
-        #             having keystone return token, tenant,
-        #             user, and roles from this call.
-
-        result = utils.loads(response)
-        try:
-            token_id = result['access']['token']['id']
-        except (AttributeError, KeyError):
-            raise webob.exc.HTTPBadRequest()
+        cache_key = self.result_cache.key(creds)
+        token_id = self.result_cache.get(cache_key)
+        if token_id is None:
+            creds_json = utils.dumps(creds)
+            headers = {'Content-Type': 'application/json'}
+            o = urlparse.urlparse(FLAGS.keystone_ec2_url)
+            _response, output = self.http_pool.request(
+                'POST', o.path, body=creds_json, headers=headers)
+
+            # NOTE(vish): We could save a call to keystone by
+            #             having keystone return token, tenant,
+            #             user, and roles from this call.
+
+            result = utils.loads(output)
+            try:
+                token_id = result['access']['token']['id']
+            except (AttributeError, KeyError):
+                raise webob.exc.HTTPBadRequest()
+            self.result_cache.set(cache_key, token_id)
 
         # Authenticated!
         req.headers['X-Auth-Token'] = token_id
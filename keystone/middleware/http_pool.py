@@ -0,0 +1,134 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""
+Helpers for middleware calling Keystone on every request.
+
+* ConnectionPool keeps HTTP(S) connections to Keystone alive between
+  requests, so that they don't each pay for a TCP and TLS handshake.
+* ResultCache remembers Keystone's replies to identical requests for a few
+  seconds.
+
+Both only rely on the standard library, so that they can be used from
+Swift and Nova middleware.
+
+"""
+
+import collections
+import hashlib
+import time
+
+from keystone.openstack.common import jsonutils
+
+
+class ConnectionPool(object):
+    """Reuses keep-alive connections to one HTTP server.
+
+    :param connect: returns a new, not yet connected
+                    httplib.HTTPConnection (or HTTPSConnection)
+    :param max_idle: maximum number of idle connections kept open
+    :param retries: how many times a failed request is sent again, on a
+                    new connection; a kept-alive connection may have been
+                    closed by the server meanwhile
+
+    """
+
+    def __init__(self, connect, max_idle=10, retries=1):
+        self.connect = connect
+        self.max_idle = max_idle
+        self.retries = retries
+        self.idle = collections.deque()
+
+    def _get_connection(self):
+        try:
+            return self.idle.pop()
+        except IndexError:
+            return self.connect()
+
+    def _put_connection(self, conn, response):
+        if (getattr(response, 'will_close', False) or
+                len(self.idle) >= self.max_idle):
+            conn.close()
+        else:
+            self.idle.append(conn)
+
+    def request(self, method, path, body=None, headers=None):
+        """Sends a request and reads the whole reply.
+
+        :returns: (response, body of the response)
+        :raises: the error of the last attempt, if none succeeded
+
+        """
+        attempt = 0
+        while True:
+            conn = self._get_connection()
+            try:
+                conn.request(method, path, body=body, headers=headers or {})
+                response = conn.getresponse()
+                output = response.read()
+            except Exception:
+                conn.close()
+                attempt += 1
+                if attempt > self.retries:
+                    raise
+                continue
+            self._put_connection(conn, response)
+            return response, output
+
+    def close(self):
+        """Closes all the idle connections."""
+        while self.idle:
+            self.idle.pop().close()
+
+
+class ResultCache(object):
+    """Remembers results for ttl seconds, up to max_size of them."""
+
+    def __init__(self, ttl, max_size=1000):
+        self.ttl = ttl
+        self.max_size = max_size
+        # key -> (result, expiry time)
+        self.entries = {}
+
+    @staticmethod
+    def key(*parts):
+        """Returns a digest of parts, suitable as a cache key."""
+        return hashlib.sha256(
+            jsonutils.dumps(parts, sort_keys=True)).hexdigest()
+
+    def get(self, key):
+        if not self.ttl:
+            return None
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        result, expires = entry
+        if expires < time.time():
+            self.entries.pop(key, None)
+            return None
+        return result
+
+    def set(self, key, result):
+        if not self.ttl:
+            return
+        now = time.time()
+        if len(self.entries) >= self.max_size:
+            for k, (_result, expires) in self.entries.items():
+                if expires < now:
+                    del self.entries[k]
+            if len(self.entries) >= self.max_size:
+                self.entries.popitem()
+        self.entries[key] = (result, now + self.ttl)
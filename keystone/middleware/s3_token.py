@@ -31,6 +31,11 @@ This WSGI component:
 * Validate s3 token in Keystone.
 * Transform the account name to AUTH_%(tenant_name).
 
+Connections to Keystone are kept alive and reused (see ``http_pool_size``,
+``http_timeout`` and ``http_retries``). With ``cache_time`` set, Keystone's
+reply for an access key, string to sign and signature is reused for that
+many seconds.
+
 """
 
 import httplib
@@ -38,6 +43,7 @@ import webob
 
 from swift.common import utils as swift_utils
 
+from keystone.middleware import http_pool
 from keystone.openstack.common import jsonutils
 
 
@@ -68,6 +74,14 @@ class S3Token(object):
         # SSL
         self.cert_file = conf.get('certfile')
         self.key_file = conf.get('keyfile')
+        self.http_timeout = float(conf.get('http_timeout', 10))
+        self.http_pool = http_pool.ConnectionPool(
+            self._connect,
+            max_idle=int(conf.get('http_pool_size', 10)),
+            retries=int(conf.get('http_retries', 1)))
+        self.result_cache = http_pool.ResultCache(
+            int(conf.get('cache_time', 0)),
+            max_size=int(conf.get('cache_size', 1000)))
 
     def deny_request(self, code):
         error_table = {
@@ -83,8 +97,7 @@ class S3Token(object):
                      (code, error_table[code][1]))
         return resp
 
-    def _json_request(self, creds_json):
-        headers = {'Content-Type': 'application/json'}
+    def _connect(self):
         if self.auth_protocol == 'http':
             conn = self.http_client_class(self.auth_host, self.auth_port)
         else:
@@ -92,18 +105,18 @@ class S3Token(object):
                                           self.auth_port,
                                           self.key_file,
                                           self.cert_file)
+        conn.timeout = self.http_timeout
+        return conn
+
+    def _json_request(self, creds_json):
+        headers = {'Content-Type': 'application/json'}
         try:
-            conn.request('POST', '/v2.0/s3tokens',
-                         body=creds_json,
-                         headers=headers)
-            response = conn.getresponse()
-            output = response.read()
+            response, output = self.http_pool.request(
+                'POST', '/v2.0/s3tokens', body=creds_json, headers=headers)
         except Exception as e:
             self.logger.info('HTTP connection exception: %s' % e)
             resp = self.deny_request('InvalidURI')
             raise ServiceError(resp)
-        finally:
-            conn.close()
 
         if response.status < 200 or response.status >= 300:
             self.logger.debug('Keystone reply error: status=%s reason=%s' %
@@ -166,36 +179,40 @@ class S3Token(object):
         creds = {'credentials': {'access': access,
                                  'token': token,
                                  'signature': signature}}
-        creds_json = jsonutils.dumps(creds)
-        self.logger.debug('Connecting to Keystone sending this JSON: %s' %
-                          creds_json)
-        # NOTE(vish): We could save a call to keystone by having
-        #             keystone return token, tenant, user, and roles
-        #             from this call.
-        #
-        # NOTE(chmou): We still have the same problem we would need to
-        #              change token_auth to detect if we already
-        #              identified and not doing a second query and just
-        #              pass it through to swiftauth in this case.
-        try:
-            resp, output = self._json_request(creds_json)
-        except ServiceError as e:
-            resp = e.args[0]
-            msg = 'Received error, exiting middleware with error: %s'
-            self.logger.debug(msg % (resp.status))
-            return resp(environ, start_response)
-
-        self.logger.debug('Keystone Reply: Status: %d, Output: %s' % (
-                          resp.status, output))
+        cache_key = self.result_cache.key(access, token, signature)
+        output = self.result_cache.get(cache_key)
+        if output is None:
+            creds_json = jsonutils.dumps(creds)
+            self.logger.debug('Connecting to Keystone sending this JSON: %s' %
+                              creds_json)
+            # NOTE(vish): We could save a call to keystone by having
+            #             keystone return token, tenant, user, and roles
+            #             from this call.
+            #
+            # NOTE(chmou): We still have the same problem we would need to
+            #              change token_auth to detect if we already
+            #              identified and not doing a second query and just
+            #              pass it through to swiftauth in this case.
+            try:
+                resp, output = self._json_request(creds_json)
+            except ServiceError as e:
+                resp = e.args[0]
+                msg = 'Received error, exiting middleware with error: %s'
+                self.logger.debug(msg % (resp.status))
+                return resp(environ, start_response)
+
+            self.logger.debug('Keystone Reply: Status: %d, Output: %s' % (
+                              resp.status, output))
 
         try:
             identity_info = jsonutils.loads(output)
             token_id = str(identity_info['access']['token']['id'])
             tenant = identity_info['access']['token']['tenant']
         except (ValueError, KeyError):
-            error = 'Error on keystone reply: %d %s'
-            self.logger.debug(error % (resp.status, str(output)))
+            error = 'Error on keystone reply: %s'
+            self.logger.debug(error % str(output))
             return self.deny_request('InvalidURI')(environ, start_response)
+        self.result_cache.set(cache_key, output)
 
         req.headers['X-Auth-Token'] = token_id
         tenant_to_connect = force_tenant or tenant['id']
@@ -46,7 +46,7 @@ class Policy(sql.Base, rules.Policy):
         return ref.to_dict()
 
     def list_policies(self):
-        session = self.get_session()
+        session = self.get_session(read_only=True)
 
         refs = session.query(PolicyModel).all()
         return [ref.to_dict() for ref in refs]
@@ -59,7 +59,7 @@ class Policy(sql.Base, rules.Policy):
         return ref
 
     def get_policy(self, policy_id):
-        session = self.get_session()
+        session = self.get_session(read_only=True)
 
         return self._get_policy(session, policy_id).to_dict()
 
@@ -240,6 +240,7 @@ class TestCase(NoModule, unittest.TestCase):
                 if path in sys.path:
                     sys.path.remove(path)
             kvs.INMEMDB.clear()
+            del sql.core.GLOBAL_READ_ENGINES[:]
             CONF.reset()
 
     def opt_in_group(self, group, **kw):
@@ -14,48 +14,142 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
-import copy
+import datetime
 
 from keystone.common import kvs
 from keystone import exception
 from keystone.openstack.common import timeutils
 from keystone import token
+from keystone.token import codec
+
+
+# Width of the buckets of the expiry index: the expired tokens are evicted
+# a bucket at a time, plus those of the current bucket which have expired.
+EXPIRY_BUCKET_SECONDS = 60
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+
+
+def _expiry_bucket(expires):
+    delta = expires - _EPOCH
+    return (delta.days * 86400 + delta.seconds) // EXPIRY_BUCKET_SECONDS
+
+
+def _token_field(name):
+    """Returns the values function of an index on a field of the header."""
+    def values(key, ref):
+        if ref.get(name):
+            return [ref[name]]
+    return values
+
+
+def _freeze(data):
+    """Returns what is stored for a token, and its interned catalog.
+
+    The token is kept as an encoded record (see keystone.token.codec),
+    which is immutable: it is never copied while stored, and each
+    get_token() decodes a private copy of it, much faster than
+    deep-copying it. Only the fields needed by the indexes are kept beside
+    it.
+
+    :returns: (header, catalog record or None)
+
+    """
+    token_data = (data.get('token_data') or {}).get('token') or {}
+    record, catalog_id, catalog = codec.encode_token(data)
+    return {'id': data['id'],
+            'expires': data['expires'],
+            'user_id': (data.get('user') or {}).get('id'),
+            'tenant_id': (data.get('tenant') or {}).get('id'),
+            'trust_id': data.get('trust_id'),
+            'domain_id': (token_data.get('domain') or {}).get('id'),
+            'catalog_id': catalog_id,
+            'record': record}, catalog
 
 
 class Token(kvs.Base, token.Driver):
+    def __init__(self, db=None):
+        super(Token, self).__init__(db)
+        self.db.add_index('token_user', 'token-', _token_field('user_id'))
+        self.db.add_index('token_trust', 'token-', _token_field('trust_id'))
+        self.db.add_index('token_project', 'token-',
+                          _token_field('tenant_id'))
+        self.db.add_index('token_domain', 'token-',
+                          _token_field('domain_id'))
+        self.db.add_index('token_expiry', ('token-', 'revoked-token-'),
+                          _token_field('expires'), ordered=True,
+                          bucket=_expiry_bucket)
+        self.db.add_index('revoked_token', 'revoked-token-',
+                          _token_field('expires'), ordered=True,
+                          bucket=_expiry_bucket)
+        self.db.add_index('token_catalog', 'token-',
+                          _token_field('catalog_id'))
+        self.db.add_index('revocation_event', 'revoked-token-',
+                          _token_field('seq'), ordered=True)
 
-    # Public interface
-    def get_token(self, token_id):
+    def _get_current(self, token_id):
         try:
             ref = self.db.get('token-%s' % token_id)
         except exception.NotFound:
             raise exception.TokenNotFound(token_id=token_id)
-        now = timeutils.utcnow()
         expiry = ref['expires']
-        if expiry is None:
+        if expiry is None or expiry <= timeutils.utcnow():
             raise exception.TokenNotFound(token_id=token_id)
-        if expiry > now:
-            return copy.deepcopy(ref)
-        else:
+        return ref
+
+    def _get_catalog(self, token_id, catalog_id):
+        try:
+            return self.db.get('token_catalog-%s' % catalog_id)['record']
+        except exception.NotFound:
             raise exception.TokenNotFound(token_id=token_id)
 
+    def _release_catalog(self, ref):
+        """Deletes the catalog of ref if no other token refers to it."""
+        catalog_id = ref.get('catalog_id')
+        if catalog_id:
+            # checked under the store lock, as a token referring to it may
+            # be stored meanwhile
+            self.db.delete_unless_found('token_catalog-%s' % catalog_id,
+                                        'token_catalog', catalog_id)
+
+    # Public interface
+    def get_token(self, token_id):
+        ref = self._get_current(token_id)
+        return codec.decode_token(
+            ref['record'],
+            lambda catalog_id: self._get_catalog(token_id, catalog_id))
+
     def create_token(self, token_id, data):
-        data_copy = copy.deepcopy(data)
+        self._evict_expired()
+        data_copy = dict(data)
         data_copy['id'] = token_id
         if not data_copy.get('expires'):
             data_copy['expires'] = token.default_expire_time()
         if not data_copy.get('user_id'):
             data_copy['user_id'] = data_copy['user']['id']
-        self.db.set('token-%s' % token_id, data_copy)
-        return copy.deepcopy(data_copy)
+        ref, catalog = _freeze(data_copy)
+        self.db.set('token-%s' % token_id, ref)
+        if catalog is not None:
+            # set after the token, which keeps it from being released
+            catalog_key = 'token_catalog-%s' % ref['catalog_id']
+            try:
+                self.db.get(catalog_key)
+            except exception.NotFound:
+                self.db.set(catalog_key, {'record': catalog})
+        return data_copy
 
     def delete_token(self, token_id):
-        try:
-            token_ref = self.get_token(token_id)
-            self.db.delete('token-%s' % token_id)
-            self.db.set('revoked-token-%s' % token_id, token_ref)
-        except exception.NotFound:
-            raise exception.TokenNotFound(token_id=token_id)
+        ref = self._get_current(token_id)
+        self.db.delete('token-%s' % token_id)
+        self._release_catalog(ref)
+        # the revocation entry is also the revocation event
+        self.db.set_numbered('revoked-token-%s' % token_id,
+                             {'id': ref['id'],
+                              'expires': ref['expires'],
+                              'user_id': ref['user_id'],
+                              'project_id': ref['tenant_id'],
+                              'trust_id': ref['trust_id']},
+                             'revocation_event_seq')
 
     def is_not_expired(self, now, ref):
         return not ref.get('expires') and ref.get('expires') < now
@@ -66,35 +160,34 @@ class Token(kvs.Base, token.Driver):
     def trust_matches(self, trust_id, ref):
         return ref.get('trust_id') and ref['trust_id'] == trust_id
 
-    def _list_tokens_for_trust(self, trust_id):
-        tokens = []
-        now = timeutils.utcnow()
-        for token, ref in self.db.items():
-            if not token.startswith('token-') or self.is_expired(now, ref):
-                continue
-            if self.trust_matches(trust_id, ref):
-                tokens.append(token.split('-', 1)[1])
-        return tokens
+    def _refs(self, keys):
+        """Yields the key and ref of the items of keys which still exist.
 
-    def _list_tokens_for_user(self, user_id, tenant_id=None):
-        def user_matches(user_id, ref):
-            return ref.get('user') and ref['user'].get('id') == user_id
+        Items are read with get(), which sees the deletions of other
+        processes sharing a persistent store.
 
-        def tenant_matches(tenant_id, ref):
-            return ((tenant_id is None) or
-                    (ref.get('tenant') and
-                     ref['tenant'].get('id') == tenant_id))
+        """
+        for key in keys:
+            try:
+                yield key, self.db.get(key)
+            except exception.NotFound:
+                pass
 
-        tokens = []
+    def _current_tokens(self, keys):
+        """Yields the id and ref of the unexpired tokens among keys."""
         now = timeutils.utcnow()
-        for token, ref in self.db.items():
-            if not token.startswith('token-') or self.is_expired(now, ref):
-                continue
-            else:
-                if (user_matches(user_id, ref) and
-                        tenant_matches(tenant_id, ref)):
-                        tokens.append(token.split('-', 1)[1])
-        return tokens
+        for key, ref in self._refs(keys):
+            if not self.is_expired(now, ref):
+                yield key.split('-', 1)[1], ref
+
+    def _list_tokens_for_trust(self, trust_id):
+        keys = self.db.find('token_trust', trust_id)
+        return [token_id for token_id, _ref in self._current_tokens(keys)]
+
+    def _list_tokens_for_user(self, user_id, tenant_id=None):
+        keys = self.db.find('token_user', user_id)
+        return [token_id for token_id, ref in self._current_tokens(keys)
+                if tenant_id is None or ref['tenant_id'] == tenant_id]
 
     def list_tokens(self, user_id, tenant_id=None, trust_id=None):
         if trust_id:
@@ -102,19 +195,71 @@ class Token(kvs.Base, token.Driver):
         else:
             return self._list_tokens_for_user(user_id, tenant_id)
 
+    def _delete_tokens(self, keys, matches=None):
+        """Deletes the current tokens among keys whose ref matches."""
+        for token_id, ref in list(self._current_tokens(keys)):
+            if matches is None or matches(ref):
+                self.delete_token(token_id)
+
+    def delete_tokens_for_users(self, user_ids, project_id=None):
+        def matches(ref):
+            return project_id is None or ref['tenant_id'] == project_id
+
+        keys = set()
+        for user_id in user_ids:
+            keys.update(self.db.find('token_user', user_id))
+        self._delete_tokens(keys, matches)
+
+    def delete_tokens_for_trusts(self, trust_ids):
+        keys = set()
+        for trust_id in trust_ids:
+            keys.update(self.db.find('token_trust', trust_id))
+        self._delete_tokens(keys)
+
+    def delete_tokens_for_project(self, project_id):
+        self._delete_tokens(self.db.find('token_project', project_id))
+
+    def delete_tokens_for_domain(self, domain_id):
+        self._delete_tokens(self.db.find('token_domain', domain_id))
+
     def list_revoked_tokens(self):
+        self._evict_expired()
         tokens = []
-        for token, token_ref in self.db.items():
-            if not token.startswith('revoked-token-'):
-                continue
+        for _key, token_ref in self._refs(self.db.find_all('revoked_token')):
             record = {}
             record['id'] = token_ref['id']
             record['expires'] = token_ref['expires']
             tokens.append(record)
         return tokens
 
-    def flush_expired_tokens(self):
+    def list_revocation_events(self, since=None):
+        self._evict_expired()
+        if since is None:
+            keys = self.db.find_all('revocation_event')
+        else:
+            keys = self.db.find_after('revocation_event', since)
+        events = []
+        for _key, ref in self._refs(keys):
+            events.append({'seq': ref['seq'],
+                           'id': ref['id'],
+                           'user_id': ref['user_id'],
+                           'project_id': ref['project_id'],
+                           'trust_id': ref['trust_id'],
+                           'expires': ref['expires']})
+        events.sort(key=lambda event: event['seq'])
+        return events
+
+    def _evict_expired(self):
+        """Deletes the expired tokens and revocation entries."""
         now = timeutils.utcnow()
-        for token, token_ref in self.db.items():
-            if self.is_expired(now, token_ref):
+        for token in self.db.find_before('token_expiry', now):
+            try:
+                ref = self.db.get(token)
                 self.db.delete(token)
+            except exception.NotFound:
+                # already evicted by another process sharing the store
+                continue
+            self._release_catalog(ref)
+
+    def flush_expired_tokens(self):
+        self._evict_expired()
@@ -15,10 +15,11 @@
 # under the License.
 
 from __future__ import absolute_import
-import copy
+import weakref
 
 import memcache
 
+from keystone.common import environment
 from keystone.common import logging
 from keystone.common import utils
 from keystone import config
@@ -26,6 +27,7 @@ from keystone import exception
 from keystone.openstack.common import jsonutils
 from keystone.openstack.common import timeutils
 from keystone import token
+from keystone.token import codec
 
 
 CONF = config.CONF
@@ -34,12 +36,34 @@ config.register_int('max_compare_and_set_retry', group='memcache', default=16)
 
 LOG = logging.getLogger(__name__)
 
+# keys read by one get_multi when listing revocation events
+REVOCATION_EVENT_BATCH_SIZE = 1000
+
+# seconds a revocation event may take to be stored once numbered
+REVOCATION_EVENT_GRACE = 30
+
+# drivers whose memcache client has to be recreated in forked processes, by
+# id (weakref.WeakSet is new in Python 2.7)
+_DRIVERS = weakref.WeakValueDictionary()
+
+
+def _reset_clients():
+    for driver in _DRIVERS.values():
+        driver._memcache_client = None
+
+
+environment.register_fork_callback(_reset_clients)
+
 
 class Token(token.Driver):
     revocation_key = 'revocation-list'
+    revocation_seq_key = 'revocation-seq'
+    revocation_first_key = 'revocation-first-seq'
 
     def __init__(self, client=None):
         self._memcache_client = client
+        if client is None:
+            _DRIVERS[id(self)] = self
 
     @property
     def client(self):
@@ -62,6 +86,23 @@ class Token(token.Driver):
     def _prefix_user_id(self, user_id):
         return 'usertokens-%s' % user_id.encode('utf-8')
 
+    def _prefix_catalog_id(self, catalog_id):
+        return 'tokencatalog-%s' % catalog_id.encode('utf-8')
+
+    def _get_catalog(self, token_id, catalog_id):
+        record = self.client.get(self._prefix_catalog_id(catalog_id))
+        if record is None:
+            raise exception.TokenNotFound(token_id=token_id)
+        return record
+
+    def _get_fields(self, ptk):
+        """Returns the token stored under ptk, without its catalog."""
+        token_ref = self.client.get(ptk)
+        if isinstance(token_ref, basestring):
+            # tokens set before records were encoded are plain dicts
+            token_ref = codec.decode(token_ref)
+        return token_ref
+
     def get_token(self, token_id):
         if token_id is None:
             raise exception.TokenNotFound(token_id='')
@@ -69,11 +110,14 @@ class Token(token.Driver):
         token_ref = self.client.get(ptk)
         if token_ref is None:
             raise exception.TokenNotFound(token_id=token_id)
-
+        if isinstance(token_ref, basestring):
+            token_ref = codec.decode_token(
+                token_ref,
+                lambda catalog_id: self._get_catalog(token_id, catalog_id))
         return token_ref
 
     def create_token(self, token_id, data):
-        data_copy = copy.deepcopy(data)
+        data_copy = dict(data)
         ptk = self._prefix_token_id(token_id)
         if not data_copy.get('expires'):
             data_copy['expires'] = token.default_expire_time()
@@ -83,7 +127,12 @@ class Token(token.Driver):
         if data_copy['expires'] is not None:
             expires_ts = utils.unixtime(data_copy['expires'])
             kwargs['time'] = expires_ts
-        self.client.set(ptk, data_copy, **kwargs)
+        record, catalog_id, catalog = codec.encode_token(data_copy)
+        if catalog is not None:
+            # kept as long as the last token which refers to it
+            self.client.set(self._prefix_catalog_id(catalog_id), catalog,
+                            **kwargs)
+        self.client.set(ptk, record, **kwargs)
         if 'id' in data['user']:
             token_data = jsonutils.dumps(token_id)
             user_id = data['user']['id']
@@ -91,7 +140,7 @@ class Token(token.Driver):
             # Append the new token_id to the token-index-list stored in the
             # user-key within memcache.
             self._update_user_list_with_cas(user_key, token_data)
-        return copy.deepcopy(data_copy)
+        return data_copy
 
     def _update_user_list_with_cas(self, user_key, token_id):
         cas_retry = 0
@@ -119,7 +168,7 @@ class Token(token.Driver):
                 token_list = jsonutils.loads('[%s]' % record)
                 for token_i in token_list:
                     ptk = self._prefix_token_id(token_i)
-                    token_ref = self.client.get(ptk)
+                    token_ref = self._get_fields(ptk)
                     if not token_ref:
                         # skip tokens that do not exist in memcache
                         continue
@@ -163,14 +212,62 @@ class Token(token.Driver):
         error_msg = _('Unable to add token user list')
         raise exception.UnexpectedError(error_msg)
 
-    def _add_to_revocation_list(self, data):
+    def _append_to_list(self, key, data):
         data_json = jsonutils.dumps(data)
-        if not self.client.append(self.revocation_key, ',%s' % data_json):
-            if not self.client.add(self.revocation_key, data_json):
-                if not self.client.append(self.revocation_key,
-                                          ',%s' % data_json):
-                    msg = _('Unable to add token to revocation list.')
-                    raise exception.UnexpectedError(msg)
+        if not self.client.append(key, ',%s' % data_json):
+            if not self.client.add(key, data_json):
+                if not self.client.append(key, ',%s' % data_json):
+                    return False
+        return True
+
+    def _add_to_revocation_list(self, data):
+        if not self._append_to_list(self.revocation_key, data):
+            msg = _('Unable to add token to revocation list.')
+            raise exception.UnexpectedError(msg)
+
+    def _prefix_revocation_seq(self, seq):
+        return 'revocation-event-%d' % seq
+
+    def _next_revocation_seq(self):
+        seq = self.client.incr(self.revocation_seq_key)
+        if seq is None:
+            # numbered from the clock, so that numbers keep increasing if the
+            # counter is evicted or memcached restarted. The events numbered
+            # by the lost counter are no longer listed, as after a restart.
+            now = timeutils.utcnow()
+            seq = int(utils.unixtime(now)) * 1000000 + now.microsecond
+            if self.client.add(self.revocation_seq_key, str(seq)):
+                self.client.set(self.revocation_first_key, str(seq))
+                return seq
+            seq = self.client.incr(self.revocation_seq_key)
+        if seq is None:
+            msg = _('Unable to number the revocation event.')
+            raise exception.UnexpectedError(msg)
+        return int(seq)
+
+    def _add_revocation_event(self, data):
+        """Stores the event under its own key, until its token expires.
+
+        The event is numbered before it is stored, so list_revocation_events
+        stops at a missing number until a later event has been stored for
+        REVOCATION_EVENT_GRACE seconds.
+
+        """
+        expires = data.get('expires')
+        event = {'id': data['id'],
+                 'seq': self._next_revocation_seq(),
+                 'user_id': data.get('user_id'),
+                 'project_id': (data.get('tenant') or {}).get('id'),
+                 'trust_id': data.get('trust_id'),
+                 'expires': expires and timeutils.strtime(expires),
+                 'created': utils.unixtime(timeutils.utcnow())}
+        kwargs = {}
+        if expires is not None:
+            kwargs['time'] = utils.unixtime(expires)
+        if not self.client.set(self._prefix_revocation_seq(event['seq']),
+                               jsonutils.dumps(event), **kwargs):
+            msg = _('Unable to add the revocation event.')
+            raise exception.UnexpectedError(msg)
 
     def delete_token(self, token_id):
         # Test for existence
@@ -178,6 +275,7 @@ class Token(token.Driver):
         ptk = self._prefix_token_id(token_id)
         result = self.client.delete(ptk)
         self._add_to_revocation_list(data)
+        self._add_revocation_event(data)
         return result
 
     def list_tokens(self, user_id, tenant_id=None, trust_id=None):
@@ -187,7 +285,7 @@ class Token(token.Driver):
         token_list = jsonutils.loads('[%s]' % user_record)
         for token_id in token_list:
             ptk = self._prefix_token_id(token_id)
-            token_ref = self.client.get(ptk)
+            token_ref = self._get_fields(ptk)
             if token_ref:
                 if tenant_id is not None:
                     tenant = token_ref.get('tenant')
@@ -210,3 +308,71 @@ class Token(token.Driver):
         if list_json:
             return jsonutils.loads('[%s]' % list_json)
         return []
+
+    def _get_revocation_events(self, first, last):
+        """Returns the events numbered first to last which are stored."""
+        events = {}
+        for start in xrange(first, last + 1, REVOCATION_EVENT_BATCH_SIZE):
+            keys = [self._prefix_revocation_seq(seq) for seq
+                    in xrange(start, min(start + REVOCATION_EVENT_BATCH_SIZE,
+                                         last + 1))]
+            for record in self.client.get_multi(keys).itervalues():
+                event = jsonutils.loads(record)
+                events[event['seq']] = event
+        return events
+
+    def _first_revocation_seq(self, last):
+        """Returns a number no event still stored is numbered below."""
+        first = self.client.get(self.revocation_first_key)
+        if first is not None:
+            return int(first)
+        # the hint was evicted: look back until a batch of numbers has no
+        # event left
+        first = start = last + 1
+        while start > 1:
+            end = start - 1
+            start = max(start - REVOCATION_EVENT_BATCH_SIZE, 1)
+            events = self._get_revocation_events(start, end)
+            if not events:
+                break
+            first = min(events)
+        self.client.set(self.revocation_first_key, str(first))
+        return first
+
+    def list_revocation_events(self, since=None):
+        last = self.client.get(self.revocation_seq_key)
+        if last is None:
+            return []
+        last = int(last)
+        first = hint = self._first_revocation_seq(last)
+        if since is not None:
+            first = max(first, since + 1)
+        stored = self._get_revocation_events(first, last)
+
+        # an event missing before one stored over REVOCATION_EVENT_GRACE
+        # seconds ago has expired or will never be stored; otherwise it may
+        # still be on its way
+        settled_time = utils.unixtime(timeutils.utcnow()) - (
+            REVOCATION_EVENT_GRACE)
+        settled = max([seq for seq, event in stored.iteritems()
+                       if event['created'] < settled_time] or [0])
+        now = timeutils.utcnow()
+        events = []
+        for seq in xrange(first, last + 1):
+            event = stored.get(seq)
+            if event is None:
+                if seq > settled:
+                    break
+                if seq == first:
+                    first += 1
+                continue
+            del event['created']
+            if event['expires'] is not None:
+                event['expires'] = timeutils.parse_strtime(event['expires'])
+                if event['expires'] <= now:
+                    continue
+            events.append(event)
+        if since is None and first > hint:
+            # the next listings start from the first event which may remain
+            self.client.set(self.revocation_first_key, str(first))
+        return events
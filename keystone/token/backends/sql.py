@@ -14,14 +14,28 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
-import copy
 import datetime
+import functools
 
 
 from keystone.common import sql
+from keystone import config
 from keystone import exception
 from keystone.openstack.common import timeutils
 from keystone import token
+from keystone.token import codec
+
+
+CONF = config.CONF
+
+# ids bound in one IN clause by the bulk revocations; SQLite allows at most
+# 999 parameters in a statement
+REVOKE_BATCH_SIZE = 500
+
+# catalog records never change once stored, so each process keeps the last
+# ones it read
+CATALOG_CACHE_SIZE = 100
+_CATALOGS = {}
 
 
 class TokenModel(sql.ModelBase, sql.DictBase):
@@ -33,13 +47,147 @@ class TokenModel(sql.ModelBase, sql.DictBase):
     valid = sql.Column(sql.Boolean(), default=True)
     user_id = sql.Column(sql.String(64))
     trust_id = sql.Column(sql.String(64), nullable=True)
+    tenant_id = sql.Column(sql.String(64), nullable=True)
+    domain_id = sql.Column(sql.String(64), nullable=True)
+    # the token, encoded by keystone.token.codec; extra is only used by the
+    # tokens stored before
+    record = sql.Column(sql.LargeBinary(), nullable=True)
+    catalog_id = sql.Column(sql.String(64), nullable=True)
+
+
+class TokenCatalogModel(sql.ModelBase):
+    __tablename__ = 'token_catalog'
+    id = sql.Column(sql.String(64), primary_key=True)
+    record = sql.Column(sql.LargeBinary(), nullable=False)
+    # when a token was last stored with the catalog, give or take half
+    # the token expiration
+    last_used = sql.Column(sql.DateTime(), nullable=True)
+
+
+class RevocationEventModel(sql.ModelBase):
+    __tablename__ = 'revocation_event'
+    seq = sql.Column(sql.Integer(), primary_key=True, autoincrement=True)
+    token_id = sql.Column(sql.String(64), nullable=False)
+    user_id = sql.Column(sql.String(64), nullable=True)
+    project_id = sql.Column(sql.String(64), nullable=True)
+    trust_id = sql.Column(sql.String(64), nullable=True)
+    expires = sql.Column(sql.DateTime(), nullable=True)
+
+    def to_dict(self):
+        return {'seq': self.seq,
+                'id': self.token_id,
+                'user_id': self.user_id,
+                'project_id': self.project_id,
+                'trust_id': self.trust_id,
+                'expires': self.expires}
+
+
+class RevocationSequenceModel(sql.ModelBase):
+    __tablename__ = 'revocation_sequence'
+    id = sql.Column(sql.Integer(), primary_key=True, autoincrement=False)
+    value = sql.Column(sql.Integer(), nullable=False)
+
+
+def _token_scope(data):
+    """Returns the (tenant_id, domain_id) a token's data is scoped to."""
+    tenant_id = (data.get('tenant') or {}).get('id')
+    token_data = (data.get('token_data') or {}).get('token') or {}
+    domain_id = (token_data.get('domain') or {}).get('id')
+    return tenant_id, domain_id
+
+
+def _revocation_event(token_ref):
+    return {'token_id': token_ref.id,
+            'user_id': token_ref.user_id,
+            'project_id': token_ref.tenant_id,
+            'trust_id': token_ref.trust_id,
+            'expires': token_ref.expires}
+
+
+def _number_revocation_events(session, events):
+    """Sets the seq of the events to the next revocation event numbers.
+
+    The numbers are taken from the counter row, which stays locked until
+    the transaction of session ends, so that the events are committed in
+    the order of their numbers and whoever lists the events after the last
+    one it saw never misses one committed later.
+
+    """
+    if not events:
+        return
+    query = session.query(RevocationSequenceModel).filter_by(id=1)
+    if query.update({'value': RevocationSequenceModel.value + len(events)},
+                    synchronize_session=False):
+        last = session.query(RevocationSequenceModel.value).filter_by(
+            id=1).scalar() - len(events)
+    else:
+        # the counter row is created by the migrations; databases created
+        # from the models start it after the existing events
+        last = session.query(
+            sql.func.max(RevocationEventModel.seq)).scalar() or 0
+        session.add(RevocationSequenceModel(id=1, value=last + len(events)))
+        session.flush()
+    for seq, event in enumerate(events, last + 1):
+        event['seq'] = seq
+
+
+def _with_columns(token_ref, ref):
+    for attr in TokenModel.attributes:
+        ref[attr] = getattr(token_ref, attr)
+    return ref
 
 
 class Token(sql.Base, token.Driver):
+    def _get_catalog(self, session, token_id, catalog_id):
+        record = _CATALOGS.get(catalog_id)
+        if record is None:
+            catalog_ref = session.query(TokenCatalogModel).get(catalog_id)
+            if catalog_ref is None:
+                raise exception.TokenNotFound(token_id=token_id)
+            record = catalog_ref.record
+            if len(_CATALOGS) >= CATALOG_CACHE_SIZE:
+                _CATALOGS.popitem()
+            _CATALOGS[catalog_id] = record
+        return record
+
+    def _insert_token(self, session, token_ref, catalog):
+        """Inserts token_ref, and its catalog unless already stored.
+
+        Both are written by one transaction, which also marks the catalog
+        as used, so that flush_expired_tokens() can't collect it before
+        the token refers to it.
+
+        """
+        with session.begin():
+            if catalog is not None:
+                now = timeutils.utcnow()
+                catalog_ref = session.query(TokenCatalogModel).get(
+                    token_ref.catalog_id)
+                if catalog_ref is None:
+                    session.add(TokenCatalogModel(id=token_ref.catalog_id,
+                                                  record=catalog,
+                                                  last_used=now))
+                elif (catalog_ref.last_used is None or
+                      catalog_ref.last_used < now - datetime.timedelta(
+                          seconds=CONF.token.expiration / 2)):
+                    catalog_ref.last_used = now
+            session.add(token_ref)
+            session.flush()
+
+    def _to_dict(self, session, token_ref):
+        if token_ref.record is None:
+            return token_ref.to_dict()
+        get_catalog = functools.partial(self._get_catalog, session,
+                                        token_ref.id)
+        return _with_columns(
+            token_ref, codec.decode_token(token_ref.record, get_catalog))
+
     # Public interface
     def get_token(self, token_id):
         if token_id is None:
             raise exception.TokenNotFound(token_id=token_id)
+        # tokens are never read from the read replicas, where a revoked
+        # token would stay valid for as long as they lag
         session = self.get_session()
         token_ref = session.query(TokenModel).get(token_id)
         now = datetime.datetime.utcnow()
@@ -49,22 +197,30 @@ class Token(sql.Base, token.Driver):
             raise exception.TokenNotFound(token_id=token_id)
         if now >= token_ref.expires:
             raise exception.TokenNotFound(token_id=token_id)
-        return token_ref.to_dict()
+        return self._to_dict(session, token_ref)
 
     def create_token(self, token_id, data):
-        data_copy = copy.deepcopy(data)
+        data_copy = dict(data)
         if not data_copy.get('expires'):
             data_copy['expires'] = token.default_expire_time()
         if not data_copy.get('user_id'):
             data_copy['user_id'] = data_copy['user']['id']
 
         token_ref = TokenModel.from_dict(data_copy)
+        token_ref.extra = {}
+        token_ref.record, token_ref.catalog_id, catalog = codec.encode_token(
+            data_copy)
         token_ref.valid = True
+        token_ref.tenant_id, token_ref.domain_id = _token_scope(data_copy)
         session = self.get_session()
-        with session.begin():
-            session.add(token_ref)
-            session.flush()
-        return token_ref.to_dict()
+        try:
+            self._insert_token(session, token_ref, catalog)
+        except sql.IntegrityError:
+            if catalog is None:
+                raise
+            # the catalog was stored meanwhile for another token
+            self._insert_token(session, token_ref, catalog)
+        return _with_columns(token_ref, data_copy)
 
     def delete_token(self, token_id):
         session = self.get_session()
@@ -73,6 +229,9 @@ class Token(sql.Base, token.Driver):
             if not token_ref or not token_ref.valid:
                 raise exception.TokenNotFound(token_id=token_id)
             token_ref.valid = False
+            events = [_revocation_event(token_ref)]
+            _number_revocation_events(session, events)
+            session.add(RevocationEventModel(**events[0]))
             session.flush()
 
     def delete_tokens(self, user_id, tenant_id=None, trust_id=None):
@@ -94,20 +253,74 @@ class Token(sql.Base, token.Driver):
                 query = query.filter(TokenModel.trust_id == trust_id)
             else:
                 query = query.filter(TokenModel.user_id == user_id)
+            if tenant_id:
+                query = query.filter(TokenModel.tenant_id == tenant_id)
 
+            events = []
             for token_ref in query.all():
-                if tenant_id:
-                    token_ref_dict = token_ref.to_dict()
-                    if not self._tenant_matches(tenant_id, token_ref_dict):
-                        continue
                 token_ref.valid = False
+                events.append(_revocation_event(token_ref))
+            _number_revocation_events(session, events)
+            session.add_all(RevocationEventModel(**event) for event in events)
 
             session.flush()
 
-    def _tenant_matches(self, tenant_id, token_ref_dict):
-        return ((tenant_id is None) or
-                (token_ref_dict.get('tenant') and
-                 token_ref_dict['tenant'].get('id') == tenant_id))
+    def _revoke_tokens(self, criterion, column=None, ids=()):
+        """Invalidates every valid, unexpired token matching criterion.
+
+        If column is given, only the tokens whose column is one of ids are
+        invalidated, selecting them REVOKE_BATCH_SIZE ids at a time. A
+        revocation event is recorded for each token; the selected rows are
+        locked and then invalidated by id, so that a token which starts
+        matching meanwhile is not invalidated without an event.
+
+        """
+        session = self.get_session()
+        with session.begin():
+            query = session.query(TokenModel)
+            query = query.filter_by(valid=True)
+            query = query.filter(TokenModel.expires > timeutils.utcnow())
+            if criterion is not None:
+                query = query.filter(criterion)
+            if column is None:
+                batches = [query]
+            else:
+                ids = sorted(set(ids))
+                batches = [
+                    query.filter(column.in_(ids[i:i + REVOKE_BATCH_SIZE]))
+                    for i in xrange(0, len(ids), REVOKE_BATCH_SIZE)]
+            events = []
+            for batch in batches:
+                events.extend(_revocation_event(token_ref)
+                              for token_ref in batch.with_entities(
+                                  TokenModel.id, TokenModel.user_id,
+                                  TokenModel.tenant_id, TokenModel.trust_id,
+                                  TokenModel.expires).with_lockmode('update'))
+            if not events:
+                return
+            token_ids = [event['token_id'] for event in events]
+            for i in xrange(0, len(token_ids), REVOKE_BATCH_SIZE):
+                query = session.query(TokenModel)
+                query = query.filter(
+                    TokenModel.id.in_(token_ids[i:i + REVOKE_BATCH_SIZE]))
+                query.update({'valid': False}, synchronize_session=False)
+            _number_revocation_events(session, events)
+            session.execute(RevocationEventModel.__table__.insert(), events)
+
+    def delete_tokens_for_users(self, user_ids, project_id=None):
+        criterion = None
+        if project_id:
+            criterion = TokenModel.tenant_id == project_id
+        self._revoke_tokens(criterion, TokenModel.user_id, user_ids)
+
+    def delete_tokens_for_trusts(self, trust_ids):
+        self._revoke_tokens(None, TokenModel.trust_id, trust_ids)
+
+    def delete_tokens_for_project(self, project_id):
+        self._revoke_tokens(TokenModel.tenant_id == project_id)
+
+    def delete_tokens_for_domain(self, domain_id):
+        self._revoke_tokens(TokenModel.domain_id == domain_id)
 
     def _list_tokens_for_trust(self, trust_id):
         session = self.get_session()
@@ -119,8 +332,7 @@ class Token(sql.Base, token.Driver):
 
         token_references = query.filter_by(valid=True)
         for token_ref in token_references:
-            token_ref_dict = token_ref.to_dict()
-            tokens.append(token_ref_dict['id'])
+            tokens.append(token_ref.id)
         return tokens
 
     def _list_tokens_for_user(self, user_id, tenant_id=None):
@@ -130,12 +342,12 @@ class Token(sql.Base, token.Driver):
         query = session.query(TokenModel)
         query = query.filter(TokenModel.expires > now)
         query = query.filter(TokenModel.user_id == user_id)
+        if tenant_id is not None:
+            query = query.filter(TokenModel.tenant_id == tenant_id)
 
         token_references = query.filter_by(valid=True)
         for token_ref in token_references:
-            token_ref_dict = token_ref.to_dict()
-            if self._tenant_matches(tenant_id, token_ref_dict):
-                tokens.append(token_ref['id'])
+            tokens.append(token_ref.id)
         return tokens
 
     def list_tokens(self, user_id, tenant_id=None, trust_id=None):
@@ -159,6 +371,17 @@ class Token(sql.Base, token.Driver):
             tokens.append(record)
         return tokens
 
+    def list_revocation_events(self, since=None):
+        session = self.get_session()
+        query = session.query(RevocationEventModel)
+        query = query.filter(sql.or_(
+            RevocationEventModel.expires.is_(None),
+            RevocationEventModel.expires > timeutils.utcnow()))
+        if since is not None:
+            query = query.filter(RevocationEventModel.seq > since)
+        query = query.order_by(RevocationEventModel.seq)
+        return [event_ref.to_dict() for event_ref in query]
+
     def flush_expired_tokens(self):
         session = self.get_session()
 
@@ -166,4 +389,21 @@ class Token(sql.Base, token.Driver):
         query = query.filter(TokenModel.expires < timeutils.utcnow())
         query.delete(synchronize_session=False)
 
+        query = session.query(RevocationEventModel)
+        query = query.filter(
+            RevocationEventModel.expires < timeutils.utcnow())
+        query.delete(synchronize_session=False)
+
+        # a catalog may be about to be used by a token being created, and
+        # is only collected once unused for the whole token expiration
+        used = session.query(TokenModel.catalog_id)
+        used = used.filter(TokenModel.catalog_id.isnot(None))
+        query = session.query(TokenCatalogModel)
+        query = query.filter(~TokenCatalogModel.id.in_(used.subquery()))
+        query = query.filter(sql.or_(
+            TokenCatalogModel.last_used.is_(None),
+            TokenCatalogModel.last_used < timeutils.utcnow() -
+            datetime.timedelta(seconds=CONF.token.expiration)))
+        query.delete(synchronize_session=False)
+
         session.flush()
@@ -0,0 +1,305 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Encodings of the token records stored by the token drivers.
+
+The codec is set by ``[token] codec``. Each record starts with the marker
+of the codec which encoded it, so that records are decoded whatever codec
+is configured now:
+
+* ``J``: JSON, with tagged datetimes
+* ``B``: a compact binary encoding, which stores each distinct string once
+* ``Z``: a record of either kind, compressed with zlib when
+  ``[token] compression`` is set
+
+The catalog of v3 tokens is usually the bulk of the token, and the same for
+many tokens: with ``[token] intern_catalog``, it is encoded apart, and the
+token only refers to it by the digest of its record, which drivers store
+once (see encode_token() and decode_token()).
+
+"""
+
+import datetime
+import hashlib
+import json
+import struct
+import zlib
+
+from keystone import config
+from keystone import exception
+from keystone.openstack.common import importutils
+from keystone.openstack.common import timeutils
+
+
+CONF = config.CONF
+
+COMPRESSED = 'Z'
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+
+
+def _microseconds(value):
+    delta = timeutils.normalize_time(value) - _EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+
+
+def _datetime(microseconds):
+    return _EPOCH + datetime.timedelta(microseconds=microseconds)
+
+
+class Codec(object):
+    """Interface of the codecs of token records."""
+
+    # first byte of the records encoded by this codec
+    marker = None
+
+    def encode(self, value):
+        """Returns value encoded, without marker.
+
+        Values are made of dicts, lists, strings, numbers, booleans, None
+        and datetimes; aware datetimes are stored as naive UTC ones.
+
+        """
+        raise exception.NotImplemented()
+
+    def decode(self, data):
+        """Returns the value data, encoded without marker, stands for."""
+        raise exception.NotImplemented()
+
+
+class JsonCodec(Codec):
+    marker = 'J'
+
+    @staticmethod
+    def _default(value):
+        if isinstance(value, datetime.datetime):
+            return {'$dt': _microseconds(value)}
+        raise TypeError(repr(value))
+
+    @staticmethod
+    def _object_hook(obj):
+        if len(obj) == 1 and '$dt' in obj:
+            return _datetime(obj['$dt'])
+        return obj
+
+    def encode(self, value):
+        # without sort_keys, which would disable the C encoder
+        return json.dumps(value, default=self._default,
+                          separators=(',', ':'))
+
+    def decode(self, data):
+        return json.loads(data, object_hook=self._object_hook)
+
+
+class BinaryCodec(Codec):
+    """Type-tagged values, with varint lengths and interned strings.
+
+    Each string is stored the first time it occurs; later occurrences only
+    refer to its rank. Dicts are written with sorted keys, so that equal
+    values always have the same encoding.
+
+    """
+
+    marker = 'B'
+
+    _double = struct.Struct('>d')
+
+    @staticmethod
+    def _varint(n):
+        out = []
+        while n > 0x7f:
+            out.append(chr(n & 0x7f | 0x80))
+            n >>= 7
+        out.append(chr(n))
+        return ''.join(out)
+
+    def encode(self, value):
+        out = []
+        strings = {}
+        varint = self._varint
+
+        def write(value):
+            if value is None:
+                out.append('N')
+            elif value is True:
+                out.append('T')
+            elif value is False:
+                out.append('F')
+            elif isinstance(value, basestring):
+                # 'a' == u'a', but each keeps its type
+                key = (type(value), value)
+                if key in strings:
+                    out.append('r' + varint(strings[key]))
+                    return
+                strings[key] = len(strings)
+                if isinstance(value, unicode):
+                    data = value.encode('utf-8')
+                    out.append('s' + varint(len(data)) + data)
+                else:
+                    out.append('b' + varint(len(value)) + value)
+            elif isinstance(value, (int, long)):
+                # zigzag, so that small negative numbers stay short
+                out.append('i' + varint(value * 2 if value >= 0
+                                        else -value * 2 - 1))
+            elif isinstance(value, float):
+                out.append('f' + self._double.pack(value))
+            elif isinstance(value, dict):
+                out.append('d' + varint(len(value)))
+                for k in sorted(value):
+                    write(k)
+                    write(value[k])
+            elif isinstance(value, (list, tuple)):
+                out.append('l' + varint(len(value)))
+                for item in value:
+                    write(item)
+            elif isinstance(value, datetime.datetime):
+                micro = _microseconds(value)
+                out.append('t' + varint(micro * 2 if micro >= 0
+                                        else -micro * 2 - 1))
+            else:
+                raise TypeError(repr(value))
+
+        write(value)
+        return ''.join(out)
+
+    def decode(self, data):
+        strings = []
+        pos = [0]
+
+        def varint():
+            n = shift = 0
+            while True:
+                byte = ord(data[pos[0]])
+                pos[0] += 1
+                n |= (byte & 0x7f) << shift
+                if byte < 0x80:
+                    return n
+                shift += 7
+
+        def zigzag():
+            n = varint()
+            return n >> 1 if not n & 1 else -(n >> 1) - 1
+
+        def read():
+            tag = data[pos[0]]
+            pos[0] += 1
+            if tag == 'r':
+                return strings[varint()]
+            elif tag in 'sb':
+                length = varint()
+                value = data[pos[0]:pos[0] + length]
+                pos[0] += length
+                if tag == 's':
+                    value = value.decode('utf-8')
+                strings.append(value)
+                return value
+            elif tag == 'd':
+                value = {}
+                for _i in xrange(varint()):
+                    k = read()
+                    value[k] = read()
+                return value
+            elif tag == 'l':
+                return [read() for _i in xrange(varint())]
+            elif tag == 'N':
+                return None
+            elif tag == 'T':
+                return True
+            elif tag == 'F':
+                return False
+            elif tag == 'i':
+                return zigzag()
+            elif tag == 'f':
+                value, = self._double.unpack_from(data, pos[0])
+                pos[0] += self._double.size
+                return value
+            elif tag == 't':
+                return _datetime(zigzag())
+            raise ValueError('Invalid tag %r at %d' % (tag, pos[0] - 1))
+
+        return read()
+
+
+CODECS = dict((codec.marker, codec) for codec in (JsonCodec(), BinaryCodec()))
+
+
+def get_codec():
+    """Returns the codec configured by [token] codec."""
+    path = CONF.token.codec
+    for codec in CODECS.values():
+        if '%s.%s' % (codec.__module__, type(codec).__name__) == path:
+            return codec
+    codec = importutils.import_object(path)
+    CODECS[codec.marker] = codec
+    return codec
+
+
+def encode(value):
+    codec = get_codec()
+    data = codec.marker + codec.encode(value)
+    if CONF.token.compression:
+        compressed = COMPRESSED + zlib.compress(data,
+                                                CONF.token.compression)
+        if len(compressed) < len(data):
+            return compressed
+    return data
+
+
+def decode(data):
+    data = str(data)
+    if data[0] == COMPRESSED:
+        data = zlib.decompress(data[1:])
+    if data[0] not in CODECS:
+        # written with a codec configured before
+        get_codec()
+    return CODECS[data[0]].decode(data[1:])
+
+
+def encode_token(ref):
+    """Encodes the token ref.
+
+    :returns: (record, catalog id, catalog record); the catalog is only
+              given apart if it is interned, the ids and records are None
+              otherwise
+
+    """
+    token = (ref.get('token_data') or {}).get('token') or {}
+    if not CONF.token.intern_catalog or token.get('catalog') is None:
+        return encode(ref), None, None
+    catalog = encode(token['catalog'])
+    catalog_id = hashlib.sha256(catalog).hexdigest()
+    token = dict(token)
+    del token['catalog']
+    token_data = dict(ref['token_data'])
+    token_data['token'] = token
+    ref = dict(ref)
+    ref['token_data'] = token_data
+    ref['catalog_id'] = catalog_id
+    return encode(ref), catalog_id, catalog
+
+
+def decode_token(record, get_catalog):
+    """Decodes a record from encode_token().
+
+    :param get_catalog: returns the catalog record of a catalog id
+
+    """
+    ref = decode(record)
+    catalog_id = ref.pop('catalog_id', None)
+    if catalog_id is not None:
+        ref['token_data']['token']['catalog'] = decode(
+            get_catalog(catalog_id))
+    return ref
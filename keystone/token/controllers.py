@@ -506,6 +506,13 @@ class Auth(controller.V2Controller):
         self.assert_admin(context)
         self.token_api.delete_token(token_id)
 
+    @staticmethod
+    def _sign(data):
+        signed_text = cms.cms_sign_text(json.dumps(data),
+                                        CONF.signing.certfile,
+                                        CONF.signing.keyfile)
+        return {'signed': signed_text}
+
     @controller.protected
     def revocation_list(self, context, auth=None):
         tokens = self.token_api.list_revoked_tokens()
@@ -514,13 +521,30 @@ class Auth(controller.V2Controller):
             expires = t['expires']
             if not (expires and isinstance(expires, unicode)):
                     t['expires'] = timeutils.isotime(expires)
-        data = {'revoked': tokens}
-        json_data = json.dumps(data)
-        signed_text = cms.cms_sign_text(json_data,
-                                        CONF.signing.certfile,
-                                        CONF.signing.keyfile)
+        return self._sign({'revoked': tokens})
 
-        return {'signed': signed_text}
+    @controller.protected
+    def revocation_events(self, context, auth=None):
+        """Returns the revocation events after the since query parameter.
+
+        With no new events, the request waits for up to the wait query
+        parameter (in seconds, at most ``[token]
+        revocation_events_max_wait``) for some. The caller passes the
+        returned ``next`` as since of its next request.
+
+        """
+        since = controller.query_int(context, 'since', None)
+        wait = min(controller.query_int(context, 'wait', 0),
+                   CONF.token.revocation_events_max_wait)
+        events = self.token_api.list_revocation_events(since, wait)
+        for event in events:
+            if event['expires'] is not None:
+                event['expires'] = timeutils.isotime(event['expires'])
+        if events:
+            next_seq = events[-1]['seq']
+        else:
+            next_seq = since or 0
+        return self._sign({'events': events, 'next': next_seq})
 
     def endpoints(self, context, token_id):
         """Return a list of endpoints available to the token."""
@@ -16,13 +16,13 @@
 
 """Main entry point into the Token service."""
 
-import copy
 import datetime
 
 from keystone.common import cms
 from keystone.common import dependency
 from keystone.common import logging
 from keystone.common import manager
+from keystone.common import utils
 from keystone import config
 from keystone import exception
 from keystone.openstack.common import timeutils
@@ -118,13 +118,25 @@ class Manager(manager.Manager):
         return self.driver.get_token(self._unique_id(token_id))
 
     def create_token(self, token_id, data):
-        data_copy = copy.deepcopy(data)
+        data_copy = dict(data)
         data_copy['id'] = self._unique_id(token_id)
         return self.driver.create_token(self._unique_id(token_id), data_copy)
 
     def delete_token(self, token_id):
         return self.driver.delete_token(self._unique_id(token_id))
 
+    def list_revocation_events(self, since=None, wait=0):
+        """Returns the revocation events after since.
+
+        If there are none yet, the driver is polled again every
+        ``[token] revocation_poll_interval`` seconds, for up to wait
+        seconds, until some are recorded.
+
+        """
+        return utils.poll(
+            lambda: self.driver.list_revocation_events(since), wait,
+            CONF.token.revocation_poll_interval)
+
 
 class Driver(object):
     """Interface description for a Token driver."""
@@ -200,6 +212,50 @@ class Driver(object):
             except exception.NotFound:
                 pass
 
+    def delete_tokens_for_users(self, user_ids, project_id=None):
+        """Deletes the tokens of several users at once.
+        If the project_id is not None, only delete their tokens under the
+        specified project.
+
+        :param user_ids: identities of the users
+        :type user_ids: list
+        :param project_id: identity of the project
+        :type project_id: string
+        :returns: None.
+
+        """
+        raise exception.NotImplemented()
+
+    def delete_tokens_for_trusts(self, trust_ids):
+        """Deletes the tokens issued through any of the given trusts.
+
+        :param trust_ids: identities of the trusts
+        :type trust_ids: list
+        :returns: None.
+
+        """
+        raise exception.NotImplemented()
+
+    def delete_tokens_for_project(self, project_id):
+        """Deletes the tokens scoped to a project, whichever user owns them.
+
+        :param project_id: identity of the project
+        :type project_id: string
+        :returns: None.
+
+        """
+        raise exception.NotImplemented()
+
+    def delete_tokens_for_domain(self, domain_id):
+        """Deletes the tokens scoped to a domain, whichever user owns them.
+
+        :param domain_id: identity of the domain
+        :type domain_id: string
+        :returns: None.
+
+        """
+        raise exception.NotImplemented()
+
     def list_tokens(self, user_id, tenant_id=None, trust_id=None):
         """Returns a list of current token_id's for a user
 
@@ -222,6 +278,33 @@ class Driver(object):
         """
         raise exception.NotImplemented()
 
+    def list_revocation_events(self, since=None):
+        """Returns the revocation events recorded after since.
+
+        An event is recorded for every revoked token, and is kept as long
+        as the token would have remained valid::
+
+            {
+                seq=sequence number, increasing with each event
+                id=token_id,
+                user_id=user_id,
+                project_id=tenant_id or None,
+                trust_id=trust_id or None,
+                expires=expiry of the token
+            }
+
+        Events must become visible in the order of their sequence numbers,
+        so that a caller passing the last one it saw as since never misses
+        an event recorded concurrently.
+
+        :param since: sequence number of the last event known to the
+                      caller, or None for all the events
+        :type since: int
+        :returns: list of events, ordered by sequence number
+
+        """
+        raise exception.NotImplemented()
+
     def flush_expired_tokens(self):
         """Archive or delete tokens that have expired.
         """
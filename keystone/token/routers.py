@@ -28,6 +28,10 @@ class Router(wsgi.ComposableRouter):
                        controller=token_controller,
                        action='revocation_list',
                        conditions=dict(method=['GET']))
+        mapper.connect('/tokens/revoked/events',
+                       controller=token_controller,
+                       action='revocation_events',
+                       conditions=dict(method=['GET']))
         mapper.connect('/tokens/{token_id}',
                        controller=token_controller,
                        action='validate_token',
@@ -89,3 +89,11 @@ class Trust(kvs.Base, trust.Driver):
         for trust in self.db.get('trustor-%s' % trustor_user_id, []):
             trusts.append(self.get_trust(trust))
         return trusts
+
+    def list_trusts_for_users(self, user_ids):
+        trusts = {}
+        for user_id in user_ids:
+            for trust in (self.list_trusts_for_trustee(user_id) +
+                          self.list_trusts_for_trustor(user_id)):
+                trusts[trust['id']] = trust
+        return trusts.values()
@@ -20,6 +20,10 @@ from keystone.openstack.common import timeutils
 from keystone import trust
 
 
+# user ids looked up at once by list_trusts_for_users()
+LIST_BATCH_SIZE = 500
+
+
 class TrustModel(sql.ModelBase, sql.DictBase):
     __tablename__ = 'trust'
     attributes = ['id', 'trustor_user_id', 'trustee_user_id',
@@ -90,13 +94,13 @@ class Trust(sql.Base, trust.Driver):
 
     @sql.handle_conflicts(type='trust')
     def list_trusts(self):
-        session = self.get_session()
+        session = self.get_session(read_only=True)
         trusts = session.query(TrustModel).filter_by(deleted_at=None)
         return [trust_ref.to_dict() for trust_ref in trusts]
 
     @sql.handle_conflicts(type='trust')
     def list_trusts_for_trustee(self, trustee_user_id):
-        session = self.get_session()
+        session = self.get_session(read_only=True)
         trusts = (session.query(TrustModel).
                   filter_by(deleted_at=None).
                   filter_by(trustee_user_id=trustee_user_id))
@@ -104,12 +108,26 @@ class Trust(sql.Base, trust.Driver):
 
     @sql.handle_conflicts(type='trust')
     def list_trusts_for_trustor(self, trustor_user_id):
-        session = self.get_session()
+        session = self.get_session(read_only=True)
         trusts = (session.query(TrustModel).
                   filter_by(deleted_at=None).
                   filter_by(trustor_user_id=trustor_user_id))
         return [trust_ref.to_dict() for trust_ref in trusts]
 
+    def list_trusts_for_users(self, user_ids):
+        session = self.get_session(read_only=True)
+        user_ids = sorted(set(user_ids))
+        trusts = {}
+        for i in xrange(0, len(user_ids), LIST_BATCH_SIZE):
+            batch = user_ids[i:i + LIST_BATCH_SIZE]
+            query = session.query(TrustModel).filter_by(deleted_at=None)
+            query = query.filter(sql.or_(
+                TrustModel.trustee_user_id.in_(batch),
+                TrustModel.trustor_user_id.in_(batch)))
+            for trust_ref in query:
+                trusts[trust_ref.id] = trust_ref.to_dict()
+        return trusts.values()
+
     @sql.handle_conflicts(type='trust')
     def delete_trust(self, trust_id):
         session = self.get_session()
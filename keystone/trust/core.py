@@ -60,3 +60,13 @@ class Driver(object):
 
     def list_trusts_for_trustor(self, trustor):
         raise exception.NotImplemented()
+
+    def list_trusts_for_users(self, user_ids):
+        """Lists the trusts whose trustee or trustor is any of user_ids.
+
+        :param user_ids: identities of the users
+        :type user_ids: list
+        :returns: a list of trust_refs or an empty list.
+
+        """
+        raise exception.NotImplemented()
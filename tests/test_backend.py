@@ -20,6 +20,7 @@ import uuid
 from keystone import test
 
 from keystone.catalog import core
+from keystone.common import utils
 from keystone import config
 from keystone import exception
 from keystone.openstack.common import timeutils
@@ -81,6 +82,49 @@ class IdentityTests(object):
         self.user_sna['enabled'] = True
         self.assertDictEqual(user_ref, self.user_sna)
 
+    def test_authenticate_with_password_cache(self):
+        self.opt_in_group('identity', password_cache_time=60)
+        self.identity_api.authenticate(user_id=self.user_sna['id'],
+                                       password=self.user_sna['password'])
+        self.identity_api.authenticate(user_id=self.user_sna['id'],
+                                       password=self.user_sna['password'])
+
+        # a changed password takes effect immediately
+        self.identity_api.update_user(self.user_sna['id'],
+                                      {'password': 'new'})
+        self.assertRaises(AssertionError,
+                          self.identity_api.authenticate,
+                          user_id=self.user_sna['id'],
+                          password=self.user_sna['password'])
+        self.identity_api.authenticate(user_id=self.user_sna['id'],
+                                       password='new')
+
+    def test_authenticate_rehashes_password(self):
+        self.opt_in_group('identity',
+                          password_hash_tiers=['service:sha512_crypt:1001'])
+        hashed = []
+        hash_password = utils.hash_password
+
+        def recording_hash_password(password, tier):
+            hashed.append(tier)
+            return hash_password(password, tier)
+
+        self.stubs.Set(utils, 'hash_password', recording_hash_password)
+        self.identity_api.authenticate(user_id=self.user_sna['id'],
+                                       password=self.user_sna['password'])
+        self.assertEqual(hashed, [])
+
+        self.identity_api.update_user(self.user_sna['id'],
+                                      {'password_hash_tier': 'service'})
+        self.identity_api.authenticate(user_id=self.user_sna['id'],
+                                       password=self.user_sna['password'])
+        self.assertEqual(hashed, ['service'])
+
+        # the new hash is kept
+        self.identity_api.authenticate(user_id=self.user_sna['id'],
+                                       password=self.user_sna['password'])
+        self.assertEqual(hashed, ['service'])
+
     def test_authenticate_and_get_roles_no_metadata(self):
         user = {
             'id': 'no_meta',
@@ -2205,8 +2249,86 @@ class TokenTests(object):
         self.assertRaises(exception.TokenNotFound,
                           self.token_api.delete_token, token_id)
 
+    def test_stored_token_is_isolated(self):
+        token_id = self._create_token_id()
+        data = {'id': token_id, 'user': {'id': 'testuserid'}}
+        data_ref = self.token_api.create_token(token_id, data)
+        data['user']['name'] = 'changed'
+        data_ref['user']['name'] = 'changed'
+        new_data_ref = self.token_api.get_token(token_id)
+        new_data_ref['user']['name'] = 'changed'
+        self.assertNotIn('name', self.token_api.get_token(token_id)['user'])
+
+    def test_tokens_share_catalog(self):
+        catalog = [{'type': 'identity',
+                    'endpoints': [{'interface': 'public',
+                                   'url': 'http://localhost:5000/v3'}]}]
+        token_ids = []
+        for _i in range(2):
+            token_id = self._create_token_id()
+            data = {'id': token_id, 'user': {'id': 'testuserid'},
+                    'token_data': {'token': {'catalog': catalog,
+                                             'methods': ['password']}}}
+            self.token_api.create_token(token_id, data)
+            token_ids.append(token_id)
+        self.token_api.delete_token(token_ids[0])
+        token_ref = self.token_api.get_token(token_ids[1])
+        self.assertEqual(token_ref['token_data']['token']['catalog'], catalog)
+        self.assertNotIn('catalog_id', token_ref)
+
+    def test_revocation_events(self):
+        token_id = self.create_token_sample_data(tenant_id='testtenantid',
+                                                 trust_id='testtrustid')
+        self.assertEqual(self.token_api.list_revocation_events(), [])
+        self.token_api.delete_token(token_id)
+        events = self.token_api.list_revocation_events()
+        self.assertEqual(len(events), 1)
+        event = events[0]
+        self.assertEqual(event['id'], token_id)
+        self.assertEqual(event['user_id'], 'testuserid')
+        self.assertEqual(event['project_id'], 'testtenantid')
+        self.assertEqual(event['trust_id'], 'testtrustid')
+        self.assertIsNotNone(event['expires'])
+        self.assertEqual(
+            self.token_api.list_revocation_events(event['seq']), [])
+
+        token_id2 = self.create_token_sample_data()
+        self.token_api.delete_token(token_id2)
+        events = self.token_api.list_revocation_events(event['seq'])
+        self.assertEqual([e['id'] for e in events], [token_id2])
+        self.assertGreater(events[0]['seq'], event['seq'])
+        self.assertEqual(len(self.token_api.list_revocation_events()), 2)
+
+    def test_revocation_events_expire(self):
+        token_id = self.create_token_sample_data()
+        self.token_api.delete_token(token_id)
+        expires = self.token_api.list_revocation_events()[0]['expires']
+        timeutils.set_time_override(expires + datetime.timedelta(seconds=1))
+        try:
+            self.assertEqual(self.token_api.list_revocation_events(), [])
+        finally:
+            timeutils.clear_time_override()
+
+    def test_revocation_events_for_users(self):
+        token_id = self.create_token_sample_data(tenant_id='testtenantid')
+        self.create_token_sample_data(tenant_id='testtenantid',
+                                      user_id='testuserid1')
+        self.token_api.delete_tokens_for_users(['testuserid'])
+        events = self.token_api.list_revocation_events()
+        self.assertEqual([e['id'] for e in events], [token_id])
+
+    def test_revocation_events_wait(self):
+        token_id = self.create_token_sample_data()
+
+        def sleep(seconds):
+            self.token_api.delete_token(token_id)
+
+        self.stubs.Set(utils.time, 'sleep', sleep)
+        events = self.token_api.list_revocation_events(wait=60)
+        self.assertEqual([e['id'] for e in events], [token_id])
+
     def create_token_sample_data(self, tenant_id=None, trust_id=None,
-                                 user_id="testuserid"):
+                                 user_id="testuserid", domain_id=None):
         token_id = self._create_token_id()
         data = {'id': token_id, 'a': 'b',
                 'user': {'id': user_id}}
@@ -2216,6 +2338,8 @@ class TokenTests(object):
             data['tenant'] = None
         if trust_id is not None:
             data['trust_id'] = trust_id
+        if domain_id is not None:
+            data['token_data'] = {'token': {'domain': {'id': domain_id}}}
         new_token = self.token_api.create_token(token_id, data)
         return new_token['id']
 
@@ -2259,6 +2383,76 @@ class TokenTests(object):
                           self.token_api.get_token, token_id1)
         self.token_api.get_token(token_id2)
 
+    def test_delete_tokens_for_users(self):
+        token_id1 = self.create_token_sample_data(user_id='testuserid1')
+        token_id2 = self.create_token_sample_data(tenant_id='testtenantid',
+                                                  user_id='testuserid2')
+        token_id3 = self.create_token_sample_data(user_id='testuserid3')
+        self.token_api.delete_tokens_for_users(['testuserid1', 'testuserid2'])
+        self.assertRaises(exception.TokenNotFound,
+                          self.token_api.get_token, token_id1)
+        self.assertRaises(exception.TokenNotFound,
+                          self.token_api.get_token, token_id2)
+        self.token_api.get_token(token_id3)
+
+    def test_delete_tokens_for_users_on_project(self):
+        token_id1 = self.create_token_sample_data(tenant_id='testtenantid',
+                                                  user_id='testuserid1')
+        token_id2 = self.create_token_sample_data(tenant_id='testtenantid1',
+                                                  user_id='testuserid1')
+        token_id3 = self.create_token_sample_data(tenant_id='testtenantid',
+                                                  user_id='testuserid2')
+        self.token_api.delete_tokens_for_users(['testuserid1'],
+                                               project_id='testtenantid')
+        self.assertRaises(exception.TokenNotFound,
+                          self.token_api.get_token, token_id1)
+        self.token_api.get_token(token_id2)
+        self.token_api.get_token(token_id3)
+
+    def test_delete_tokens_for_trusts(self):
+        token_id1 = self.create_token_sample_data(trust_id='testtrustid1')
+        token_id2 = self.create_token_sample_data(user_id='testuserid1',
+                                                  trust_id='testtrustid2')
+        token_id3 = self.create_token_sample_data(trust_id='testtrustid3')
+        token_id4 = self.create_token_sample_data()
+        self.token_api.delete_tokens_for_trusts(['testtrustid1',
+                                                 'testtrustid2'])
+        self.assertRaises(exception.TokenNotFound,
+                          self.token_api.get_token, token_id1)
+        self.assertRaises(exception.TokenNotFound,
+                          self.token_api.get_token, token_id2)
+        self.token_api.get_token(token_id3)
+        self.token_api.get_token(token_id4)
+
+    def test_delete_tokens_for_project(self):
+        token_id1 = self.create_token_sample_data(tenant_id='testtenantid',
+                                                  user_id='testuserid1')
+        token_id2 = self.create_token_sample_data(tenant_id='testtenantid',
+                                                  user_id='testuserid2')
+        token_id3 = self.create_token_sample_data(tenant_id='testtenantid1',
+                                                  user_id='testuserid1')
+        token_id4 = self.create_token_sample_data(user_id='testuserid1')
+        self.token_api.delete_tokens_for_project('testtenantid')
+        self.assertRaises(exception.TokenNotFound,
+                          self.token_api.get_token, token_id1)
+        self.assertRaises(exception.TokenNotFound,
+                          self.token_api.get_token, token_id2)
+        self.token_api.get_token(token_id3)
+        self.token_api.get_token(token_id4)
+
+    def test_delete_tokens_for_domain(self):
+        token_id1 = self.create_token_sample_data(domain_id='testdomainid',
+                                                  user_id='testuserid1')
+        token_id2 = self.create_token_sample_data(domain_id='testdomainid1',
+                                                  user_id='testuserid1')
+        token_id3 = self.create_token_sample_data(tenant_id='testdomainid',
+                                                  user_id='testuserid1')
+        self.token_api.delete_tokens_for_domain('testdomainid')
+        self.assertRaises(exception.TokenNotFound,
+                          self.token_api.get_token, token_id1)
+        self.token_api.get_token(token_id2)
+        self.token_api.get_token(token_id3)
+
     def test_token_list(self):
         tokens = self.token_api.list_tokens('testuserid')
         self.assertEquals(len(tokens), 0)
@@ -2487,6 +2681,16 @@ class TrustTests(object):
         trusts = self.trust_api.list_trusts()
         self.assertEqual(len(trusts), 3)
 
+    def test_list_trusts_for_users(self):
+        trust_ids = set(self.create_sample_trust(uuid.uuid4().hex)['id']
+                        for i in range(3))
+        for user_ids in ([self.trustee['id']], [self.trustor['id']],
+                         [self.trustee['id'], self.trustor['id']]):
+            trusts = self.trust_api.list_trusts_for_users(user_ids)
+            self.assertEqual(set(trust['id'] for trust in trusts), trust_ids)
+        self.assertEqual(
+            self.trust_api.list_trusts_for_users([uuid.uuid4().hex]), [])
+
 
 class CommonHelperTests(test.TestCase):
     def test_format_helper_raises_malformed_on_missing_key(self):
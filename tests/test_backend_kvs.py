@@ -13,19 +13,254 @@
 # WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
 # License for the specific language governing permissions and limitations
 # under the License.
+import datetime
+import os
 import uuid
 
 import nose.exc
 
 from keystone import test
 
+from keystone.common import kvs
 from keystone import exception
 from keystone import identity
+from keystone.openstack.common import timeutils
 
 import default_fixtures
 import test_backend
 
 
+class KvsIndexes(test.TestCase):
+    def setUp(self):
+        super(KvsIndexes, self).setUp()
+        self.db = kvs.DictKvs({'thing-a': {'color': 'red', 'size': 3}})
+        self.db.add_index('color', 'thing-',
+                          lambda key, ref: [ref['color']])
+        self.db.add_index('size', 'thing-',
+                          lambda key, ref: [ref['size']], ordered=True)
+
+    def test_existing_items_are_indexed(self):
+        self.assertEqual(['thing-a'], self.db.find('color', 'red'))
+
+    def test_find(self):
+        self.db.set('thing-b', {'color': 'red', 'size': 1})
+        self.db.set('thing-c', {'color': 'blue', 'size': 2})
+        self.db.set('other-d', {'color': 'red', 'size': 0})
+        self.assertEqual(set(['thing-a', 'thing-b']),
+                         set(self.db.find('color', 'red')))
+        self.assertEqual([], self.db.find('color', 'green'))
+        self.assertEqual(['thing-b', 'thing-c', 'thing-a'],
+                         self.db.find_all('size'))
+        self.assertEqual(['thing-b', 'thing-c'],
+                         self.db.find_before('size', 3))
+
+    def test_set_and_delete_update_indexes(self):
+        self.db.set('thing-a', {'color': 'blue', 'size': 1})
+        self.assertEqual([], self.db.find('color', 'red'))
+        self.assertEqual(['thing-a'], self.db.find('color', 'blue'))
+        self.assertEqual(['thing-a'], self.db.find_before('size', 2))
+        self.db.delete('thing-a')
+        self.assertEqual([], self.db.find('color', 'blue'))
+        self.assertEqual([], self.db.find_all('size'))
+
+    def test_buckets(self):
+        self.db.add_index('size_bucket', 'thing-',
+                          lambda key, ref: [ref['size']], ordered=True,
+                          bucket=lambda size: size // 10)
+        self.db.set('thing-b', {'color': 'red', 'size': 12})
+        self.db.set('thing-c', {'color': 'red', 'size': 17})
+        self.db.set('thing-d', {'color': 'red', 'size': 25})
+        self.assertEqual(['thing-a'], self.db.find_before('size_bucket', 10))
+        self.assertEqual(set(['thing-a', 'thing-b']),
+                         set(self.db.find_before('size_bucket', 15)))
+        self.assertEqual(4, len(self.db.find_all('size_bucket')))
+        self.db.delete('thing-b')
+        self.db.delete('thing-c')
+        self.assertEqual(['thing-a', 'thing-d'],
+                         self.db.find_all('size_bucket'))
+
+    def test_find_after(self):
+        self.db.add_index('size_bucket', 'thing-',
+                          lambda key, ref: [ref['size']], ordered=True,
+                          bucket=lambda size: size // 10)
+        self.db.set('thing-b', {'color': 'red', 'size': 12})
+        self.db.set('thing-c', {'color': 'red', 'size': 17})
+        self.assertEqual(set(['thing-c']),
+                         set(self.db.find_after('size_bucket', 12)))
+        self.assertEqual(set(['thing-b', 'thing-c']),
+                         set(self.db.find_after('size_bucket', 5)))
+        self.assertEqual([], self.db.find_after('size_bucket', 17))
+
+    def test_incr(self):
+        self.assertEqual(1, self.db.incr('counter'))
+        self.assertEqual(2, self.db.incr('counter'))
+
+    def test_set_numbered(self):
+        self.assertEqual(1, self.db.set_numbered('thing-b', {'color': 'red',
+                                                             'size': 1},
+                                                 'counter'))
+        self.assertEqual(2, self.db.set_numbered('thing-c', {'color': 'red',
+                                                             'size': 2},
+                                                 'counter'))
+        self.assertEqual(2, self.db.get('thing-c')['seq'])
+        self.assertEqual(set(['thing-a', 'thing-b', 'thing-c']),
+                         set(self.db.find('color', 'red')))
+
+    def test_delete_unless_found(self):
+        self.db.set('shared', {})
+        self.assertFalse(self.db.delete_unless_found('shared', 'color', 'red'))
+        self.assertEqual({}, self.db.get('shared'))
+        self.assertTrue(self.db.delete_unless_found('shared', 'color',
+                                                    'blue'))
+        self.assertRaises(exception.NotFound, self.db.get, 'shared')
+        self.assertFalse(self.db.delete_unless_found('shared', 'color',
+                                                     'blue'))
+
+    def test_clear_keeps_declared_indexes(self):
+        self.db.clear()
+        self.assertEqual([], self.db.find('color', 'red'))
+        self.db.set('thing-b', {'color': 'red', 'size': 1})
+        self.assertEqual(['thing-b'], self.db.find('color', 'red'))
+
+
+class KvsLog(test.TestCase):
+    def setUp(self):
+        super(KvsLog, self).setUp()
+        self.path = test.tmpdir('kvs-%s' % uuid.uuid4().hex)
+        self.dbs = []
+
+    def tearDown(self):
+        for db in self.dbs:
+            db.close()
+        for path in (self.path, self.path + '.lock'):
+            if os.path.exists(path):
+                os.remove(path)
+        super(KvsLog, self).tearDown()
+
+    def open_db(self, **kwargs):
+        db = kvs.LogKvs(self.path, **kwargs)
+        db.add_index('color', 'thing-', lambda key, ref: [ref['color']])
+        self.dbs.append(db)
+        return db
+
+    def test_persists(self):
+        db = self.open_db()
+        db.set('thing-a', {'color': 'red'})
+        db.set('thing-b', {'color': 'blue'})
+        db.delete('thing-b')
+        db.close()
+
+        db = self.open_db()
+        self.assertEqual({'color': 'red'}, db.get('thing-a'))
+        self.assertRaises(exception.NotFound, db.get, 'thing-b')
+        self.assertEqual(['thing-a'], db.find('color', 'red'))
+
+    def test_writes_are_shared(self):
+        db1 = self.open_db()
+        db2 = self.open_db()
+        db1.set('thing-a', {'color': 'red'})
+        self.assertEqual(['thing-a'], db2.find('color', 'red'))
+        db2.set('thing-a', {'color': 'blue'})
+        self.assertEqual({'color': 'blue'}, db1.get('thing-a'))
+        db1.delete('thing-a')
+        self.assertRaises(exception.NotFound, db2.delete, 'thing-a')
+        self.assertEqual([], db2.keys())
+
+    def test_torn_write_is_cut_off(self):
+        db = self.open_db()
+        db.set('thing-a', {'color': 'red'})
+        db.close()
+        with open(self.path, 'ab') as f:
+            f.write(db._record(('set', 'thing-b', {'color': 'red'}))[:-3])
+
+        db = self.open_db()
+        self.assertEqual(['thing-a'], db.find('color', 'red'))
+        db.set('thing-c', {'color': 'red'})
+        self.assertEqual(set(['thing-a', 'thing-c']),
+                         set(self.open_db().find('color', 'red')))
+
+    def test_compaction(self):
+        db1 = self.open_db(compact_threshold=2)
+        db2 = self.open_db()
+        db1.set('thing-a', {'color': 'pink'})
+        self.assertEqual(['thing-a'], db2.keys())
+        size = os.path.getsize(self.path)
+        for color in ('blue', 'gray', 'blue'):
+            db1.set('thing-a', {'color': color})
+        self.assertEqual(size, os.path.getsize(self.path))
+        self.assertEqual(['thing-a'], db2.find('color', 'blue'))
+        db2.set('thing-b', {'color': 'blue'})
+        self.assertEqual(set(['thing-a', 'thing-b']),
+                         set(db1.find('color', 'blue')))
+
+    def test_incr_is_shared(self):
+        db1 = self.open_db()
+        db2 = self.open_db()
+        self.assertEqual(1, db1.incr('counter'))
+        self.assertEqual(2, db2.incr('counter'))
+        self.assertEqual(3, db1.incr('counter'))
+
+    def test_set_numbered_is_shared(self):
+        db1 = self.open_db()
+        db2 = self.open_db()
+        self.assertEqual(1, db1.set_numbered('thing-a', {'color': 'red'},
+                                             'counter'))
+        self.assertEqual(2, db2.set_numbered('thing-b', {'color': 'red'},
+                                             'counter'))
+        self.assertEqual({'color': 'red', 'seq': 2}, db1.get('thing-b'))
+
+    def test_set_numbered_in_order(self):
+        # two processes number items concurrently; the log must hold them
+        # in the order of their numbers
+        pid = os.fork()
+        if not pid:
+            status = 1
+            try:
+                db = kvs.LogKvs(self.path)
+                for i in range(50):
+                    db.set_numbered('thing-child-%d' % i, {'color': 'red'},
+                                    'counter')
+                db.close()
+                status = 0
+            finally:
+                os._exit(status)
+        db = self.open_db()
+        for i in range(50):
+            db.set_numbered('thing-parent-%d' % i, {'color': 'red'},
+                            'counter')
+        self.assertEqual(0, os.waitpid(pid, 0)[1])
+
+        applied = []
+
+        class RecordingLogKvs(kvs.LogKvs):
+            def _apply(self, record):
+                applied.append(record)
+                super(RecordingLogKvs, self)._apply(record)
+
+        self.dbs.append(RecordingLogKvs(self.path))
+        self.assertEqual(range(1, 101),
+                         [record[2]['seq'] for record in applied
+                          if record[1].startswith('thing-')])
+
+    def test_delete_unless_found_is_shared(self):
+        db1 = self.open_db()
+        db2 = self.open_db()
+        db1.set('shared', {})
+        db2.set('thing-a', {'color': 'red'})
+        self.assertFalse(db1.delete_unless_found('shared', 'color', 'red'))
+        db2.delete('thing-a')
+        self.assertTrue(db1.delete_unless_found('shared', 'color', 'red'))
+        self.assertRaises(exception.NotFound, db2.get, 'shared')
+
+    def test_clear(self):
+        db1 = self.open_db()
+        db2 = self.open_db()
+        db1.set('thing-a', {'color': 'red'})
+        db2.clear()
+        self.assertEqual([], db1.keys())
+        self.assertEqual([], db1.find('color', 'red'))
+
+
 class KvsIdentity(test.TestCase, test_backend.IdentityTests):
     def setUp(self):
         super(KvsIdentity, self).setUp()
@@ -73,6 +308,53 @@ class KvsToken(test.TestCase, test_backend.TokenTests):
             'keystone.identity.backends.kvs.Identity')
         self.load_backends()
 
+    def test_expired_tokens_are_evicted(self):
+        token_id = uuid.uuid4().hex
+        revoked_id = uuid.uuid4().hex
+        expires = timeutils.utcnow() + datetime.timedelta(minutes=5)
+        for i in (token_id, revoked_id):
+            self.token_api.create_token(i, {'id': i, 'expires': expires,
+                                            'user': {'id': 'testuserid'}})
+        self.token_api.delete_token(revoked_id)
+
+        timeutils.set_time_override(expires + datetime.timedelta(seconds=1))
+        self.assertEqual([], self.token_api.list_revoked_tokens())
+        self.assertNotIn('revoked-token-%s' % revoked_id, kvs.INMEMDB)
+        self.token_api.create_token(
+            uuid.uuid4().hex, {'id': uuid.uuid4().hex,
+                               'user': {'id': 'testuserid'}})
+        self.assertNotIn('token-%s' % token_id, kvs.INMEMDB)
+
+
+class KvsLogToken(test.TestCase, test_backend.TokenTests):
+    def setUp(self):
+        super(KvsLogToken, self).setUp()
+        self.path = test.tmpdir('kvs-%s' % uuid.uuid4().hex)
+        self.opt_in_group('kvs', path=self.path)
+        identity.CONF.identity.driver = (
+            'keystone.identity.backends.kvs.Identity')
+        self.load_backends()
+
+    def tearDown(self):
+        kvs._LOGDBS.pop(self.path).close()
+        os.remove(self.path)
+        os.remove(self.path + '.lock')
+        super(KvsLogToken, self).tearDown()
+
+    def test_tokens_deleted_by_another_process(self):
+        token_id = uuid.uuid4().hex
+        self.token_api.create_token(token_id, {'id': token_id,
+                                               'user': {'id': 'testuserid'}})
+        driver = self.token_api.driver
+        keys = driver.db.find('token_user', 'testuserid')
+
+        other = kvs.LogKvs(self.path)
+        try:
+            other.delete('token-%s' % token_id)
+        finally:
+            other.close()
+        self.assertEqual(list(driver._current_tokens(keys)), [])
+
 
 class KvsTrust(test.TestCase, test_backend.TrustTests):
     def setUp(self):
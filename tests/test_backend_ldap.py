@@ -72,6 +72,21 @@ class BaseLDAPIdentity(test_backend.IdentityTests):
                           self.identity_api.get_user,
                           'fake1')
 
+    def test_export(self):
+        users = list(self.identity_api.export_users())
+        self.assertEqual(
+            sorted(user['id'] for user in users),
+            sorted(user['id'] for user in self.identity_api.list_users()))
+        for user in users:
+            self.assertNotIn('password', user)
+            self.assertEqual(user['domain_id'],
+                             CONF.identity.default_domain_id)
+        self.assertEqual(
+            sorted(project['id'] for project in
+                   self.assignment_api.export_projects()),
+            sorted(project['id'] for project in
+                   self.assignment_api.list_projects()))
+
     def test_configurable_forbidden_user_actions(self):
         CONF.ldap.user_allow_create = False
         CONF.ldap.user_allow_update = False
@@ -126,6 +141,9 @@ class BaseLDAPIdentity(test_backend.IdentityTests):
     def test_get_and_remove_role_grant_by_group_and_domain(self):
         raise nose.exc.SkipTest('N/A: LDAP does not support multiple domains')
 
+    def test_authenticate_rehashes_password(self):
+        raise nose.exc.SkipTest('N/A: LDAP binds to check passwords')
+
     def test_get_and_remove_role_grant_by_user_and_domain(self):
         raise nose.exc.SkipTest('N/A: LDAP does not support multiple domains')
 
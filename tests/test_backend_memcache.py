@@ -28,6 +28,7 @@ from keystone.openstack.common import jsonutils
 from keystone.openstack.common import timeutils
 from keystone import token
 from keystone.token.backends import memcache as token_memcache
+from keystone.token import codec
 
 import test_backend
 
@@ -39,6 +40,11 @@ class MemcacheClient(object):
         """Ignores the passed in args."""
         self.cache = {}
         self.reject_cas = False
+        # like memcached, every write of a key gives it a new cas id, which
+        # cas() compares with the one last returned by gets()
+        self.last_cas_id = 0
+        self.cas_ids = {}
+        self.seen_cas_ids = {}
 
     def add(self, key, value):
         if self.get(key):
@@ -57,8 +63,10 @@ class MemcacheClient(object):
             raise memcache.Client.MemcachedStringEncodingError()
 
     def gets(self, key):
-        #Call self.get() since we don't really do 'cas' here.
-        return self.get(key)
+        value = self.get(key)
+        if value is not None:
+            self.seen_cas_ids[key] = self.cas_ids.get(key)
+        return value
 
     def get(self, key):
         """Retrieves the value for a key or None."""
@@ -76,6 +84,15 @@ class MemcacheClient(object):
             data_copy = copy.deepcopy(obj[0])
             return data_copy
 
+    def get_multi(self, keys):
+        """Retrieves the values of the keys which are set."""
+        values = {}
+        for key in keys:
+            value = self.get(key)
+            if value is not None:
+                values[key] = value
+        return values
+
     def set(self, key, value, time=0):
         """Sets the value for a key."""
         self.check_key(key)
@@ -88,20 +105,32 @@ class MemcacheClient(object):
             # set/delete/append/etc
         data_copy = copy.deepcopy(value)
         self.cache[key] = (data_copy, time)
+        self.last_cas_id += 1
+        self.cas_ids[key] = self.last_cas_id
         return True
 
+    def incr(self, key, delta=1):
+        value = self.get(key)
+        if value is None:
+            return None
+        value = int(value) + delta
+        self.set(key, str(value))
+        return value
+
     def cas(self, key, value, time=0, min_compress_len=0):
-        # Call self.set() since we don't really do 'cas' here.
         if self.reject_cas:
             return False
+        if (key in self.seen_cas_ids and
+                self.seen_cas_ids[key] != self.cas_ids.get(key)):
+            return False
         return self.set(key, value, time=time)
 
     def reset_cas(self):
-        #This is a stub for the memcache client reset_cas function.
-        pass
+        self.seen_cas_ids = {}
 
     def delete(self, key):
         self.check_key(key)
+        self.cas_ids.pop(key, None)
         try:
             del self.cache[key]
         except KeyError:
@@ -136,6 +165,31 @@ class MemcacheToken(test.TestCase, test_backend.TokenTests):
         user_id = unicode(uuid.uuid4().hex)
         self.token_api.list_tokens(user_id)
 
+    def test_delete_tokens_for_users(self):
+        with self.assertRaises(exception.NotImplemented):
+            self.token_api.delete_tokens_for_users(['testuserid'])
+
+    def test_delete_tokens_for_users_on_project(self):
+        with self.assertRaises(exception.NotImplemented):
+            self.token_api.delete_tokens_for_users(['testuserid'],
+                                                   project_id='testtenantid')
+
+    def test_delete_tokens_for_trusts(self):
+        with self.assertRaises(exception.NotImplemented):
+            self.token_api.delete_tokens_for_trusts(['testtrustid'])
+
+    def test_delete_tokens_for_project(self):
+        with self.assertRaises(exception.NotImplemented):
+            self.token_api.delete_tokens_for_project('testtenantid')
+
+    def test_delete_tokens_for_domain(self):
+        with self.assertRaises(exception.NotImplemented):
+            self.token_api.delete_tokens_for_domain('testdomainid')
+
+    def test_revocation_events_for_users(self):
+        with self.assertRaises(exception.NotImplemented):
+            self.token_api.delete_tokens_for_users(['testuserid'])
+
     def test_flush_expired_token(self):
         with self.assertRaises(exception.NotImplemented):
             self.token_api.flush_expired_tokens()
@@ -165,15 +219,113 @@ class MemcacheToken(test.TestCase, test_backend.TokenTests):
         self.assertEquals(len(user_token_list), 2)
         expired_token_ptk = self.token_api.driver._prefix_token_id(
             expired_token_id)
-        expired_token = self.token_api.driver.client.get(expired_token_ptk)
+        expired_token = codec.decode(
+            self.token_api.driver.client.get(expired_token_ptk))
         expired_token['expires'] = (timeutils.utcnow() - expire_delta)
-        self.token_api.driver.client.set(expired_token_ptk, expired_token)
+        self.token_api.driver.client.set(expired_token_ptk,
+                                         codec.encode(expired_token))
 
         self.token_api.create_token(second_valid_token_id, second_valid_data)
         user_record = self.token_api.driver.client.get(user_key)
         user_token_list = jsonutils.loads('[%s]' % user_record)
         self.assertEquals(len(user_token_list), 2)
 
+    def test_revocation_events_of_interleaved_writers(self):
+        token_ids = [uuid.uuid4().hex for i in range(3)]
+        for token_id in token_ids:
+            self.token_api.create_token(token_id, {'id': token_id,
+                                                   'user': {'id': 'u1'}})
+        self.token_api.delete_token(token_ids.pop())
+        since = self.token_api.list_revocation_events()[0]['seq']
+        # the second token is revoked once the first one's event is numbered
+        client = self.token_api.driver.client
+        incr = client.incr
+        writers = [token_ids[1]]
+        listed = []
+
+        def interleaved_incr(key, delta=1):
+            value = incr(key, delta)
+            if writers:
+                self.token_api.delete_token(writers.pop())
+                listed.extend(self.token_api.list_revocation_events(since))
+            return value
+
+        self.stubs.Set(client, 'incr', interleaved_incr)
+        self.token_api.delete_token(token_ids[0])
+
+        # the second event is not listed before the first one is stored
+        self.assertEqual(listed, [])
+        events = self.token_api.list_revocation_events(since)
+        self.assertEqual([event['id'] for event in events],
+                         [token_ids[0], token_ids[1]])
+        events = self.token_api.list_revocation_events(events[0]['seq'])
+        self.assertEqual([event['id'] for event in events], [token_ids[1]])
+
+    def test_revocation_events_stored_apart(self):
+        token_ids = [self.create_token_sample_data() for i in range(2)]
+        for token_id in token_ids:
+            self.token_api.delete_token(token_id)
+        driver = self.token_api.driver
+        for event in self.token_api.list_revocation_events():
+            self.assertIsNotNone(driver.client.get(
+                driver._prefix_revocation_seq(event['seq'])))
+
+    def test_revocation_events_after_lost_ones(self):
+        token_ids = [self.create_token_sample_data() for i in range(3)]
+        for token_id in token_ids:
+            self.token_api.delete_token(token_id)
+        driver = self.token_api.driver
+        events = self.token_api.list_revocation_events()
+        driver.client.delete(driver._prefix_revocation_seq(events[1]['seq']))
+        self.assertEqual(
+            [e['id'] for e in self.token_api.list_revocation_events()],
+            [token_ids[0]])
+
+        timeutils.set_time_override(
+            timeutils.utcnow() + datetime.timedelta(
+                seconds=token_memcache.REVOCATION_EVENT_GRACE + 1))
+        try:
+            self.assertEqual(
+                [e['id'] for e in self.token_api.list_revocation_events()],
+                [token_ids[0], token_ids[2]])
+        finally:
+            timeutils.clear_time_override()
+
+    def test_revocation_events_first_seq_evicted(self):
+        token_id = self.create_token_sample_data()
+        self.token_api.delete_token(token_id)
+        driver = self.token_api.driver
+        driver.client.delete(driver.revocation_first_key)
+        self.assertEqual(
+            [e['id'] for e in self.token_api.list_revocation_events()],
+            [token_id])
+
+    def test_revocation_events_numbered_after_expired_ones(self):
+        token_id = self.create_token_sample_data()
+        self.token_api.delete_token(token_id)
+        event = self.token_api.list_revocation_events()[0]
+        self.token_api.driver.client.delete(
+            self.token_api.driver.revocation_seq_key)
+        timeutils.set_time_override(
+            event['expires'] + datetime.timedelta(seconds=1))
+        try:
+            self.assertEqual(self.token_api.list_revocation_events(), [])
+        finally:
+            timeutils.clear_time_override()
+
+        token_id = self.create_token_sample_data()
+        self.token_api.delete_token(token_id)
+        self.assertEqual(
+            [e['id'] for e
+             in self.token_api.list_revocation_events(event['seq'])],
+            [token_id])
+
+    def test_clients_reset_after_fork(self):
+        driver = token_memcache.Token()
+        driver._memcache_client = MemcacheClient()
+        token_memcache._reset_clients()
+        self.assertIsNone(driver._memcache_client)
+
     def test_cas_failure(self):
         self.token_api.driver.client.reject_cas = True
         token_id = uuid.uuid4().hex
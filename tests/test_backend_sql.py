@@ -14,6 +14,7 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import datetime
 import uuid
 
 from keystone import test
@@ -21,6 +22,11 @@ from keystone import test
 from keystone.common import sql
 from keystone import config
 from keystone import exception
+from keystone.openstack.common import timeutils
+
+from keystone.assignment.backends import sql as assignment_sql
+from keystone.identity.backends import sql as identity_sql
+from keystone.token.backends import sql as token_sql
 
 import default_fixtures
 import test_backend
@@ -63,6 +69,45 @@ class SqlIdentity(SqlTests, test_backend.IdentityTests):
         user_ref = self.identity_api._get_user(session, self.user_foo['id'])
         self.assertNotEqual(user_ref['password'], self.user_foo['password'])
 
+    def test_select_dicts_matches_to_dict(self):
+        user = {'id': uuid.uuid4().hex,
+                'name': uuid.uuid4().hex,
+                'domain_id': DEFAULT_DOMAIN_ID,
+                'password': uuid.uuid4().hex,
+                'arbitrary': {'nested': [1, 2]}}
+        self.identity_api.create_user(user['id'], user)
+
+        session = self.identity_api.get_session()
+        refs = session.query(identity_sql.User)
+        expected = sorted((ref.to_dict() for ref in refs),
+                          key=lambda ref: ref['id'])
+        users = sorted(self.identity_api.select_dicts(identity_sql.User),
+                       key=lambda ref: ref['id'])
+        self.assertEqual(users, expected)
+
+    def test_select_dicts_where(self):
+        users = self.identity_api.select_dicts(
+            identity_sql.User, identity_sql.User.id == self.user_foo['id'])
+        self.assertEqual([ref['id'] for ref in users], [self.user_foo['id']])
+
+    def test_iter_dicts_pages(self):
+        users = sorted(self.identity_api.select_dicts(identity_sql.User),
+                       key=lambda ref: ref['id'])
+        self.assertEqual(
+            list(self.identity_api.iter_dicts(identity_sql.User,
+                                              page_size=3)),
+            users)
+
+    def test_iter_rows_composite_key(self):
+        session = self.assignment_api.get_session()
+        expected = sorted((ref.user_id, ref.project_id) for ref in
+                          session.query(assignment_sql.UserProjectGrant))
+        self.assertTrue(len(expected) > 2)
+        rows = self.assignment_api.iter_rows(
+            assignment_sql.UserProjectGrant, page_size=2)
+        self.assertEqual([(row.user_id, row.project_id) for row in rows],
+                         expected)
+
     def test_delete_user_with_project_association(self):
         user = {'id': uuid.uuid4().hex,
                 'name': uuid.uuid4().hex,
@@ -245,7 +290,157 @@ class SqlTrust(SqlTests, test_backend.TrustTests):
 
 
 class SqlToken(SqlTests, test_backend.TokenTests):
-    pass
+    def test_revocation_events_without_expiry(self):
+        session = self.get_session()
+        with session.begin():
+            session.add(token_sql.RevocationEventModel(
+                token_id=uuid.uuid4().hex, expires=None))
+        events = self.token_api.list_revocation_events()
+        self.assertEqual(len(events), 1)
+        self.assertIsNone(events[0]['expires'])
+
+    def test_revocation_events_numbered_by_counter(self):
+        session = self.get_session()
+        with session.begin():
+            session.add(token_sql.RevocationEventModel(
+                seq=7, token_id=uuid.uuid4().hex, expires=None))
+        token_ids = [self.create_token_sample_data() for i in range(3)]
+        self.token_api.delete_token(token_ids[0])
+        self.token_api.delete_tokens_for_users(['testuserid'])
+        self.assertEqual([event['seq'] for event
+                          in self.token_api.list_revocation_events()],
+                         [7, 8, 9, 10])
+        self.assertEqual(session.query(token_sql.RevocationSequenceModel)
+                         .get(1).value, 10)
+
+    def test_flush_keeps_recently_used_catalogs(self):
+        catalog = [{'type': 'identity', 'endpoints': []}]
+        token_id = uuid.uuid4().hex
+        self.token_api.create_token(
+            token_id, {'id': token_id, 'user': {'id': 'testuserid'},
+                       'expires': timeutils.utcnow(),
+                       'token_data': {'token': {'catalog': catalog}}})
+        session = self.get_session()
+        self.token_api.flush_expired_tokens()
+        self.assertEqual(session.query(token_sql.TokenModel).count(), 0)
+        self.assertEqual(
+            session.query(token_sql.TokenCatalogModel).count(), 1)
+
+        timeutils.set_time_override(
+            timeutils.utcnow() +
+            datetime.timedelta(seconds=CONF.token.expiration + 1))
+        try:
+            self.token_api.flush_expired_tokens()
+        finally:
+            timeutils.clear_time_override()
+        self.assertEqual(
+            session.query(token_sql.TokenCatalogModel).count(), 0)
+
+    def test_catalog_stored_meanwhile(self):
+        catalog = [{'type': 'identity', 'endpoints': []}]
+        token_ids = [uuid.uuid4().hex for i in range(2)]
+        get_session = self.token_api.driver.get_session
+        raced = []
+
+        def get_racing_session(*args, **kwargs):
+            # the other token is stored once the catalog was looked up
+            session = get_session(*args, **kwargs)
+            add = session.add
+
+            def add_after_other_token(instance, *args, **kwargs):
+                if (isinstance(instance, token_sql.TokenCatalogModel) and
+                        not raced):
+                    raced.append(instance.id)
+                    self.token_api.create_token(
+                        token_ids[1],
+                        {'id': token_ids[1], 'user': {'id': 'testuserid'},
+                         'token_data': {'token': {'catalog': catalog}}})
+                add(instance, *args, **kwargs)
+
+            session.add = add_after_other_token
+            return session
+
+        self.stubs.Set(self.token_api.driver, 'get_session',
+                       get_racing_session)
+        self.token_api.create_token(
+            token_ids[0], {'id': token_ids[0], 'user': {'id': 'testuserid'},
+                           'token_data': {'token': {'catalog': catalog}}})
+        self.assertTrue(raced)
+        for token_id in token_ids:
+            self.assertEqual(
+                self.token_api.get_token(
+                    token_id)['token_data']['token']['catalog'],
+                catalog)
+
+    def test_revoked_tokens_have_events(self):
+        self.create_token_sample_data(tenant_id='testtenantid')
+        late_token_ids = []
+        revocation_event = token_sql._revocation_event
+
+        def create_token_meanwhile(token_ref):
+            # a token starts matching once the revoked ones were selected
+            if not late_token_ids:
+                late_token_ids.append(self.create_token_sample_data(
+                    tenant_id='testtenantid'))
+            return revocation_event(token_ref)
+
+        self.stubs.Set(token_sql, '_revocation_event', create_token_meanwhile)
+        self.token_api.delete_tokens_for_project('testtenantid')
+        self.assertEqual(len(self.token_api.list_revocation_events()), 1)
+        self.token_api.get_token(late_token_ids[0])
+
+
+class SqlReadReplica(SqlTests):
+    def setUp(self):
+        super(SqlReadReplica, self).setUp()
+        # an empty replica, which never receives the writes
+        self.opt_in_group('sql', read_connection=['sqlite://'],
+                          primary_read_window=0)
+        self.replica = self.identity_api.driver.get_read_engines()[0]
+        sql.ModelBase.metadata.create_all(bind=self.replica)
+
+    def test_reads_use_replica(self):
+        self.assertEqual(self.identity_api.list_users(), [])
+        self.assertRaises(exception.UserNotFound,
+                          self.identity_api.get_user,
+                          self.user_foo['id'])
+
+    def test_primary_only_backends(self):
+        self.opt_in_group('sql', primary_only_backends=['identity'])
+        self.identity_api.get_user(self.user_foo['id'])
+        self.assertEqual(self.assignment_api.list_projects(), [])
+
+    def test_reads_own_writes(self):
+        self.opt_in_group('sql', primary_read_window=60)
+        user = {'id': uuid.uuid4().hex, 'name': uuid.uuid4().hex,
+                'domain_id': DEFAULT_DOMAIN_ID, 'password': 'secret'}
+        self.identity_api.create_user(user['id'], user)
+        self.identity_api.get_user(user['id'])
+
+    def test_token_writes_keep_identity_on_replica(self):
+        self.opt_in_group('sql', primary_read_window=60)
+        self.stubs.Set(sql.core, 'LAST_WRITE_TIMES', {})
+        token_id = uuid.uuid4().hex
+        self.token_api.create_token(token_id, {'id': token_id,
+                                               'user': self.user_foo})
+        self.assertRaises(exception.UserNotFound,
+                          self.identity_api.get_user,
+                          self.user_foo['id'])
+
+    def test_tokens_read_from_primary(self):
+        token_id = uuid.uuid4().hex
+        self.token_api.create_token(token_id, {'id': token_id,
+                                               'user': self.user_foo})
+        self.assertEqual(self.token_api.get_token(token_id)['id'], token_id)
+        self.token_api.delete_token(token_id)
+        self.assertRaises(exception.TokenNotFound,
+                          self.token_api.get_token, token_id)
+        self.assertEqual([token['id'] for token
+                          in self.token_api.list_revoked_tokens()],
+                         [token_id])
+        self.assertEqual([event['id'] for event
+                          in self.token_api.list_revocation_events()],
+                         [token_id])
 
 
 class SqlCatalog(SqlTests, test_backend.CatalogTests):
@@ -799,6 +799,29 @@ class JsonTestCase(RestfulTestCase, CoreApiTests):
     def assertValidRevocationListResponse(self, response):
         self.assertIsNotNone(response.result['signed'])
 
+    def test_fetch_revocation_events_nonadmin_fails(self):
+        self.admin_request(
+            method='GET',
+            path='/v2.0/tokens/revoked/events',
+            expected_status=401)
+
+    def test_fetch_revocation_events_admin_200(self):
+        token = self.get_scoped_token()
+        r = self.admin_request(
+            method='GET',
+            path='/v2.0/tokens/revoked/events?since=0',
+            token=token,
+            expected_status=200)
+        self.assertValidRevocationListResponse(r)
+
+    def test_fetch_revocation_events_invalid_since(self):
+        token = self.get_scoped_token()
+        self.admin_request(
+            method='GET',
+            path='/v2.0/tokens/revoked/events?since=-1',
+            token=token,
+            expected_status=400)
+
     def test_create_update_user_json_invalid_enabled_type(self):
         # Enforce usage of boolean for 'enabled' field in JSON
         token = self.get_scoped_token()
@@ -0,0 +1,74 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import webob
+
+from keystone.contrib import access
+from keystone import test
+
+
+class FakeWriter(object):
+    def __init__(self):
+        self.records = []
+
+    def write(self, record):
+        self.records.append(record)
+
+
+def streaming_app(environ, start_response):
+    start_response('200 OK', [('Content-Type', 'text/plain')])
+    return iter(['abc', 'defg'])
+
+
+class AccessContribCore(test.TestCase):
+    def setUp(self):
+        super(AccessContribCore, self).setUp()
+        self.writer = FakeWriter()
+        self.stubs.Set(access.core, 'get_writer', lambda: self.writer)
+
+    def test_writer_batches(self):
+        batches = []
+        writer = access.AccessLogWriter(batches.append, 10, 2)
+        writer.records.extend(['a', 'b', 'c'])
+        writer.flush()
+        self.assertEqual(batches, [['a', 'b'], ['c']])
+
+    def test_writer_drops_on_overflow(self):
+        writer = access.AccessLogWriter(lambda batch: None, 2, 2)
+        writer.thread = object()
+        for record in ['a', 'b', 'c', 'd']:
+            writer.write(record)
+        self.assertEqual(list(writer.records), ['a', 'b'])
+        self.assertEqual(writer.dropped, 2)
+
+    def test_content_length_from_header(self):
+        app = access.AccessLogMiddleware(
+            lambda environ, start_response: webob.Response(body='hello')(
+                environ, start_response))
+        webob.Request.blank('/').get_response(app)
+        self.assertEqual(len(self.writer.records), 1)
+        self.assertTrue(self.writer.records[0].endswith('" 200 5'))
+
+    def test_content_length_of_streamed_body(self):
+        app = access.AccessLogMiddleware(streaming_app)
+        app_iter = app(webob.Request.blank('/').environ,
+                       lambda status, headers: None)
+        self.assertEqual(self.writer.records, [])
+
+        self.assertEqual(''.join(app_iter), 'abcdefg')
+        app_iter.close()
+        self.assertEqual(len(self.writer.records), 1)
+        self.assertTrue(self.writer.records[0].endswith('" 200 7'))
@@ -0,0 +1,326 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import StringIO
+
+import webob
+
+from keystone.common import kvs
+from keystone.common import sql
+from keystone.common import utils
+from keystone.common import wsgi
+from keystone import config
+from keystone.contrib import bulk_import
+from keystone.openstack.common import jsonutils
+from keystone import test
+
+import default_fixtures
+
+
+CONF = config.CONF
+
+
+def jsonlines(*records):
+    return [jsonutils.dumps(record) + '\n' for record in records]
+
+
+def counts(**kwargs):
+    return dict((record_type, kwargs.get(record_type, 0))
+                for record_type in bulk_import.RECORD_TYPES)
+
+
+class BulkImportTests(object):
+    def create_importer(self):
+        self.progress = []
+        self.importer = bulk_import.Importer(
+            self.identity_api, self.assignment_api, batch_size=2,
+            progress=lambda record_type, report: self.progress.append(
+                (record_type, report.imported[record_type])),
+            catalog_api=self.catalog_api)
+
+    def test_import(self):
+        report = self.importer.import_lines(jsonlines(
+            {'project': {'id': 'acme', 'name': 'ACME'}},
+            {'user': {'id': 'u1', 'name': 'u1', 'password': 'p1',
+                      'email': 'u1@example.com'}},
+            {'user': {'id': 'u2', 'name': 'u2', 'password': 'p2'}},
+            {'user': {'id': 'u3', 'name': 'u3'}},
+            {'group': {'id': 'g1', 'name': 'g1'}},
+            {'grant': {'role_id': 'member', 'user_id': 'u1',
+                       'project_id': 'acme'}},
+            {'grant': {'role_id': 'other', 'user_id': 'u1',
+                       'project_id': 'acme'}},
+            {'grant': {'role_id': 'admin', 'group_id': 'g1',
+                       'domain_id': CONF.identity.default_domain_id}}))
+
+        self.assertEqual(report.errors, [])
+        self.assertEqual(report.imported,
+                         counts(project=1, user=3, group=1, grant=3))
+        self.assertEqual(self.progress, [('project', 1), ('user', 2),
+                                         ('user', 3), ('group', 1),
+                                         ('grant', 2), ('grant', 3)])
+
+        project = self.identity_api.get_project('acme')
+        self.assertEqual(project['name'], 'ACME')
+        self.assertTrue(project['enabled'])
+        user = self.identity_api.get_user('u1')
+        self.assertEqual(user['email'], 'u1@example.com')
+        self.assertEqual(user['domain_id'], CONF.identity.default_domain_id)
+        self.assertNotIn('password', user)
+        self.identity_api.authenticate(user_id='u1', password='p1')
+        self.assertEqual(
+            set(self.identity_api.get_roles_for_user_and_project('u1',
+                                                                 'acme')),
+            set(['member', 'other']))
+        self.assertEqual(
+            [ref['id'] for ref in self.assignment_api.list_grants(
+                group_id='g1', domain_id=CONF.identity.default_domain_id)],
+            ['admin'])
+
+    def test_import_type_attribute(self):
+        report = self.importer.import_lines(jsonlines(
+            {'type': 'project', 'id': 'acme', 'name': 'ACME'},
+            {'type': 'user', 'id': 'u1', 'name': 'u1', 'password': 'p1'},
+            {'user': {'id': 'u2', 'name': 'u2'}},
+            {'type': 'group', 'id': 'g1', 'name': 'g1'},
+            {'type': 'grant', 'role_id': 'member', 'user_id': 'u1',
+             'project_id': 'acme'},
+            {'type': 'service', 'id': 's1'}))
+
+        self.assertEqual(report.imported,
+                         counts(project=1, user=2, group=1, grant=1))
+        self.assertEqual([error['line'] for error in report.errors], [6])
+        self.identity_api.get_group('g1')
+        self.identity_api.authenticate(user_id='u1', password='p1')
+        self.assertEqual(
+            self.identity_api.get_roles_for_user_and_project('u1', 'acme'),
+            ['member'])
+
+    def test_errors(self):
+        report = self.importer.import_lines(jsonlines(
+            {'user': {'id': 'u1', 'name': 'u1', 'password': 'p1'}},
+            {'user': {'id': self.user_foo['id'], 'name': 'dup'}},
+            {'user': {'id': 'u3', 'name': 'u3'}},
+            {'tenant': {'name': 'acme'}},
+            {'project': {'id': 'noname'}},
+            {'grant': {'role_id': 'member', 'user_id': 'u1',
+                       'project_id': 'nope'}},
+            {'grant': {'role_id': 'member', 'user_id': 'u1',
+                       'project_id': self.tenant_bar['id']}},
+            {'user': {'name': 'u4'}, 'group': {'name': 'g4'}}) +
+            ['not json\n'])
+
+        self.assertEqual(report.imported, counts(user=2, grant=1))
+        self.assertEqual(report.failed, counts(user=1, grant=1))
+        self.assertEqual([(error['line'], error['type'], error['id'])
+                          for error in report.to_dict()['errors']],
+                         [(2, 'user', self.user_foo['id']),
+                          (4, None, None),
+                          (5, None, None),
+                          (6, 'grant', None),
+                          (8, None, None),
+                          (9, None, None)])
+
+        # the failed batch was retried one user at a time
+        self.identity_api.get_user('u3')
+        self.identity_api.authenticate(user_id='u1', password='p1')
+        self.assertEqual(self.identity_api.get_user(
+            self.user_foo['id'])['name'], self.user_foo['name'])
+        self.assertIn('member',
+                      self.identity_api.get_roles_for_user_and_project(
+                          'u1', self.tenant_bar['id']))
+
+    def test_import_other_records(self):
+        report = self.importer.import_lines(jsonlines(
+            {'domain': {'id': 'd1', 'name': 'D1', 'enabled': True}},
+            {'role': {'id': 'r1', 'name': 'R1'}},
+            {'group': {'id': 'g1', 'name': 'g1'}},
+            {'membership': {'user_id': self.user_foo['id'],
+                            'group_id': 'g1'}},
+            {'membership': {'user_id': self.user_foo['id']}},
+            {'service': {'id': 's1', 'type': 'compute'}},
+            {'endpoint': {'id': 'e1', 'service_id': 's1',
+                          'interface': 'public',
+                          'url': 'http://localhost:8774'}}))
+
+        self.assertEqual(report.imported,
+                         counts(domain=1, role=1, group=1, membership=1,
+                                service=1, endpoint=1))
+        self.assertEqual([(error['line'], error['type'])
+                          for error in report.to_dict()['errors']],
+                         [(5, None)])
+        self.assertEqual(self.identity_api.get_domain('d1')['name'], 'D1')
+        self.assertEqual(self.identity_api.get_role('r1')['name'], 'R1')
+        self.assertEqual(
+            [user['id'] for user in
+             self.identity_api.list_users_in_group('g1')],
+            [self.user_foo['id']])
+        self.assertEqual(self.catalog_api.get_service('s1')['type'],
+                         'compute')
+        self.assertEqual(self.catalog_api.get_endpoint('e1')['service_id'],
+                         's1')
+
+    def export(self):
+        return [bulk_import.format_record(record_type, ref)
+                for record_type, ref in bulk_import.export_records(
+                    self.identity_api, self.assignment_api,
+                    self.catalog_api)]
+
+    def test_export(self):
+        self.importer.import_lines(jsonlines(
+            {'group': {'id': 'g1', 'name': 'g1'}},
+            {'membership': {'user_id': self.user_foo['id'],
+                            'group_id': 'g1'}}))
+
+        records = [bulk_import.parse_record(line) for line in self.export()]
+        record_types = [record_type for record_type, _ref in records]
+        self.assertEqual(record_types,
+                         sorted(record_types,
+                                key=bulk_import.RECORD_TYPES.index))
+        refs = dict(((record_type, ref.get('id')), ref)
+                    for record_type, ref in records)
+        self.assertEqual(refs[('project', 'bar')]['name'], 'BAR')
+        self.assertEqual(refs[('role', 'member')]['name'], 'Member')
+        self.assertIn(('domain', CONF.identity.default_domain_id), refs)
+        self.assertIn(('group', 'g1'), refs)
+        self.assertIn(('membership', None), refs)
+        self.assertIn({'role_id': CONF.member_role_id,
+                       'user_id': self.user_foo['id'],
+                       'project_id': self.tenant_bar['id']},
+                      [ref for record_type, ref in records
+                       if record_type == 'grant'])
+
+        user = refs[('user', self.user_foo['id'])]
+        self.assertEqual(user['email'], self.user_foo['email'])
+        self.assertNotIn('groups', user)
+        self.assertNotEqual(user['password'], self.user_foo['password'])
+
+    def test_export_round_trip(self):
+        self.importer.import_lines(jsonlines(
+            {'group': {'id': 'g1', 'name': 'g1'}},
+            {'membership': {'user_id': self.user_foo['id'],
+                            'group_id': 'g1'}},
+            {'service': {'id': 's1', 'type': 'compute'}},
+            {'endpoint': {'id': 'e1', 'service_id': 's1',
+                          'interface': 'public',
+                          'url': 'http://localhost:8774'}}))
+        lines = self.export()
+
+        self.clear_backends()
+        report = self.importer.import_lines(lines)
+        self.assertEqual(report.errors, [])
+        self.assertEqual(sum(report.imported.values()), len(lines))
+
+        self.assertEqual(sorted(jsonutils.loads(line)
+                                for line in self.export()),
+                         sorted(jsonutils.loads(line) for line in lines))
+        self.identity_api.authenticate(user_id=self.user_foo['id'],
+                                       password=self.user_foo['password'])
+
+
+class KvsBulkImport(BulkImportTests, test.TestCase):
+    def setUp(self):
+        super(KvsBulkImport, self).setUp()
+        self.load_backends()
+        self.load_fixtures(default_fixtures)
+        self.create_importer()
+
+    def clear_backends(self):
+        kvs.INMEMDB.clear()
+
+    def test_supports_bulk(self):
+        for record_type in bulk_import.RECORD_TYPES:
+            self.assertFalse(self.importer.supports_bulk(record_type))
+
+
+class SqlBulkImport(BulkImportTests, test.TestCase):
+    def setUp(self):
+        super(SqlBulkImport, self).setUp()
+        self.config([test.etcdir('keystone.conf.sample'),
+                     test.testsdir('test_overrides.conf'),
+                     test.testsdir('backend_sql.conf')])
+        self.load_backends()
+        self.engine = sql.Base().get_engine()
+        sql.ModelBase.metadata.create_all(bind=self.engine)
+        self.load_fixtures(default_fixtures)
+        self.create_importer()
+
+    def tearDown(self):
+        sql.ModelBase.metadata.drop_all(bind=self.engine)
+        self.engine.dispose()
+        sql.set_global_engine(None)
+        super(SqlBulkImport, self).tearDown()
+
+    def clear_backends(self):
+        sql.ModelBase.metadata.drop_all(bind=self.engine)
+        sql.ModelBase.metadata.create_all(bind=self.engine)
+
+    def test_supports_bulk(self):
+        for record_type in ['project', 'user', 'group', 'grant']:
+            self.assertTrue(self.importer.supports_bulk(record_type))
+        for record_type in ['domain', 'role', 'membership', 'service',
+                            'endpoint']:
+            self.assertFalse(self.importer.supports_bulk(record_type))
+
+    def test_passwords_hashed_once(self):
+        self.stubs.Set(utils, 'hash_user_passwords',
+                       self._count_hashes(utils.hash_user_passwords))
+        self.hashed = 0
+        report = self.importer.import_lines(jsonlines(
+            {'user': {'id': self.user_foo['id'], 'name': 'dup',
+                      'password': 'p1'}},
+            {'user': {'id': 'u2', 'name': 'u2', 'password': 'p2'}}))
+        self.assertEqual(report.imported['user'], 1)
+        self.assertEqual(self.hashed, 2)
+        self.identity_api.authenticate(user_id='u2', password='p2')
+
+    def _count_hashes(self, hash_user_passwords):
+        def counting(users):
+            self.hashed += len([user for user in users
+                                if not utils._identify(user['password'])])
+            return hash_user_passwords(users)
+        return counting
+
+    def test_endpoint(self):
+        controller = bulk_import.BulkImportController()
+        body = ''.join(jsonlines(
+            {'user': {'id': 'u1', 'name': 'u1'}},
+            {'user': {'name': ''}}))
+
+        req = webob.Request.blank('/OS-BULK/import', method='POST',
+                                  body=body)
+        req.environ[wsgi.CONTEXT_ENV] = {'is_admin': True}
+        resp = req.get_response(controller)
+        self.assertEqual(resp.status_int, 200)
+        report = jsonutils.loads(resp.body)['OS-BULK:import']
+        self.assertEqual(report['imported']['user'], 1)
+        self.assertEqual(len(report['errors']), 1)
+        self.identity_api.get_user('u1')
+
+        req = webob.Request.blank('/OS-BULK/import', method='POST',
+                                  body=body)
+        req.environ[wsgi.CONTEXT_ENV] = {'token_id': 'invalid'}
+        resp = req.get_response(controller)
+        self.assertEqual(resp.status_int, 401)
+
+    def test_body_read_line_by_line(self):
+        controller = bulk_import.BulkImportController()
+        report = controller.import_records(
+            {'is_admin': True},
+            StringIO.StringIO(''.join(jsonlines(
+                {'group': {'name': 'g1'}},
+                {'group': {'name': 'g2'}}))))
+        self.assertEqual(report['imported']['group'], 2)
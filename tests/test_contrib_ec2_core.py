@@ -0,0 +1,116 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import uuid
+
+from keystoneclient.contrib.ec2 import utils as ec2_utils
+
+from keystone import test
+
+from keystone.contrib import ec2
+
+from keystone import exception
+
+import default_fixtures
+
+
+class Ec2ContribCore(test.TestCase):
+    def setUp(self):
+        super(Ec2ContribCore, self).setUp()
+
+        self.load_backends()
+        self.load_fixtures(default_fixtures)
+
+        self.ec2_api = ec2.Manager()
+        self.controller = ec2.Ec2Controller()
+        ec2.AUTH_CACHE.reset()
+
+        self.creds_ref = {'user_id': self.user_foo['id'],
+                          'tenant_id': self.tenant_bar['id'],
+                          'access': uuid.uuid4().hex,
+                          'secret': uuid.uuid4().hex}
+        self.ec2_api.create_credential(self.creds_ref['access'],
+                                       self.creds_ref)
+
+    def tearDown(self):
+        ec2.AUTH_CACHE.reset()
+        super(Ec2ContribCore, self).tearDown()
+
+    def _signed_request(self):
+        credentials = {'access': self.creds_ref['access'],
+                       'host': 'localhost',
+                       'verb': 'GET',
+                       'path': '/',
+                       'params': {'SignatureVersion': '2',
+                                  'SignatureMethod': 'HmacSHA256',
+                                  'AWSAccessKeyId': self.creds_ref['access'],
+                                  'Action': uuid.uuid4().hex}}
+        signer = ec2_utils.Ec2Signer(self.creds_ref['secret'])
+        credentials['signature'] = signer.generate(credentials)
+        return credentials
+
+    def _authenticate(self, credentials=None):
+        r = self.controller.authenticate(
+            {}, credentials=credentials or self._signed_request())
+        return r['access']['token']['id']
+
+    def test_authenticate_creates_tokens(self):
+        self.assertNotEqual(self._authenticate(), self._authenticate())
+
+    def test_authenticate_reuses_token(self):
+        self.opt_in_group('ec2', cache_time=60)
+        token_id = self._authenticate()
+        self.assertEqual(token_id, self._authenticate())
+        self.token_api.get_token(token_id)
+
+    def test_authenticate_skips_revoked_token(self):
+        self.opt_in_group('ec2', cache_time=60)
+        token_id = self._authenticate()
+        self.token_api.delete_token(token_id)
+        self.assertNotEqual(token_id, self._authenticate())
+
+    def test_authenticate_new_token_for_other_roles(self):
+        self.opt_in_group('ec2', cache_time=60)
+        token_id = self._authenticate()
+        self.identity_api.add_role_to_user_and_project(
+            self.user_foo['id'], self.tenant_bar['id'], self.role_other['id'])
+        self.assertNotEqual(token_id, self._authenticate())
+
+    def test_authenticate_reuses_verified_signature(self):
+        self.opt_in_group('ec2', cache_time=60)
+        credentials = self._signed_request()
+        self._authenticate(dict(credentials))
+        self.controller._check_signature = None
+        self._authenticate(dict(credentials))
+
+    def test_authenticate_bad_signature(self):
+        self.opt_in_group('ec2', cache_time=60)
+        credentials = self._signed_request()
+        self._authenticate(dict(credentials))
+        credentials['signature'] = uuid.uuid4().hex
+        self.assertRaises(exception.Unauthorized,
+                          self._authenticate, credentials)
+
+    def test_delete_credential_invalidates_cache(self):
+        self.opt_in_group('ec2', cache_time=60)
+        self._authenticate()
+        self.controller.delete_credential(
+            {'is_admin': True}, self.user_foo['id'],
+            self.creds_ref['access'])
+        self.assertIsNone(
+            ec2.AUTH_CACHE.get_credential(self.creds_ref['access']))
+        self.assertRaises((exception.NotFound, exception.Unauthorized),
+                          self._authenticate)
@@ -0,0 +1,266 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import time
+import uuid
+
+from keystone.common import kvs
+from keystone.common import notifications
+from keystone.common import sql
+from keystone.common import utils
+from keystone import config
+from keystone.contrib import notifications as notifications_extension
+from keystone import exception
+from keystone import test
+
+import default_fixtures
+
+
+CONF = config.CONF
+
+
+class NotificationsBus(test.TestCase):
+    def setUp(self):
+        super(NotificationsBus, self).setUp()
+        notifications.reset()
+        self.received = []
+
+    def tearDown(self):
+        notifications.unregister_listener(self.received.append)
+        notifications.unregister_listener(self.received.append, 'project')
+        notifications.reset()
+        super(NotificationsBus, self).tearDown()
+
+    def test_listeners(self):
+        notifications.register_listener(self.received.append, 'project')
+        notifications.notify('user', notifications.CREATED, 'u1')
+        notifications.notify('project', notifications.DELETED, 'p1')
+        self.assertEqual([(e['type'], e['operation'], e['id'])
+                          for e in self.received],
+                         [('project', 'deleted', 'p1')])
+
+    def test_failing_listener(self):
+        def fail(event):
+            raise ValueError()
+
+        notifications.register_listener(fail)
+        notifications.register_listener(self.received.append)
+        try:
+            notifications.notify('user', notifications.CREATED, 'u1')
+        finally:
+            notifications.unregister_listener(fail)
+        self.assertEqual(len(self.received), 1)
+
+    def test_list_events(self):
+        notifications.notify('user', notifications.CREATED, 'u1')
+        notifications.notify('grant', notifications.CREATED, 'r1',
+                             user_id='u1', project_id='p1')
+        notifications.notify('user', notifications.DELETED, 'u1')
+
+        events, truncated = notifications.list_events()
+        self.assertEqual([e['seq'] for e in events], [1, 2, 3])
+        self.assertFalse(truncated)
+        self.assertEqual(events[1]['user_id'], 'u1')
+        self.assertEqual(events[1]['project_id'], 'p1')
+
+        events, truncated = notifications.list_events(1, ['user'])
+        self.assertEqual([e['seq'] for e in events], [3])
+        self.assertEqual(notifications.list_events(3), ([], False))
+
+    def test_buffer_size(self):
+        self.opt_in_group('notifications', buffer_size=2)
+        for i in range(4):
+            notifications.notify('user', notifications.CREATED, str(i))
+
+        events, truncated = notifications.list_events()
+        self.assertEqual([e['id'] for e in events], ['2', '3'])
+        self.assertTrue(truncated)
+        self.assertTrue(notifications.list_events(1)[1])
+        self.assertFalse(notifications.list_events(2)[1])
+
+    def test_wait_for_events(self):
+        start = time.time()
+        self.assertEqual(notifications.wait_for_events(wait=0.2), ([], False))
+        self.assertTrue(time.time() - start >= 0.2)
+
+        notifications.notify('user', notifications.CREATED, 'u1')
+        start = time.time()
+        events, truncated = notifications.wait_for_events(wait=10)
+        self.assertEqual(len(events), 1)
+        self.assertTrue(time.time() - start < 1)
+
+    def test_reset(self):
+        epoch = notifications.epoch()
+        notifications.notify('user', notifications.CREATED, 'u1')
+        notifications.reset()
+        self.assertNotEqual(notifications.epoch(), epoch)
+        self.assertEqual(notifications.list_events(), ([], False))
+        notifications.notify('user', notifications.CREATED, 'u2')
+        self.assertEqual(notifications.list_events()[0][0]['seq'], 1)
+
+
+class NotificationsTests(object):
+    def events(self, *resource_types):
+        return [dict((k, v) for k, v in event.iteritems()
+                     if k not in ('seq', 'time'))
+                for event in notifications.list_events(
+                    resource_types=resource_types)[0]]
+
+    def test_user_events(self):
+        user = {'id': uuid.uuid4().hex, 'name': uuid.uuid4().hex,
+                'domain_id': CONF.identity.default_domain_id,
+                'password': 'secret'}
+        self.identity_api.create_user(user['id'], user)
+        self.identity_api.update_user(user['id'], {'email': 'a@example.com'})
+        self.identity_api.delete_user(user['id'])
+        self.assertEqual(self.events(), [
+            {'type': 'user', 'operation': 'created', 'id': user['id'],
+             'user_id': user['id']},
+            {'type': 'user', 'operation': 'updated', 'id': user['id'],
+             'user_id': user['id']},
+            {'type': 'user', 'operation': 'deleted', 'id': user['id'],
+             'user_id': user['id']}])
+
+    def test_project_events(self):
+        project = {'id': uuid.uuid4().hex, 'name': uuid.uuid4().hex,
+                   'domain_id': CONF.identity.default_domain_id}
+        self.assignment_api.create_project(project['id'], project)
+        self.identity_api.update_project(project['id'], {'enabled': False})
+        self.assertEqual(
+            [(e['type'], e['operation'], e['id']) for e in self.events()],
+            [('project', 'created', project['id']),
+             ('project', 'updated', project['id'])])
+
+    def test_grant_events(self):
+        self.assignment_api.create_grant(self.role_admin['id'],
+                                         user_id=self.user_foo['id'],
+                                         project_id=self.tenant_bar['id'])
+        self.identity_api.add_role_to_user_and_project(
+            self.user_foo['id'], self.tenant_baz['id'], self.role_admin['id'])
+        # the KVS driver also updates the projects of the user
+        self.assertEqual(self.events('grant'), [
+            {'type': 'grant', 'operation': 'created',
+             'role_id': self.role_admin['id'],
+             'user_id': self.user_foo['id'],
+             'project_id': self.tenant_bar['id']},
+            {'type': 'grant', 'operation': 'created',
+             'role_id': self.role_admin['id'],
+             'user_id': self.user_foo['id'],
+             'project_id': self.tenant_baz['id']}])
+
+    def test_grant_events_have_no_id(self):
+        self.identity_api.add_user_to_project(self.tenant_baz['id'],
+                                              self.user_foo['id'])
+        group = {'id': uuid.uuid4().hex, 'name': uuid.uuid4().hex,
+                 'domain_id': CONF.identity.default_domain_id}
+        self.identity_api.create_group(group['id'], group)
+        self.identity_api.add_user_to_group(self.user_foo['id'], group['id'])
+        self.assertEqual(self.events('grant', 'group_membership'), [
+            {'type': 'grant', 'operation': 'created',
+             'user_id': self.user_foo['id'],
+             'project_id': self.tenant_baz['id']},
+            {'type': 'group_membership', 'operation': 'created',
+             'user_id': self.user_foo['id'], 'group_id': group['id']}])
+
+    def test_no_event_on_failure(self):
+        self.assertRaises(exception.ProjectNotFound,
+                          self.assignment_api.update_project,
+                          uuid.uuid4().hex, {'enabled': False})
+        self.assertEqual(self.events(), [])
+
+    def test_password_cache_invalidated(self):
+        self.opt_in_group('identity', password_cache_time=60)
+        self.identity_api.authenticate(user_id=self.user_foo['id'],
+                                       password=self.user_foo['password'])
+        self.assertIn(self.user_foo['id'], utils.PASSWORD_CACHE.entries)
+        self.identity_api.update_user(self.user_foo['id'],
+                                      {'password': uuid.uuid4().hex})
+        self.assertNotIn(self.user_foo['id'], utils.PASSWORD_CACHE.entries)
+
+    def test_list_events(self):
+        controller = notifications_extension.NotificationsController()
+        self.assignment_api.create_role('r1', {'id': 'r1', 'name': 'r1'})
+        context = {'is_admin': True, 'query_string': {}}
+        ref = controller.list_events(context)
+        self.assertEqual([e['id'] for e in ref['events']], ['r1'])
+        self.assertEqual(ref['next'], ref['events'][-1]['seq'])
+        self.assertFalse(ref['truncated'])
+
+        context['query_string'] = {'since': str(ref['next']),
+                                   'epoch': ref['epoch'],
+                                   'types': 'project,role'}
+        self.assignment_api.delete_role('r1')
+        next_ref = controller.list_events(context)
+        self.assertEqual([(e['id'], e['operation'])
+                          for e in next_ref['events']], [('r1', 'deleted')])
+
+        context['query_string']['epoch'] = uuid.uuid4().hex
+        stale_ref = controller.list_events(context)
+        self.assertTrue(stale_ref['truncated'])
+        self.assertEqual(len(stale_ref['events']), 2)
+
+        context['query_string'] = {'since': 'x'}
+        self.assertRaises(exception.ValidationError,
+                          controller.list_events, context)
+        self.assertRaises(exception.Unauthorized, controller.list_events,
+                          {'is_admin': False, 'token_id': 'invalid',
+                           'query_string': {}})
+
+
+class KvsNotifications(NotificationsTests, test.TestCase):
+    def setUp(self):
+        super(KvsNotifications, self).setUp()
+        self.load_backends()
+        self.load_fixtures(default_fixtures)
+        utils.PASSWORD_CACHE.reset()
+        notifications.reset()
+
+    def clear_backends(self):
+        kvs.INMEMDB.clear()
+
+
+class SqlNotifications(NotificationsTests, test.TestCase):
+    def setUp(self):
+        super(SqlNotifications, self).setUp()
+        self.config([test.etcdir('keystone.conf.sample'),
+                     test.testsdir('test_overrides.conf'),
+                     test.testsdir('backend_sql.conf')])
+        self.load_backends()
+        self.engine = sql.Base().get_engine()
+        sql.ModelBase.metadata.create_all(bind=self.engine)
+        self.load_fixtures(default_fixtures)
+        utils.PASSWORD_CACHE.reset()
+        notifications.reset()
+
+    def tearDown(self):
+        sql.ModelBase.metadata.drop_all(bind=self.engine)
+        self.engine.dispose()
+        sql.set_global_engine(None)
+        super(SqlNotifications, self).tearDown()
+
+    def clear_backends(self):
+        sql.ModelBase.metadata.drop_all(bind=self.engine)
+        sql.ModelBase.metadata.create_all(bind=self.engine)
+
+    def test_batch_events(self):
+        projects = [{'id': uuid.uuid4().hex, 'name': uuid.uuid4().hex,
+                     'domain_id': CONF.identity.default_domain_id}
+                    for i in range(2)]
+        self.identity_api.create_projects(projects)
+        self.assertEqual([(e['type'], e['id'], e['domain_id'])
+                          for e in self.events()],
+                         [('project', project['id'], project['domain_id'])
+                          for project in projects])
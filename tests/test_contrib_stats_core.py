@@ -14,6 +14,17 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import bisect
+import os
+import uuid
+
+import routes
+import webob
+
+from keystone.common import kvs
+from keystone.common import manager
+from keystone.common import sql
+from keystone.common import wsgi
 from keystone.contrib import stats
 
 from keystone import config
@@ -28,6 +39,11 @@ class StatsContribCore(test.TestCase):
         super(StatsContribCore, self).setUp()
         self.stats_middleware = stats.StatsMiddleware(None)
 
+    def tearDown(self):
+        manager.unregister_call_observer(stats.AGGREGATOR.record_call)
+        sql.unregister_pool_observer(stats.AGGREGATOR.record_pool_event)
+        super(StatsContribCore, self).tearDown()
+
     def test_admin_request(self):
         host_admin = "127.0.0.1:%s" % CONF.admin_port
         self.assertEqual("admin",
@@ -43,3 +59,136 @@ class StatsContribCore(test.TestCase):
         host_other = host_public + "1"
         self.assertEqual(host_other,
                          self.stats_middleware._resolve_api(host_other))
+
+    def test_increment_bounded_keeps_frequent_values(self):
+        counters = {}
+        for value in ['a', 'a', 'a', 'a', 'b', 'b', 'c', 'd']:
+            stats.increment_bounded(counters, value, 2)
+        self.assertEqual(len(counters), 2)
+        self.assertEqual(counters['a'], 4)
+        self.assertEqual(sum(counters.values()), 8)
+
+    def test_merge_stats(self):
+        merged = stats.merge_stats([
+            {'method': {'GET': 2}, 'remote_addr': {'10.0.0.1': 1}},
+            {'method': {'GET': 1, 'POST': 4},
+             'remote_addr': {'10.0.0.2': 3, '10.0.0.3': 2}},
+        ], 2)
+        self.assertEqual(merged['method'], {'GET': 3, 'POST': 4})
+        self.assertEqual(merged['remote_addr'],
+                         {'10.0.0.2': 3, '10.0.0.3': 2})
+
+    def test_route_template(self):
+        mapper = routes.Mapper()
+        mapper.connect('/tenants/{tenant_id}', controller=FakeApp())
+        app = stats.StatsMiddleware(wsgi.Router(mapper))
+        stats.AGGREGATOR.reset()
+
+        req = webob.Request.blank('/tenants/%s' % uuid.uuid4().hex)
+        req.environ['SCRIPT_NAME'] = '/v2.0'
+        req.get_response(app)
+        req = webob.Request.blank('/nowhere')
+        req.get_response(app)
+
+        counters = stats.AGGREGATOR.counters['localhost:80']
+        self.assertEqual(counters['route'],
+                         {'/v2.0/tenants/{tenant_id}': 1, '(unmatched)': 1})
+        self.assertNotIn('path', counters)
+        self.assertNotIn('path_qs', counters)
+
+    def test_flush_merges_worker_stats(self):
+        stats_api = stats.Manager()
+        stats_api.delete_stats('admin')
+        stats.AGGREGATOR.reset()
+
+        stats.AGGREGATOR.increment('admin', 'method', 'GET')
+        stats.AGGREGATOR.flush(stats_api)
+        stats.AGGREGATOR.flush(stats_api, force=True)
+        stats_api.flush_stats('admin', 'otherhost:1', {'method': {'GET': 2}})
+
+        self.assertNotIn('admin', stats.AGGREGATOR.counters)
+        worker_stats = stats_api.get_worker_stats('admin')
+        self.assertEqual(len(worker_stats), 2)
+        merged = stats.merge_stats(worker_stats, CONF.stats.max_tracked_values)
+        self.assertEqual(merged, {'method': {'GET': 3}})
+
+        stats_api.delete_stats('admin')
+        self.assertEqual(stats_api.get_worker_stats('admin'), [])
+
+    def test_delete_stats_persisted(self):
+        path = test.tmpdir('kvs-%s' % uuid.uuid4().hex)
+        self.opt_in_group('kvs', path=path)
+        try:
+            stats_api = stats.Manager()
+            stats_api.flush_stats('admin', 'host:1', {'method': {'GET': 1}})
+            stats_api.delete_stats('admin')
+
+            db = kvs.LogKvs(path)
+            try:
+                self.assertEqual(db.keys(), [])
+            finally:
+                db.close()
+        finally:
+            kvs._LOGDBS.pop(path).close()
+            os.remove(path)
+            os.remove(path + '.lock')
+
+    def test_summarize_latency(self):
+        histogram = {}
+        for elapsed in [0.0004] * 90 + [0.008] * 8 + [0.6, 40]:
+            bucket = bisect.bisect_left(stats.LATENCY_BUCKETS, elapsed * 1000)
+            histogram[bucket] = histogram.get(bucket, 0) + 1
+        self.assertEqual(stats.summarize_latency(histogram),
+                         {'count': 100, 'p50': 0.5, 'p95': 10, 'p99': 750})
+
+    def test_route_latency(self):
+        mapper = routes.Mapper()
+        mapper.connect('/tenants/{tenant_id}', controller=FakeApp())
+        app = stats.StatsMiddleware(wsgi.Router(mapper))
+        stats.AGGREGATOR.reset()
+
+        req = webob.Request.blank('/tenants/%s' % uuid.uuid4().hex)
+        req.get_response(app)
+        req.get_response(app)
+
+        histogram = stats.AGGREGATOR.counters['localhost:80'][
+            stats.LATENCY_PREFIX + 'GET /tenants/{tenant_id}']
+        self.assertEqual(sum(histogram.values()), 2)
+
+    def test_backend_call_latency(self):
+        stats.StatsMiddleware(None)
+        stats.AGGREGATOR.reset()
+
+        stats_api = stats.Manager()
+        stats_api.get_worker_stats('admin')
+        stats_api.get_worker_stats('admin')
+
+        name = (stats.LATENCY_PREFIX +
+                'keystone.contrib.stats.backends.kvs.Stats.get_worker_stats')
+        histogram = stats.AGGREGATOR.counters[stats.BACKEND_API][name]
+        self.assertEqual(sum(histogram.values()), 2)
+
+    def test_sql_pool_events(self):
+        stats.StatsMiddleware(None)
+        stats.AGGREGATOR.reset()
+
+        sql.core._notify_pool_observers('read', 'checkouts', 0.002)
+        sql.core._notify_pool_observers('read', 'overflow_checkouts')
+
+        counters = stats.AGGREGATOR.counters[stats.SQL_API]
+        self.assertEqual(counters['checkouts'], {'read': 1})
+        self.assertEqual(counters['overflow_checkouts'], {'read': 1})
+        histogram = counters[stats.LATENCY_PREFIX + 'read checkouts']
+        self.assertEqual(sum(histogram.values()), 1)
+
+    def test_latency_not_truncated(self):
+        histogram = dict((bucket, 1) for bucket in range(10))
+        merged = stats.merge_stats(
+            [{stats.LATENCY_PREFIX + 'GET /': histogram}], 2)
+        self.assertEqual(merged[stats.LATENCY_PREFIX + 'GET /'], histogram)
+
+
+class FakeApp(wsgi.Application):
+    def __call__(self, environ, start_response):
+        start_response('200 OK', [])
+        return ['']
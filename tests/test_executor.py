@@ -0,0 +1,119 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import os
+
+import eventlet
+
+from keystone.common import executor
+from keystone.common import utils
+from keystone import exception
+from keystone import test
+
+
+def fail(message):
+    raise ValueError(message)
+
+
+def is_open(fd):
+    try:
+        os.fstat(fd)
+    except OSError:
+        return False
+    return True
+
+
+class ExecutorTest(test.TestCase):
+    def setUp(self):
+        super(ExecutorTest, self).setUp()
+        executor.reset_executor()
+
+    def tearDown(self):
+        executor.reset_executor()
+        super(ExecutorTest, self).tearDown()
+
+    def test_inline(self):
+        self.opt(crypt_executor='inline')
+        self.assertIsInstance(executor.get_executor().executor,
+                              executor.InlineExecutor)
+        self.assertEqual(executor.execute(os.getpid), os.getpid())
+
+    def test_default(self):
+        self.assertIsInstance(executor.get_executor().executor,
+                              executor.ThreadExecutor)
+
+    def test_thread(self):
+        self.opt(crypt_executor='thread')
+        self.assertEqual(executor.execute(max, 1, 2), 2)
+        self.assertRaises(ValueError, executor.execute, fail, 'thread')
+
+    def test_process(self):
+        self.opt(crypt_executor='process', crypt_workers=2)
+        self.assertEqual(len(executor.get_executor().executor.helpers), 2)
+        self.assertNotEqual(executor.execute(os.getpid), os.getpid())
+        self.assertEqual(executor.execute(max, 1, 2), 2)
+        self.assertRaises(ValueError, executor.execute, fail, 'process')
+
+    def test_process_closes_inherited_fds(self):
+        self.opt(crypt_executor='process', crypt_workers=1)
+        with open(os.devnull) as f:
+            self.assertTrue(is_open(f.fileno()))
+            self.assertFalse(executor.execute(is_open, f.fileno()))
+
+    def test_process_hashes_passwords(self):
+        self.opt(crypt_executor='process', crypt_workers=1)
+        hashed = utils.hash_password('secret')
+        self.assertTrue(utils.check_password('secret', hashed))
+        self.assertFalse(utils.check_password('wrong', hashed))
+
+    def test_map(self):
+        for kind in ['inline', 'thread', 'process']:
+            executor.reset_executor()
+            self.opt(crypt_executor=kind, crypt_workers=2)
+            self.assertEqual(executor.map(max, [(1, 2), (4, 3), (5, 6)]),
+                             [2, 4, 6])
+            self.assertEqual(executor.map(max, []), [])
+
+    def test_pool_map(self):
+        # keystone-manage runs without eventlet
+        self.stubs.Set(executor.environment, 'Server', None)
+        self.opt(crypt_executor='process', crypt_workers=2)
+        pool = executor.get_executor().executor
+        self.assertIsInstance(pool, executor.PoolExecutor)
+        self.assertEqual(executor.execute(os.getpid), os.getpid())
+        # a single call doesn't start the pool, which would block the
+        # eventlet hub of the tests
+        self.assertEqual(executor.map(max, [(1, 2)]), [2])
+        self.assertIsNone(pool.pool)
+
+    def test_max_pending(self):
+        self.opt(crypt_executor='thread', crypt_max_pending=1)
+        started = eventlet.event.Event()
+        release = eventlet.event.Event()
+
+        def blocking():
+            started.send()
+            release.wait()
+
+        bounded = executor.get_executor()
+        self.stubs.Set(bounded, 'executor', executor.InlineExecutor())
+        thread = eventlet.spawn(bounded.execute, blocking)
+        started.wait()
+        self.assertRaises(exception.ServiceUnavailable,
+                          bounded.execute, max, 1, 2)
+        release.send()
+        thread.wait()
+        self.assertEqual(bounded.execute(max, 1, 2), 2)
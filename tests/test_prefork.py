@@ -0,0 +1,132 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import os
+import signal
+
+from keystone.common import environment
+from keystone.common.environment import prefork
+from keystone.common import sql
+from keystone import test
+
+
+class FakeServer(object):
+    def __init__(self):
+        self.listening = False
+
+    def listen(self):
+        self.listening = True
+
+
+class MasterTest(test.TestCase):
+    def setUp(self):
+        super(MasterTest, self).setUp()
+        self.pids = iter(range(100, 200))
+        self.killed = []
+        self.exited = []
+        self.stubs.Set(os, 'fork', lambda: self.pids.next())
+        self.stubs.Set(os, 'kill',
+                       lambda pid, signo: self.killed.append((pid, signo)))
+        self.stubs.Set(os, 'waitpid', self._waitpid)
+        self.stubs.Set(signal, 'signal', lambda signo, handler: None)
+        self.stubs.Set(prefork, 'POLL_INTERVAL', 0.01)
+        self.reloaded = []
+
+        self.master = prefork.Master(
+            shutdown_timeout=0,
+            reload_config=lambda: self.reloaded.append(True))
+        self.admin = FakeServer()
+        self.main = FakeServer()
+        self.master.add_service('admin', self.admin, None, 1)
+        self.master.add_service('main', self.main, None, 2)
+
+    def _waitpid(self, pid, options):
+        if self.exited:
+            return self.exited.pop(0), 0
+        return 0, 0
+
+    def test_start_spawns_workers(self):
+        self.master.start()
+        self.assertTrue(self.admin.listening)
+        self.assertTrue(self.main.listening)
+        self.assertEqual(sorted(self.master.children), [100, 101, 102])
+        self.assertEqual(self.master.children[100][0].name, 'admin')
+        self.assertEqual(self.master.children[102][0].name, 'main')
+
+    def test_exited_worker_is_replaced(self):
+        self.master.start()
+        self.exited.append(101)
+        self.master._reap()
+        self.assertEqual(sorted(self.master.children), [100, 102, 103])
+        self.assertEqual(self.master.children[103][0].name, 'main')
+
+    def test_reload_replaces_workers(self):
+        self.master.start()
+        self.master.reload()
+        self.assertEqual(self.reloaded, [True])
+        self.assertEqual(sorted(self.killed),
+                         [(pid, signal.SIGTERM) for pid in (100, 101, 102)])
+        self.assertEqual(len(self.master.children), 6)
+
+        # the old workers are not replaced once they have exited
+        self.exited.extend([100, 101, 102])
+        self.master._reap()
+        self.assertEqual(sorted(self.master.children), [103, 104, 105])
+
+    def test_stop(self):
+        self.master.start()
+        self.exited.extend([100, 101])
+        self.master.stop()
+        self.assertEqual(self.master.children, {})
+        self.assertIn((100, signal.SIGTERM), self.killed)
+        # the worker which didn't exit within the timeout is killed
+        self.assertIn((102, signal.SIGKILL), self.killed)
+
+    def test_wait_stops_on_sigterm(self):
+        self.master.start()
+        self.master._handle_signal(signal.SIGHUP, None)
+        self.master._handle_signal(signal.SIGTERM, None)
+        self.exited.extend(range(100, 106))
+        self.master.wait()
+        self.assertEqual(self.reloaded, [True])
+        self.assertEqual(self.master.children, {})
+
+
+class ForkCallbacksTest(test.TestCase):
+    def test_run_fork_callbacks(self):
+        calls = []
+
+        def callback():
+            calls.append(True)
+
+        def failing_callback():
+            raise Exception()
+
+        self.stubs.Set(environment, '_fork_callbacks', [])
+        environment.register_fork_callback(failing_callback)
+        environment.register_fork_callback(callback)
+        environment.register_fork_callback(callback)
+        environment.run_fork_callbacks()
+        self.assertEqual(calls, [True])
+
+    def test_sql_engine_pool_is_recreated(self):
+        self.opt_in_group('sql', connection='sqlite://')
+        engine = sql.Base().get_engine()
+        pool = engine.pool
+        self.assertIn(sql.core.recreate_global_engine_pool,
+                      environment._fork_callbacks)
+        sql.core.recreate_global_engine_pool()
+        self.assertIsNot(engine.pool, pool)
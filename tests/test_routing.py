@@ -0,0 +1,93 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import re
+
+import routes
+import webob
+
+from keystone.common import routing
+from keystone.common import wsgi
+from keystone import test
+
+
+METHODS = ['GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE']
+VALUES = ['abc', u'caf\xe9'.encode('utf-8'), 'a.b', 'a:b', '']
+
+
+def sample_paths(route):
+    """Generates paths around the one described by a route."""
+    template = re.sub(r'\{[^}]*\}', '%(value)s', route.routepath)
+    for value in VALUES:
+        path = template % {'value': value}
+        for suffix in ['', '/', '/extra', '.json']:
+            yield path + suffix
+
+
+class RouteTableTest(test.TestCase):
+    def assertSameMatches(self, mapper, paths):
+        table = routing.RouteTable(mapper)
+        for path in paths:
+            for method in METHODS:
+                environ = {'PATH_INFO': path, 'REQUEST_METHOD': method}
+                self.assertEqual(table.routematch(dict(environ)),
+                                 mapper.routematch(environ=dict(environ)),
+                                 '%s %s' % (method, path))
+
+    def test_full_route_set(self):
+        mappers = []
+        for name in ['main', 'admin']:
+            mappers.extend(routing.find_mappers(self.loadapp('keystone',
+                                                             name=name)))
+        self.assertTrue(len(mappers) > 5)
+
+        for mapper in mappers:
+            paths = set(['/', '', '//', '/nowhere'])
+            for route in mapper.matchlist:
+                paths.update(sample_paths(route))
+            self.assertSameMatches(mapper, paths)
+
+    def test_regexp_routes_keep_their_order(self):
+        app = object()
+        mapper = routes.Mapper()
+        mapper.connect('/users/{user_id:[0-9]+}', controller=app,
+                       action='numeric')
+        mapper.connect('/users/{user_id}', controller=app, action='any')
+        mapper.connect('/users/{user_id}.{format}', controller=app,
+                       action='format')
+        mapper.connect('{path_info:.*}', controller=app)
+        self.assertSameMatches(mapper, ['/users/1', '/users/a', '/users/a.b',
+                                        '/users', '/other/path'])
+
+    def test_middleware_routing_args(self):
+        def app(environ, start_response):
+            start_response('200 OK', [])
+            return [repr(environ['wsgiorg.routing_args'][1])]
+
+        mapper = routes.Mapper()
+        mapper.connect('/users/{user_id}', controller=app, action='get_user',
+                       conditions=dict(method=['GET']))
+        middleware = routing.make_routing_middleware(wsgi.Router._dispatch,
+                                                     mapper)
+        self.assertIsInstance(middleware, routing.RoutingMiddleware)
+
+        resp = webob.Request.blank('/users/abc').get_response(middleware)
+        self.assertIn("'user_id': u'abc'", resp.body)
+        self.assertIn("'action': u'get_user'", resp.body)
+
+        resp = webob.Request.blank('/users/abc?_method=DELETE').get_response(
+            middleware)
+        self.assertEqual(resp.status_int, 404)
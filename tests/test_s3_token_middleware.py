@@ -211,3 +211,61 @@ class S3TokenMiddlewareTestBad(S3TokenMiddlewareTestBase):
         s3_invalid_req = self.middleware.deny_request('InvalidURI')
         self.assertEqual(resp.body, s3_invalid_req.body)
         self.assertEqual(resp.status_int, s3_invalid_req.status_int)
+
+
+class S3TokenMiddlewareTestPool(S3TokenMiddlewareTestBase):
+    def setUp(self):
+        super(S3TokenMiddlewareTestPool, self).setUp()
+        self.requests = []
+        self.connections = []
+        test = self
+
+        class CountingHTTPConnection(FakeHTTPConnection):
+            def __init__(self, *args):
+                test.connections.append(self)
+
+            def request(self, method, path, **kwargs):
+                test.requests.append(path)
+                good_request(self, method, path, **kwargs)
+
+        self.connection_class = CountingHTTPConnection
+
+    def _middleware(self, **conf):
+        middleware = s3_token.S3Token(FakeApp(), conf)
+        middleware.http_client_class = self.connection_class
+        return middleware
+
+    def _authorized_request(self, middleware, signature='signature'):
+        req = webob.Request.blank('/v1/AUTH_cfa/c/o')
+        req.headers['Authorization'] = 'access:%s' % signature
+        req.headers['X-Storage-Token'] = 'token'
+        req.get_response(middleware)
+        self.assertEqual(req.headers['X-Auth-Token'], 'TOKEN_ID')
+
+    def test_connection_reused(self):
+        middleware = self._middleware(http_timeout='2.5')
+        self._authorized_request(middleware)
+        self._authorized_request(middleware)
+        self.assertEqual(len(self.requests), 2)
+        self.assertEqual(len(self.connections), 1)
+        self.assertEqual(self.connections[0].timeout, 2.5)
+
+    def test_retry_on_new_connection(self):
+        middleware = self._middleware()
+        self._authorized_request(middleware)
+
+        def broken_request(self, method, path, **kwargs):
+            self.request = None
+            raise IOError('connection reset')
+        self.connections[0].request = broken_request.__get__(
+            self.connections[0])
+        self._authorized_request(middleware)
+        self.assertEqual(len(self.connections), 2)
+
+    def test_cache_time(self):
+        middleware = self._middleware(cache_time='60')
+        self._authorized_request(middleware)
+        self._authorized_request(middleware)
+        self.assertEqual(len(self.requests), 1)
+        self._authorized_request(middleware, signature='other')
+        self.assertEqual(len(self.requests), 2)
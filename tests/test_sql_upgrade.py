@@ -26,6 +26,7 @@ To run these tests against a live database:
     all data will be lost.
 """
 import copy
+import datetime
 import json
 import uuid
 
@@ -824,6 +825,118 @@ class SqlUpgradeTests(test.TestCase):
         self.assertEqual(ref.legacy_endpoint_id, legacy_endpoint_id)
         self.assertEqual(ref.extra, '{}')
 
+    def test_upgrade_token_scope(self):
+        session = self.Session()
+        self.upgrade(27)
+
+        project_id = uuid.uuid4().hex
+        domain_id = uuid.uuid4().hex
+        expires = datetime.datetime.utcnow() + datetime.timedelta(days=1)
+        project_token = {
+            'id': uuid.uuid4().hex,
+            'expires': expires,
+            'valid': True,
+            'user_id': uuid.uuid4().hex,
+            'extra': json.dumps({'tenant': {'id': project_id}})}
+        domain_token = {
+            'id': uuid.uuid4().hex,
+            'expires': expires,
+            'valid': True,
+            'user_id': uuid.uuid4().hex,
+            'extra': json.dumps({
+                'token_data': {'token': {'domain': {'id': domain_id}}}})}
+        self.insert_dict(session, 'token', project_token)
+        self.insert_dict(session, 'token', domain_token)
+        session.commit()
+
+        self.upgrade(28)
+        self.assertTableColumns("token",
+                                ["id", "expires", "extra", "valid",
+                                 "trust_id", "user_id",
+                                 "tenant_id", "domain_id"])
+        token_table = sqlalchemy.Table('token', self.metadata, autoload=True)
+        ref = session.query(token_table).filter_by(
+            id=project_token['id']).one()
+        self.assertEqual(ref.tenant_id, project_id)
+        self.assertIsNone(ref.domain_id)
+        ref = session.query(token_table).filter_by(
+            id=domain_token['id']).one()
+        self.assertIsNone(ref.tenant_id)
+        self.assertEqual(ref.domain_id, domain_id)
+        session.commit()
+
+        self.downgrade(27)
+        self.assertTableColumns("token",
+                                ["id", "expires", "extra", "valid",
+                                 "trust_id", "user_id"])
+
+    def test_upgrade_token_record(self):
+        self.upgrade(30)
+        self.assertTableColumns("token",
+                                ["id", "expires", "extra", "valid",
+                                 "trust_id", "user_id",
+                                 "tenant_id", "domain_id",
+                                 "record", "catalog_id"])
+        self.assertTableColumns("token_catalog", ["id", "record"])
+
+        session = self.Session()
+        expires = datetime.datetime.utcnow() + datetime.timedelta(days=1)
+        legacy_token = {
+            'id': uuid.uuid4().hex,
+            'expires': expires,
+            'valid': True,
+            'user_id': uuid.uuid4().hex,
+            'extra': json.dumps({})}
+        record_token = dict(legacy_token, id=uuid.uuid4().hex, record='B')
+        self.insert_dict(session, 'token', legacy_token)
+        self.insert_dict(session, 'token', record_token)
+        session.commit()
+
+        self.downgrade(29)
+        self.assertTableColumns("token",
+                                ["id", "expires", "extra", "valid",
+                                 "trust_id", "user_id",
+                                 "tenant_id", "domain_id"])
+        self.assertTableDoesNotExist('token_catalog')
+        token_table = sqlalchemy.Table('token', self.metadata, autoload=True)
+        self.assertEqual([ref.id for ref in session.query(token_table)],
+                         [legacy_token['id']])
+        session.close()
+
+    def test_upgrade_revocation_event(self):
+        self.upgrade(31)
+        self.assertTableColumns("revocation_event",
+                                ["seq", "token_id", "user_id", "project_id",
+                                 "trust_id", "expires"])
+        self.downgrade(30)
+        self.assertTableDoesNotExist('revocation_event')
+
+    def test_upgrade_revocation_sequence(self):
+        self.upgrade(31)
+        session = self.Session()
+        event_table = sqlalchemy.Table('revocation_event', self.metadata,
+                                       autoload=True)
+        session.execute(event_table.insert().values(seq=7, token_id='t1'))
+        session.commit()
+        session.close()
+        self.upgrade(32)
+        self.assertTableColumns('revocation_sequence', ['id', 'value'])
+        sequence_table = sqlalchemy.Table('revocation_sequence',
+                                          self.metadata, autoload=True)
+        session = self.Session()
+        self.assertEqual(
+            session.execute(sequence_table.select()).fetchall(), [(1, 7)])
+        session.close()
+        self.downgrade(31)
+        self.assertTableDoesNotExist('revocation_sequence')
+
+    def test_upgrade_token_catalog_last_used(self):
+        self.upgrade(33)
+        self.assertTableColumns('token_catalog',
+                                ['id', 'record', 'last_used'])
+        self.downgrade(32)
+        self.assertTableColumns('token_catalog', ['id', 'record'])
+
     def populate_user_table(self, with_pass_enab=False,
                             with_pass_enab_domain=False):
         # Populate the appropriate fields in the user
@@ -0,0 +1,107 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import datetime
+
+from keystone.openstack.common import timeutils
+from keystone import test
+from keystone.token import codec
+
+
+VALUE = {'id': 'e3b0c44298fc1c149afbf4c8996fb924',
+         'expires': datetime.datetime(2013, 7, 1, 12, 30, 15, 250),
+         'user': {'id': u'u\xe9', 'name': 'foo', 'enabled': True},
+         'tenant': None,
+         'roles': [u'admin', u'member', u'admin'],
+         'metadata': {'count': -3, 'big': 2 ** 40, 'ratio': 0.25,
+                      'missing': False},
+         'token_data': {'token': {'catalog': [{'type': 'identity',
+                                               'endpoints': []}]}}}
+
+
+class CodecTests(object):
+    def test_round_trip(self):
+        self.assertEqual(codec.decode(codec.encode(VALUE)), VALUE)
+
+    def test_aware_datetime(self):
+        value = timeutils.parse_isotime('2013-07-01T14:30:15.000250+02:00')
+        self.assertEqual(codec.decode(codec.encode(value)),
+                         datetime.datetime(2013, 7, 1, 12, 30, 15, 250))
+
+    def test_marker(self):
+        self.assertEqual(codec.encode(VALUE)[0], self.marker)
+
+    def test_compression(self):
+        self.opt_in_group('token', compression=6)
+        record = codec.encode([VALUE] * 10)
+        self.assertEqual(record[0], codec.COMPRESSED)
+        self.assertEqual(codec.decode(record), [VALUE] * 10)
+
+    def test_compression_skipped_when_larger(self):
+        self.opt_in_group('token', compression=6)
+        self.assertNotEqual(codec.encode(None)[0], codec.COMPRESSED)
+
+    def test_decodes_other_codec(self):
+        record = codec.encode(VALUE)
+        self.opt_in_group('token', codec=self.other_codec)
+        self.assertEqual(codec.decode(record), VALUE)
+
+    def test_intern_catalog(self):
+        record, catalog_id, catalog = codec.encode_token(VALUE)
+        self.assertIsNotNone(catalog_id)
+        token = codec.decode(record)['token_data']['token']
+        self.assertNotIn('catalog', token)
+        self.assertEqual(codec.encode_token(dict(VALUE))[1], catalog_id)
+
+        def get_catalog(requested_id):
+            self.assertEqual(requested_id, catalog_id)
+            return catalog
+
+        self.assertEqual(codec.decode_token(record, get_catalog), VALUE)
+
+    def test_intern_catalog_disabled(self):
+        self.opt_in_group('token', intern_catalog=False)
+        record, catalog_id, catalog = codec.encode_token(VALUE)
+        self.assertIsNone(catalog_id)
+        self.assertIsNone(catalog)
+        self.assertEqual(codec.decode_token(record, None), VALUE)
+
+
+class JsonCodec(test.TestCase, CodecTests):
+    marker = 'J'
+    other_codec = 'keystone.token.codec.BinaryCodec'
+
+    def setUp(self):
+        super(JsonCodec, self).setUp()
+        self.opt_in_group('token', codec='keystone.token.codec.JsonCodec')
+
+
+class BinaryCodec(test.TestCase, CodecTests):
+    marker = 'B'
+    other_codec = 'keystone.token.codec.JsonCodec'
+
+    def setUp(self):
+        super(BinaryCodec, self).setUp()
+        self.opt_in_group('token', codec='keystone.token.codec.BinaryCodec')
+
+    def test_strings_interned(self):
+        once = len(codec.encode(['a' * 32]))
+        self.assertLess(len(codec.encode(['a' * 32] * 2)), once + 4)
+
+    def test_str_kept_apart_from_unicode(self):
+        value = codec.decode(codec.encode(['abc', u'abc']))
+        self.assertIsInstance(value[0], str)
+        self.assertIsInstance(value[1], unicode)
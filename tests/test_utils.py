@@ -32,6 +32,7 @@
 from keystone import test
 
 from keystone.common import utils
+from keystone import exception
 
 
 class UtilsTestCase(test.TestCase):
@@ -64,3 +65,160 @@ class UtilsTestCase(test.TestCase):
         self.assertFalse(utils.auth_str_equal('a', 'aaaaa'))
         self.assertFalse(utils.auth_str_equal('aaaaa', 'a'))
         self.assertFalse(utils.auth_str_equal('ABC123', 'abc123'))
+
+    def test_poll(self):
+        results = [[], [], ['x']]
+        sleeps = []
+        self.stubs.Set(utils.time, 'sleep', sleeps.append)
+        self.assertEqual(utils.poll(lambda: results.pop(0), 10, 2), ['x'])
+        self.assertEqual(sleeps, [2, 2])
+
+    def test_poll_deadline(self):
+        self.assertEqual(utils.poll(lambda: (0, None), 0, 1, ready=any),
+                         (0, None))
+
+
+class VerifiedPasswordCacheTestCase(test.TestCase):
+    def setUp(self):
+        super(VerifiedPasswordCacheTestCase, self).setUp()
+        self.opt_in_group('identity', password_cache_time=60)
+        utils.PASSWORD_CACHE.reset()
+        self.hashed = utils.hash_password('secret')
+
+        self.checks = []
+        check_password = utils.check_password
+
+        def counting_check_password(password, hashed):
+            self.checks.append(password)
+            return check_password(password, hashed)
+
+        self.stubs.Set(utils, 'check_password', counting_check_password)
+
+    def tearDown(self):
+        utils.PASSWORD_CACHE.reset()
+        super(VerifiedPasswordCacheTestCase, self).tearDown()
+
+    def test_repeated_check_is_cached(self):
+        self.assertTrue(utils.check_user_password('u', 'secret', self.hashed))
+        self.assertTrue(utils.check_user_password('u', 'secret', self.hashed))
+        self.assertEqual(self.checks, ['secret'])
+
+    def test_wrong_password_is_checked(self):
+        self.assertTrue(utils.check_user_password('u', 'secret', self.hashed))
+        self.assertFalse(utils.check_user_password('u', 'wrong', self.hashed))
+        self.assertFalse(utils.check_user_password('u', None, self.hashed))
+        self.assertEqual(self.checks, ['secret', 'wrong'])
+
+    def test_changed_hash_is_checked(self):
+        self.assertTrue(utils.check_user_password('u', 'secret', self.hashed))
+        other_hashed = utils.hash_password('other')
+        self.assertFalse(utils.check_user_password('u', 'secret',
+                                                   other_hashed))
+        self.assertEqual(self.checks, ['secret', 'secret'])
+
+    def test_expiry(self):
+        self.assertTrue(utils.check_user_password('u', 'secret', self.hashed))
+        digest, hashed, expires = utils.PASSWORD_CACHE.entries['u']
+        utils.PASSWORD_CACHE.entries['u'] = (digest, hashed, expires - 61)
+        self.assertTrue(utils.check_user_password('u', 'secret', self.hashed))
+        self.assertEqual(self.checks, ['secret', 'secret'])
+
+    def test_size_is_bounded(self):
+        self.opt_in_group('identity', password_cache_size=2)
+        for user_id in ['a', 'b', 'c']:
+            utils.check_user_password(user_id, 'secret', self.hashed)
+        self.assertEqual(len(utils.PASSWORD_CACHE.entries), 2)
+
+    def test_disabled(self):
+        self.opt_in_group('identity', password_cache_time=0)
+        self.assertTrue(utils.check_user_password('u', 'secret', self.hashed))
+        self.assertTrue(utils.check_user_password('u', 'secret', self.hashed))
+        self.assertEqual(len(self.checks), 2)
+
+
+class PasswordHashTiersTestCase(test.TestCase):
+    def setUp(self):
+        super(PasswordHashTiersTestCase, self).setUp()
+        self.opt_in_group('identity',
+                          password_hash_tiers=['service:sha512_crypt:1001',
+                                               'human:pbkdf2_sha512:2000'],
+                          password_hash_domain_tiers=['people:human'])
+
+    def test_tiers(self):
+        self.assertEqual(utils.password_hash_tiers(),
+                         {'default': ('sha512_crypt', 1000),
+                          'service': ('sha512_crypt', 1001),
+                          'human': ('pbkdf2_sha512', 2000)})
+
+    def test_tiers_parsed_once(self):
+        tiers = utils.password_hash_tiers()
+        self.assertIs(utils.password_hash_tiers(), tiers)
+        self.opt_in_group('identity',
+                          password_hash_tiers=['service:sha512_crypt:1002'])
+        self.assertEqual(utils.password_hash_tiers()['service'],
+                         ('sha512_crypt', 1002))
+
+    def test_invalid_tiers(self):
+        for tier in ['service', 'a:sha512_crypt:many', 'a:nothing:1',
+                     'a:md5_crypt:1']:
+            self.opt_in_group('identity', password_hash_tiers=[tier])
+            self.assertRaises(exception.UnexpectedError,
+                              utils.password_hash_tiers)
+
+    def test_password_tier(self):
+        self.assertEqual(utils.password_tier({'domain_id': 'default'}),
+                         'default')
+        self.assertEqual(utils.password_tier({'domain_id': 'people'}),
+                         'human')
+        self.assertEqual(utils.password_tier(
+            {'domain_id': 'people', 'password_hash_tier': 'service'}),
+            'service')
+        self.assertEqual(utils.password_tier(
+            {'extra': {'password_hash_tier': 'service'}}), 'service')
+        self.assertEqual(utils.password_tier({'password_hash_tier': 'nope'}),
+                         'default')
+
+    def test_hash_per_tier(self):
+        hashed = utils.hash_password('secret', 'human')
+        self.assertTrue(hashed.startswith('$pbkdf2-sha512$2000$'))
+        self.assertTrue(utils.check_password('secret', hashed))
+        self.assertFalse(utils.check_password('wrong', hashed))
+        # an existing hash of a configured scheme is kept as is
+        self.assertEqual(utils.hash_password(hashed), hashed)
+
+        hashed = utils.hash_user_password({'password': 'secret',
+                                           'domain_id': 'people'})['password']
+        self.assertTrue(hashed.startswith('$pbkdf2-sha512$2000$'))
+
+    def test_hash_user_passwords(self):
+        hashed = utils.hash_password('other', 'human')
+        users = [{'name': 'a', 'password': 'secret', 'domain_id': 'people'},
+                 {'name': 'b'},
+                 {'name': 'c', 'password': hashed}]
+        hashed_users = utils.hash_user_passwords(users)
+        self.assertEqual(users[0]['password'], 'secret')
+        self.assertTrue(hashed_users[0]['password'].startswith(
+            '$pbkdf2-sha512$2000$'))
+        self.assertTrue(utils.check_password(
+            'secret', hashed_users[0]['password']))
+        self.assertNotIn('password', hashed_users[1])
+        self.assertEqual(hashed_users[2]['password'], hashed)
+
+    def test_needs_rehash(self):
+        user = {'password': utils.hash_password('secret'),
+                'domain_id': 'default'}
+        self.assertFalse(utils.password_needs_rehash(user))
+        user['password_hash_tier'] = 'service'
+        self.assertTrue(utils.password_needs_rehash(user))
+        user['password_hash_tier'] = 'human'
+        self.assertTrue(utils.password_needs_rehash(user))
+        user['password'] = utils.hash_password('secret', 'human')
+        self.assertFalse(utils.password_needs_rehash(user))
+
+        self.opt_in_group('identity', password_rehash_on_login=False)
+        user['password_hash_tier'] = 'service'
+        self.assertFalse(utils.password_needs_rehash(user))
+
+    def test_no_rehash_of_unknown_hashes(self):
+        self.assertFalse(utils.password_needs_rehash({'password': None}))
+        self.assertFalse(utils.password_needs_rehash({'password': 'plain'}))
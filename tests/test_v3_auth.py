@@ -332,6 +332,9 @@ class TestPKITokenAPIs(test_v3.RestfulTestCase):
         r = self.get('/auth/tokens/OS-PKI/revoked')
         self.assertIn('signed', r.result)
 
+        r = self.get('/auth/tokens/OS-PKI/revoked/events')
+        self.assertIn('signed', r.result)
+
 
 class TestUUIDTokenAPIs(TestPKITokenAPIs):
     def config_files(self):
@@ -39,6 +39,25 @@ class CredentialTestCase(test_v3.RestfulTestCase):
         r = self.get('/credentials')
         self.assertValidCredentialListResponse(r, ref=self.credential)
 
+    def test_list_credentials_filtered(self):
+        """Call ``GET /credentials?user_id={user_id}&project_id=...``."""
+        other = self.new_credential_ref(user_id=uuid.uuid4().hex,
+                                        project_id=uuid.uuid4().hex)
+        self.credential_api.create_credential(other['id'], other)
+
+        r = self.get('/credentials?user_id=%s' % self.user['id'])
+        self.assertValidCredentialListResponse(r, ref=self.credential)
+        self.assertEqual([self.credential_id],
+                         [c['id'] for c in r.result['credentials']])
+
+        r = self.get('/credentials?project_id=%s' % other['project_id'])
+        self.assertEqual([other['id']],
+                         [c['id'] for c in r.result['credentials']])
+
+        r = self.get('/credentials?user_id=%s&project_id=%s' % (
+            self.user['id'], other['project_id']))
+        self.assertEqual([], r.result['credentials'])
+
     def test_list_credentials_xml(self):
         """Call ``GET /credentials`` (xml data)."""
         r = self.get('/credentials', content_type='xml')
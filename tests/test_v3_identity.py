@@ -149,6 +149,49 @@ class IdentityTestCase(test_v3.RestfulTestCase):
             project_id=self.project2['id'])
         self.post('/auth/tokens', body=auth_data, expected_status=401)
 
+    def test_disable_domain_revokes_tokens(self):
+        """Disabling a domain revokes its users' and projects' tokens."""
+        self.domain2 = self.new_domain_ref()
+        self.identity_api.create_domain(self.domain2['id'], self.domain2)
+        self.project2 = self.new_project_ref(
+            domain_id=self.domain2['id'])
+        self.identity_api.create_project(self.project2['id'], self.project2)
+        self.user2 = self.new_user_ref(
+            domain_id=self.domain2['id'],
+            project_id=self.project2['id'])
+        self.identity_api.create_user(self.user2['id'], self.user2)
+        self.identity_api.create_grant(self.role_id,
+                                       user_id=self.user2['id'],
+                                       project_id=self.project_id)
+        self.identity_api.create_grant(self.role_id,
+                                       user_id=self.user['id'],
+                                       project_id=self.project2['id'])
+        self.identity_api.create_grant(self.role_id,
+                                       user_id=self.user['id'],
+                                       domain_id=self.domain2['id'])
+
+        def get_token(user, **kwargs):
+            auth_data = self.build_authentication_request(
+                user_id=user['id'], password=user['password'], **kwargs)
+            r = self.post('/auth/tokens', body=auth_data)
+            return r.headers.get('X-Subject-Token')
+
+        # a token of the domain's user on a project outside the domain,
+        # and another user's tokens on the domain and its project
+        user2_token = get_token(self.user2, project_id=self.project_id)
+        project2_token = get_token(self.user, project_id=self.project2['id'])
+        domain2_token = get_token(self.user, domain_id=self.domain2['id'])
+        other_token = get_token(self.user, project_id=self.project_id)
+
+        self.patch('/domains/%(domain_id)s' % {
+            'domain_id': self.domain2['id']},
+            body={'domain': {'enabled': False}})
+
+        for token_id in (user2_token, project2_token, domain2_token):
+            self.assertRaises(exception.TokenNotFound,
+                              self.token_api.get_token, token_id)
+        self.token_api.get_token(other_token)
+
     def test_delete_enabled_domain_fails(self):
         """Call ``DELETE /domains/{domain_id}`` (when domain enabled)."""
 
@@ -14,6 +14,7 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import routes
 import webob
 
 from keystone import test
@@ -96,6 +97,18 @@ class ApplicationTest(BaseWSGITest):
         resp = req.get_response(app)
         self.assertIn('X-Foo', eval(resp.body))
 
+    def test_router_builds_dispatch_table(self):
+        app = FakeApp()
+        mapper = routes.Mapper()
+        mapper.connect('/', controller=app, action='index')
+        mapper.connect('/missing', controller=app, action='missing')
+        wsgi.Router(mapper)
+        self.assertEqual(app._dispatch_table.keys(), ['index'])
+
+    def test_normalize_dict(self):
+        self.assertEqual(self.app._normalize_dict({u'OS-KSADM:password': 1}),
+                         {'OS_KSADM_password': 1})
+
     def test_render_response(self):
         data = {'attribute': 'value'}
         body = '{"attribute": "value"}'
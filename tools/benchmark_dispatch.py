@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Measures requests/sec through the full paste pipeline.
+
+Requests are made in-process (no sockets) against the ``main`` or ``admin``
+pipeline of etc/keystone-paste.ini, using the in-memory backends, e.g.::
+
+    $ python tools/benchmark_dispatch.py --requests 5000 /v2.0/
+
+"""
+
+import gettext
+import optparse
+import os
+import sys
+import time
+
+ROOTDIR = os.path.normpath(os.path.join(os.path.abspath(__file__),
+                                        os.pardir,
+                                        os.pardir))
+sys.path.insert(0, ROOTDIR)
+gettext.install('keystone', unicode=1)
+
+from paste import deploy
+import webob
+
+from keystone.common import environment
+environment.use_eventlet()
+
+from keystone import config
+
+
+CONF = config.CONF
+
+
+def configure():
+    CONF(args=[], project='keystone', default_config_files=[
+        os.path.join(ROOTDIR, 'etc', 'keystone.conf.sample')])
+    CONF.set_override('driver', 'keystone.identity.backends.kvs.Identity',
+                      group='identity')
+    CONF.set_override('driver', 'keystone.token.backends.kvs.Token',
+                      group='token')
+    CONF.set_override('driver', 'keystone.trust.backends.kvs.Trust',
+                      group='trust')
+    CONF.set_override('driver', 'keystone.catalog.backends.kvs.Catalog',
+                      group='catalog')
+
+
+def loadapp(name):
+    """Loads a pipeline of etc/keystone-paste.ini with in-memory backends."""
+    configure()
+    return deploy.loadapp(
+        'config:%s' % os.path.join(ROOTDIR, 'etc', 'keystone-paste.ini'),
+        name=name)
+
+
+def main():
+    parser = optparse.OptionParser(usage='%prog [options] [path]')
+    parser.add_option('--requests', type='int', default=2000,
+                      help='number of requests to make (default: 2000)')
+    parser.add_option('--pipeline', default='main',
+                      help='paste pipeline to load (default: main)')
+    options, args = parser.parse_args()
+    path = args[0] if args else '/v2.0/'
+
+    app = loadapp(options.pipeline)
+
+    # warm up, and make sure the request actually succeeds
+    response = webob.Request.blank(path).get_response(app)
+    if response.status_int >= 400:
+        sys.exit('GET %s failed: %s' % (path, response.status))
+
+    start = time.time()
+    for _i in xrange(options.requests):
+        webob.Request.blank(path).get_response(app)
+    elapsed = time.time() - start
+
+    print('GET %s: %d requests in %.2fs, %.1f requests/sec' % (
+        path, options.requests, elapsed, options.requests / elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Compares the persistent KVS store with the SQL backend on SQLite.
+
+Tokens are created, validated and revoked through the KVS token driver on
+a [kvs] path log file, then through the SQL token driver on a SQLite file,
+both in a scratch directory, e.g.::
+
+    $ python tools/benchmark_kvs_store.py --tokens 5000
+
+"""
+
+import datetime
+import gettext
+import optparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+import uuid
+
+ROOTDIR = os.path.normpath(os.path.join(os.path.abspath(__file__),
+                                        os.pardir,
+                                        os.pardir))
+sys.path.insert(0, ROOTDIR)
+gettext.install('keystone', unicode=1)
+
+from keystone.common import kvs
+from keystone.common import sql
+from keystone import config
+from keystone.openstack.common import timeutils
+from keystone.token.backends import kvs as token_kvs
+from keystone.token.backends import sql as token_sql
+
+
+CONF = config.CONF
+
+
+def kvs_driver(directory):
+    CONF.set_override('path', os.path.join(directory, 'keystone.kvs'),
+                      group='kvs')
+    return token_kvs.Token()
+
+
+def sql_driver(directory):
+    CONF.set_override('connection',
+                      'sqlite:///%s' % os.path.join(directory, 'keystone.db'),
+                      group='sql')
+    driver = token_sql.Token()
+    sql.ModelBase.metadata.create_all(bind=driver.get_engine())
+    return driver
+
+
+def run(driver, count):
+    """Returns the operations/sec of each step."""
+    expires = timeutils.utcnow() + datetime.timedelta(days=1)
+    token_ids = [uuid.uuid4().hex for _i in xrange(count)]
+    user_id = uuid.uuid4().hex
+    steps = [
+        ('create', lambda token_id: driver.create_token(
+            token_id, {'id': token_id,
+                       'user': {'id': user_id},
+                       'tenant': {'id': 'project'},
+                       'expires': expires})),
+        ('get', driver.get_token),
+        ('delete', driver.delete_token)]
+    results = []
+    for name, step in steps:
+        start = time.time()
+        for token_id in token_ids:
+            step(token_id)
+        results.append((name, count / (time.time() - start)))
+    return results
+
+
+def main():
+    parser = optparse.OptionParser()
+    parser.add_option('--tokens', type='int', default=5000,
+                      help='number of tokens (default: 5000)')
+    options, _args = parser.parse_args()
+
+    CONF(args=[], project='keystone', default_config_files=[
+        os.path.join(ROOTDIR, 'etc', 'keystone.conf.sample')])
+
+    print('%-8s %14s %14s' % ('', 'kvs log (/s)', 'sqlite (/s)'))
+    directory = tempfile.mkdtemp()
+    try:
+        kvs_results = run(kvs_driver(directory), options.tokens)
+        sql_results = run(sql_driver(directory), options.tokens)
+    finally:
+        for db in kvs._LOGDBS.values():
+            db.close()
+        shutil.rmtree(directory)
+    for (name, kvs_rate), (_name, sql_rate) in zip(kvs_results, sql_results):
+        print('%-8s %14.0f %14.0f' % (name, kvs_rate, sql_rate))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Measures token lookups of the KVS token driver as the store grows.
+
+For each size, a fresh store is filled with tokens spread over --users
+users, then the tokens of one user are listed through the secondary index
+and by scanning every item, as list_tokens did before, e.g.::
+
+    $ python tools/benchmark_kvs_tokens.py --tokens 10000,100000,1000000
+
+"""
+
+import datetime
+import gettext
+import optparse
+import os
+import sys
+import time
+import uuid
+
+ROOTDIR = os.path.normpath(os.path.join(os.path.abspath(__file__),
+                                        os.pardir,
+                                        os.pardir))
+sys.path.insert(0, ROOTDIR)
+gettext.install('keystone', unicode=1)
+
+from keystone.common import kvs
+from keystone.openstack.common import timeutils
+from keystone.token.backends import kvs as token_kvs
+
+
+def scan_list_tokens(driver, user_id):
+    tokens = []
+    now = timeutils.utcnow()
+    for token, ref in driver.db.items():
+        if not token.startswith('token-') or driver.is_expired(now, ref):
+            continue
+        if ref.get('user') and ref['user'].get('id') == user_id:
+            tokens.append(token.split('-', 1)[1])
+    return tokens
+
+
+def populate(driver, count, users):
+    user_ids = [uuid.uuid4().hex for _i in xrange(users)]
+    expires = timeutils.utcnow() + datetime.timedelta(days=1)
+    for i in xrange(count):
+        user_id = user_ids[i % users]
+        driver.create_token(uuid.uuid4().hex,
+                            {'user': {'id': user_id},
+                             'tenant': {'id': 'project'},
+                             'expires': expires})
+    return user_ids
+
+
+def timed(function, rounds):
+    start = time.time()
+    for _round in xrange(rounds):
+        function()
+    return (time.time() - start) / rounds
+
+
+def main():
+    parser = optparse.OptionParser()
+    parser.add_option('--tokens', default='10000,100000,1000000',
+                      help='comma separated store sizes '
+                           '(default: 10000,100000,1000000)')
+    parser.add_option('--users', type='int', default=1000,
+                      help='number of users owning the tokens '
+                           '(default: 1000)')
+    parser.add_option('--rounds', type='int', default=20,
+                      help='number of lookups with each path (default: 20)')
+    options, _args = parser.parse_args()
+
+    print('%10s %14s %14s %10s' % ('tokens', 'index (ms)', 'scan (ms)',
+                                   'speedup'))
+    for count in [int(c) for c in options.tokens.split(',')]:
+        driver = token_kvs.Token(db=kvs.DictKvs())
+        user_ids = populate(driver, count, options.users)
+        user_id = user_ids[0]
+        assert (sorted(driver.list_tokens(user_id)) ==
+                sorted(scan_list_tokens(driver, user_id)))
+
+        index = timed(lambda: driver.list_tokens(user_id), options.rounds)
+        scan = timed(lambda: scan_list_tokens(driver, user_id),
+                     max(1, options.rounds // 10))
+        print('%10d %14.3f %14.3f %9.0fx' % (
+            count, index * 1000, scan * 1000, scan / index))
+
+
+if __name__ == '__main__':
+    main()
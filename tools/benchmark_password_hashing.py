@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Measures password verifications/sec for each password hashing tier.
+
+The tiers are read from ``[identity] password_hash_tiers`` of the given
+configuration file, or given on the command line, e.g.::
+
+    $ python tools/benchmark_password_hashing.py --config-file keystone.conf
+    $ python tools/benchmark_password_hashing.py service:sha512_crypt:5000 \\
+          human:pbkdf2_sha512:60000
+
+Verifications run in the benchmark process itself, without executor.
+
+"""
+
+import gettext
+import optparse
+import os
+import sys
+import time
+
+ROOTDIR = os.path.normpath(os.path.join(os.path.abspath(__file__),
+                                        os.pardir,
+                                        os.pardir))
+sys.path.insert(0, ROOTDIR)
+gettext.install('keystone', unicode=1)
+
+from keystone.common import utils
+from keystone import config
+
+
+CONF = config.CONF
+
+
+def main():
+    parser = optparse.OptionParser(
+        usage='%prog [options] [name:scheme:rounds...]')
+    parser.add_option('--config-file',
+                      default=os.path.join(ROOTDIR, 'etc',
+                                           'keystone.conf.sample'),
+                      help='configuration file to read tiers from')
+    parser.add_option('--seconds', type='float', default=2.0,
+                      help='time spent verifying for each tier (default: 2)')
+    options, args = parser.parse_args()
+
+    CONF(args=[], project='keystone',
+         default_config_files=[options.config_file])
+    if args:
+        CONF.set_override('password_hash_tiers', args, group='identity')
+
+    password = 'benchmark'
+    for tier, (scheme, rounds) in sorted(utils.password_hash_tiers().items()):
+        hashed = utils._encrypt(scheme, password, rounds)
+        count = 0
+        start = time.time()
+        while time.time() - start < options.seconds:
+            assert utils._verify(scheme, password, hashed)
+            count += 1
+        elapsed = time.time() - start
+        print('%-12s %-14s %8d rounds %10.1f verifications/sec' % (
+            tier, scheme, rounds, count / elapsed))
+
+
+if __name__ == '__main__':
+    main()
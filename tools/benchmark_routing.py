@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Compares routes.Mapper matching with keystone.common.routing.
+
+Every route of the v2.0 and v3 routers of the ``main`` and ``admin``
+pipelines is requested with each HTTP method, and the match results of both
+implementations are checked to be identical, e.g.::
+
+    $ python tools/benchmark_routing.py --rounds 20
+
+"""
+
+import optparse
+import re
+import time
+
+import benchmark_dispatch
+
+from keystone.common import routing
+
+
+METHODS = ['GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE']
+
+
+def requests():
+    """Yields (mapper, environ) tuples covering every route."""
+    for name in ['main', 'admin']:
+        for mapper in routing.find_mappers(benchmark_dispatch.loadapp(name)):
+            for route in mapper.matchlist:
+                path = re.sub(r'\{[^}]*\}', 'abc', route.routepath)
+                if not path.startswith('/'):
+                    path = '/some/path'
+                for method in METHODS:
+                    yield mapper, {'PATH_INFO': path,
+                                   'REQUEST_METHOD': method}
+
+
+def main():
+    parser = optparse.OptionParser()
+    parser.add_option('--rounds', type='int', default=10,
+                      help='number of times to match each request '
+                           '(default: 10)')
+    options, _args = parser.parse_args()
+
+    cases = [(mapper, routing.RouteTable(mapper), environ)
+             for mapper, environ in requests()]
+    for mapper, table, environ in cases:
+        expected = mapper.routematch(environ=dict(environ))
+        if table.routematch(dict(environ)) != expected:
+            raise SystemExit('Mismatch for %(REQUEST_METHOD)s %(PATH_INFO)s'
+                             % environ)
+
+    results = {}
+    for name, match in [
+            ('routes.Mapper', lambda m, t, e: m.routematch(environ=e)),
+            ('RouteTable', lambda m, t, e: t.routematch(e))]:
+        start = time.time()
+        for _round in xrange(options.rounds):
+            for mapper, table, environ in cases:
+                match(mapper, table, environ)
+        results[name] = (len(cases) * options.rounds) / (time.time() - start)
+        print('%-14s %10.0f matches/sec' % (name, results[name]))
+
+    print('%d requests over %d mappers, identical results, %.1fx faster' % (
+        len(cases), len(set(id(case[0]) for case in cases)),
+        results['RouteTable'] / results['routes.Mapper']))
+
+
+if __name__ == '__main__':
+    main()
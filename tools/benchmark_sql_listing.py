@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Measures rows/sec of list_users with the SQL identity driver.
+
+The user table of an in-memory SQLite database (or of the given connection
+string) is filled with users, then listed through the ORM, as list_users did
+before, and through the Core select() path it uses now, e.g.::
+
+    $ python tools/benchmark_sql_listing.py --users 100000
+
+"""
+
+import gettext
+import optparse
+import os
+import sys
+import time
+import uuid
+
+ROOTDIR = os.path.normpath(os.path.join(os.path.abspath(__file__),
+                                        os.pardir,
+                                        os.pardir))
+sys.path.insert(0, ROOTDIR)
+gettext.install('keystone', unicode=1)
+
+# the user table references the domain table of the assignment models
+from keystone.assignment.backends import sql as assignment_sql  # noqa
+from keystone.common import sql
+from keystone import config
+from keystone import identity
+from keystone.identity.backends import sql as identity_sql
+
+
+CONF = config.CONF
+
+
+def orm_list_users(driver):
+    session = driver.get_session()
+    return [identity.filter_user(ref.to_dict())
+            for ref in session.query(identity_sql.User)]
+
+
+def populate(driver, count, extra_ratio):
+    engine = driver.get_engine()
+    sql.ModelBase.metadata.create_all(bind=engine)
+    rows = []
+    for i in xrange(count):
+        extra = {}
+        if i < count * extra_ratio:
+            extra = {'email': 'user%d@example.com' % i}
+        rows.append({'id': uuid.uuid4().hex,
+                     'name': 'user%d' % i,
+                     'domain_id': CONF.identity.default_domain_id,
+                     'password': 'x' * 100,
+                     'enabled': True,
+                     'extra': extra})
+    engine.execute(identity_sql.User.__table__.insert(), rows)
+
+
+def main():
+    parser = optparse.OptionParser()
+    parser.add_option('--users', type='int', default=100000,
+                      help='number of users (default: 100000)')
+    parser.add_option('--extra-ratio', type='float', default=0.1,
+                      help='fraction of users with a non-empty extra '
+                           '(default: 0.1)')
+    parser.add_option('--connection', default='sqlite://',
+                      help='SQLAlchemy connection string of an empty '
+                           'database (default: in-memory SQLite)')
+    parser.add_option('--rounds', type='int', default=3,
+                      help='number of listings with each path (default: 3)')
+    options, _args = parser.parse_args()
+
+    CONF(args=[], project='keystone', default_config_files=[
+        os.path.join(ROOTDIR, 'etc', 'keystone.conf.sample')])
+    CONF.set_override('connection', options.connection, group='sql')
+
+    driver = identity_sql.Identity()
+    populate(driver, options.users, options.extra_ratio)
+
+    results = {}
+    for name, list_users in [('ORM', orm_list_users),
+                             ('select()', lambda d: d.list_users())]:
+        start = time.time()
+        for _round in xrange(options.rounds):
+            users = list_users(driver)
+        elapsed = time.time() - start
+        assert len(users) == options.users
+        results[name] = len(users) * options.rounds / elapsed
+        print('%-10s %10.0f rows/sec' % (name, results[name]))
+
+    print('%.1fx faster' % (results['select()'] / results['ORM']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Measures the allocations of issuing and validating a token.
+
+A v3-like token with a catalog of --services services is created and read
+back through the token Manager and the KVS driver, then through the same
+steps with the deep copies they used to make (three on create, one on
+get), e.g.::
+
+    $ python tools/benchmark_token_allocations.py --services 10
+
+Allocations are traced with tracemalloc where available (Python 3.4+, or a
+patched Python 2 with pytracemalloc). Otherwise only the container objects
+allocated and still alive, as tracked by the garbage collector, are
+counted, which leaves out the temporary copies; the time per call still
+shows them.
+
+"""
+
+import copy
+import datetime
+import gc
+import gettext
+import optparse
+import os
+import sys
+import time
+import uuid
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+ROOTDIR = os.path.normpath(os.path.join(os.path.abspath(__file__),
+                                        os.pardir,
+                                        os.pardir))
+sys.path.insert(0, ROOTDIR)
+gettext.install('keystone', unicode=1)
+
+from keystone.common import kvs
+from keystone import config
+from keystone.openstack.common import timeutils
+from keystone import token
+
+
+CONF = config.CONF
+
+
+def sample_token(services):
+    catalog = []
+    for i in xrange(services):
+        catalog.append({
+            'id': uuid.uuid4().hex,
+            'type': 'service%d' % i,
+            'endpoints': [{'id': uuid.uuid4().hex,
+                           'interface': interface,
+                           'region': 'RegionOne',
+                           'url': 'http://service%d:%s/v2' % (i, interface)}
+                          for interface in ('public', 'internal', 'admin')]})
+    user = {'id': uuid.uuid4().hex, 'name': 'user',
+            'domain': {'id': 'default', 'name': 'Default'}}
+    project = {'id': uuid.uuid4().hex, 'name': 'project',
+               'domain': {'id': 'default', 'name': 'Default'}}
+    roles = [{'id': uuid.uuid4().hex, 'name': 'role%d' % i}
+             for i in xrange(3)]
+    expires = timeutils.utcnow() + datetime.timedelta(days=1)
+    return {'expires': expires,
+            'user': user,
+            'tenant': project,
+            'metadata': {'roles': [r['id'] for r in roles]},
+            'token_data': {'token': {'catalog': catalog,
+                                     'expires_at': timeutils.isotime(expires),
+                                     'methods': ['password'],
+                                     'project': project,
+                                     'roles': roles,
+                                     'user': user}}}
+
+
+class CopyingManager(object):
+    """The token Manager and KVS driver steps, with their old deep copies."""
+
+    def __init__(self, manager):
+        self.manager = manager
+
+    def create_token(self, token_id, data):
+        data = copy.deepcopy(data)
+        data = copy.deepcopy(data)
+        ref = self.manager.create_token(token_id, data)
+        return copy.deepcopy(ref)
+
+    def get_token(self, token_id):
+        return copy.deepcopy(self.manager.get_token(token_id))
+
+
+def measure(function, rounds):
+    """Returns the allocations of one call, and its time in microseconds.
+
+    Allocations are (blocks, bytes) with tracemalloc, (containers, None)
+    otherwise.
+
+    """
+    results = []
+    if tracemalloc:
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+    else:
+        gc.collect()
+        gc.disable()
+        before = len(gc.get_objects())
+    start = time.time()
+    for _round in xrange(rounds):
+        results.append(function())
+    elapsed = (time.time() - start) * 1000000 / rounds
+    if tracemalloc:
+        after = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        stats = after.compare_to(before, 'filename')
+        return (sum(s.count_diff for s in stats) / float(rounds),
+                sum(s.size_diff for s in stats) / float(rounds),
+                elapsed)
+    count = len(gc.get_objects()) - before
+    gc.enable()
+    return count / float(rounds), None, elapsed
+
+
+def main():
+    parser = optparse.OptionParser()
+    parser.add_option('--services', type='int', default=10,
+                      help='number of services in the catalog (default: 10)')
+    parser.add_option('--rounds', type='int', default=1000,
+                      help='number of tokens (default: 1000)')
+    options, _args = parser.parse_args()
+
+    CONF(args=[], project='keystone', default_config_files=[
+        os.path.join(ROOTDIR, 'etc', 'keystone.conf.sample')])
+    CONF.set_override('driver', 'keystone.token.backends.kvs.Token',
+                      group='token')
+    manager = token.Manager()
+    data = sample_token(options.services)
+
+    if tracemalloc:
+        print('%-28s %10s %10s %10s' % ('', 'blocks', 'bytes', 'usec'))
+    else:
+        print('%-28s %10s %10s' % ('', 'containers', 'usec'))
+    for name, api in [('without copies', manager),
+                      ('with deep copies', CopyingManager(manager))]:
+        kvs.INMEMDB.clear()
+        token_ids = [uuid.uuid4().hex for _i in xrange(options.rounds)]
+        ids = iter(token_ids)
+        issue = measure(lambda: api.create_token(next(ids), data),
+                        options.rounds)
+        ids = iter(token_ids)
+        validate = measure(lambda: api.get_token(next(ids)), options.rounds)
+        for step, (blocks, size, usec) in [('issue', issue),
+                                           ('validate', validate)]:
+            label = '%s, %s' % (step, name)
+            if size is None:
+                print('%-28s %10.0f %10.0f' % (label, blocks, usec))
+            else:
+                print('%-28s %10.0f %10.0f %10.0f' % (label, blocks, size,
+                                                      usec))
+
+
+if __name__ == '__main__':
+    main()
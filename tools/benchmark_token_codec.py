@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Compares the encodings of stored tokens.
+
+A v3-like token with a catalog of --services services is encoded and
+decoded with the JSON used by the SQL driver before (the extra column) and
+with each codec of keystone.token.codec, with and without compression and
+catalog interning, e.g.::
+
+    $ python tools/benchmark_token_codec.py --services 10
+
+The size is that of what is stored for each token: with interning, the
+catalog is stored once for all the tokens which share it and isn't counted.
+
+"""
+
+import gettext
+import optparse
+import os
+import sys
+import time
+
+ROOTDIR = os.path.normpath(os.path.join(os.path.abspath(__file__),
+                                        os.pardir,
+                                        os.pardir))
+sys.path.insert(0, ROOTDIR)
+sys.path.insert(0, os.path.join(ROOTDIR, 'tools'))
+gettext.install('keystone', unicode=1)
+
+from keystone import config
+from keystone.openstack.common import jsonutils
+from keystone.token import codec
+
+import benchmark_token_allocations
+
+
+CONF = config.CONF
+
+
+def timed(function, rounds):
+    """Returns the result of function, and its time in microseconds."""
+    start = time.time()
+    for _round in xrange(rounds):
+        result = function()
+    return result, (time.time() - start) * 1000000 / rounds
+
+
+def main():
+    parser = optparse.OptionParser()
+    parser.add_option('--services', type='int', default=10,
+                      help='number of services in the catalog (default: 10)')
+    parser.add_option('--rounds', type='int', default=1000,
+                      help='number of rounds (default: 1000)')
+    options, _args = parser.parse_args()
+
+    CONF(args=[], project='keystone', default_config_files=[
+        os.path.join(ROOTDIR, 'etc', 'keystone.conf.sample')])
+    data = benchmark_token_allocations.sample_token(options.services)
+    catalogs = {}
+
+    print('%-30s %10s %12s %12s' % ('', 'bytes', 'encode usec',
+                                    'decode usec'))
+    record, encode = timed(lambda: jsonutils.dumps(data), options.rounds)
+    _ref, decode = timed(lambda: jsonutils.loads(record), options.rounds)
+    print('%-30s %10d %12.1f %12.1f' % ('json extra', len(record), encode,
+                                        decode))
+    for name in ('JsonCodec', 'BinaryCodec'):
+        for compression in (0, 6):
+            for intern_catalog in (False, True):
+                CONF.set_override('codec', 'keystone.token.codec.%s' % name,
+                                  group='token')
+                CONF.set_override('compression', compression, group='token')
+                CONF.set_override('intern_catalog', intern_catalog,
+                                  group='token')
+                (record, catalog_id, catalog), encode = timed(
+                    lambda: codec.encode_token(data), options.rounds)
+                catalogs[catalog_id] = catalog
+                _ref, decode = timed(
+                    lambda: codec.decode_token(record, catalogs.get),
+                    options.rounds)
+                label = name
+                if compression:
+                    label += ', zlib'
+                if intern_catalog:
+                    label += ', interned'
+                print('%-30s %10d %12.1f %12.1f' % (label, len(record),
+                                                    encode, decode))
+
+
+if __name__ == '__main__':
+    main()